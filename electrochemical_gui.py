@@ -7,7 +7,7 @@
 
 import sys
 import os
-import queue
+import shutil
 import time
 from datetime import datetime
 from PySide6.QtWidgets import (
@@ -21,6 +21,7 @@ from PySide6.QtGui import QFont
 import matplotlib
 matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 from matplotlib import font_manager
@@ -28,6 +29,15 @@ from matplotlib import font_manager
 # 导入协议实现
 from utils.electrochemical_protocol import ElectrochemicalProtocol, ProtocolState
 from utils.dpv_protocol import DPVProtocol
+from utils.data_buffer import RingBuffer, create_buffer
+from utils.data_store import format_from_path, write_file
+from utils.decimation import decimate_view
+from utils.metrics import REGISTRY
+
+# 采集过程中实时写入数据和串口抓包的目录 (程序异常退出或断线时数据不丢失)
+AUTOSAVE_DIR = 'autosave'
+
+PLOT_FRAME_TIME = REGISTRY.histogram('echem_plot_frame_seconds', '实时曲线每次重绘的耗时').labels()
 
 
 # 配置中文字体
@@ -51,7 +61,8 @@ def setup_chinese_font():
 class DetectionWorker(QThread):
     """检测工作线程"""
     progress_update = Signal(int, str)  # 进度值, 消息
-    data_update = Signal(list)  # 数据更新
+    data_update = Signal(int, object)  # 数据更新: 起始下标, 新增数据 (电位, 电流, 时间戳) 数组
+    analysis_ready = Signal(object)  # 测量结束时的分析结果 (如 DPV 峰分析)
     finished = Signal(bool, str)  # 是否成功, 消息
     
     def __init__(self, method, params):
@@ -59,22 +70,37 @@ class DetectionWorker(QThread):
         self.method = method  # 'CV' or 'DPV'
         self.params = params
         self.protocol = None
+        self._emitted = 0  # 已发送给界面的数据点数
         
     def run(self):
         """执行检测"""
         try:
+            # 采集数据实时写入自动保存文件
+            os.makedirs(AUTOSAVE_DIR, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            stream_path = os.path.join(AUTOSAVE_DIR, f"{self.method.lower()}_data_{timestamp}.csv")
+            capture_path = os.path.join(AUTOSAVE_DIR, f"{self.method.lower()}_capture_{timestamp}.ecap")
+            
             # 创建协议实例
             if self.method == 'CV':
                 self.protocol = ElectrochemicalProtocol(
                     port=self.params.get('port'),
                     baudrate=self.params.get('baudrate', 115200),
-                    simulate=False
+                    simulate=False,
+                    stream_format='csv',
+                    stream_path=stream_path,
+                    capture_path=capture_path,
+                    max_points=self.params.get('max_points')
                 )
             else:  # DPV
                 self.protocol = DPVProtocol(
                     port=self.params.get('port'),
                     baudrate=self.params.get('baudrate', 115200),
-                    simulate=False
+                    simulate=False,
+                    stream_format='csv',
+                    stream_path=stream_path,
+                    capture_path=capture_path,
+                    max_points=self.params.get('max_points')
                 )
             
             # 连接设备
@@ -116,15 +142,7 @@ class DetectionWorker(QThread):
             self.progress_update.emit(30, "等待设备确认...")
             
             # 等待确认响应 (#)
-            start_time = time.time()
-            while self.protocol.state != ProtocolState.PARAMETER_SET and time.time() - start_time < 5:
-                try:
-                    response = self.protocol.response_queue.get(timeout=0.1)
-                    self.protocol._handle_response(response)
-                except queue.Empty:
-                    continue
-            
-            if self.protocol.state != ProtocolState.PARAMETER_SET:
+            if not self.protocol.wait_for(ProtocolState.PARAMETER_SET, timeout=5):
                 self.finished.emit(False, "参数确认超时")
                 return
             
@@ -135,15 +153,7 @@ class DetectionWorker(QThread):
                 return
             
             # 等待开始确认响应 (*)
-            start_time = time.time()
-            while self.protocol.state != ProtocolState.RECEIVING_DATA and time.time() - start_time < 5:
-                try:
-                    response = self.protocol.response_queue.get(timeout=0.1)
-                    self.protocol._handle_response(response)
-                except queue.Empty:
-                    continue
-            
-            if self.protocol.state != ProtocolState.RECEIVING_DATA:
+            if not self.protocol.wait_for(ProtocolState.RECEIVING_DATA, timeout=5):
                 self.finished.emit(False, "开始命令确认超时")
                 return
             
@@ -160,54 +170,64 @@ class DetectionWorker(QThread):
                 self.protocol.disconnect()
     
     def _monitor_data(self):
-        """监控数据采集"""
+        """监控数据采集: 响应到达即处理, 每 0.5 秒刷新一次界面"""
         start_time = time.time()
         # 增加超时时间:DPV 120秒, CV 90秒,避免长时间扫描时超时断连
         timeout = 120 if self.method == 'DPV' else 90
-        last_update_time = start_time
-        data_update_interval = 0.5  # 每0.5秒更新一次UI
-        
-        while time.time() - start_time < timeout:
-            try:
-                # 非阻塞式检查队列
-                response = self.protocol.response_queue.get(timeout=0.1)
-                self.protocol._handle_response(response)
-                
-                # 定期更新数据显示,避免频繁刷新UI
-                current_time = time.time()
-                if current_time - last_update_time >= data_update_interval:
-                    if len(self.protocol.data_buffer) > 0:
-                        self.data_update.emit(self.protocol.data_buffer.copy())
-                        # 更新进度
-                        elapsed = current_time - start_time
-                        progress = min(50 + int((elapsed / timeout) * 45), 95)
-                        self.progress_update.emit(progress, f"已采集 {len(self.protocol.data_buffer)} 个数据点...")
-                        last_update_time = current_time
-                
-                # 检查串口连接状态
-                if self.protocol.serial_conn:
-                    if not self.protocol.serial_conn.is_open:
-                        self.finished.emit(False, "串口连接已断开,请检查设备连接")
-                        return
-                
-                # 检查是否完成
-                if self.protocol.state == ProtocolState.TEST_COMPLETE:
-                    # 最后一次数据更新
-                    if len(self.protocol.data_buffer) > 0:
-                        self.data_update.emit(self.protocol.data_buffer.copy())
-                    self.progress_update.emit(100, "检测完成!")
-                    self.finished.emit(True, f"成功采集 {len(self.protocol.data_buffer)} 个数据点")
-                    return
-                    
-            except queue.Empty:
-                # 队列为空时也要让出CPU时间
-                time.sleep(0.01)
-                continue
-            except Exception as e:
-                self.finished.emit(False, f"数据采集错误: {str(e)}")
-                return
+        disconnected = False
+        
+        def update():
+            nonlocal disconnected
+            # 检查串口连接状态
+            if self.protocol.serial_conn and not self.protocol.serial_conn.is_open:
+                disconnected = True
+                return False
+            # 定期更新数据显示,避免频繁刷新UI
+            if len(self.protocol.data_buffer) > 0:
+                self._emit_new_data()
+                elapsed = time.time() - start_time
+                progress = min(50 + int((elapsed / timeout) * 45), 95)
+                self.progress_update.emit(progress, f"已采集 {len(self.protocol.data_buffer)} 个数据点...")
+            return True
+        
+        completed = self.protocol.wait_for(ProtocolState.TEST_COMPLETE, timeout=timeout,
+                                           on_update=update, update_interval=0.5)
+        if completed:
+            # 最后一次数据更新
+            self._emit_new_data()
+            if self.protocol.analysis is not None:
+                self.analysis_ready.emit(self.protocol.analysis)
+            self.progress_update.emit(100, "检测完成!")
+            self.finished.emit(True, f"成功采集 {len(self.protocol.data_buffer)} 个数据点")
+        elif disconnected:
+            self.finished.emit(False, "串口连接已断开,请检查设备连接")
+        elif self.protocol.state == ProtocolState.ERROR:
+            self.finished.emit(False, "数据采集错误")
+        else:
+            self.finished.emit(False, "检测超时")
+    
+    def _emit_new_data(self):
+        """
+        只发送上次发送之后新增的数据点
+
+        缓冲区只追加不修改, 已写入区间的视图不会再变化, 因此直接发送视图而不复制;
+        每次信号的开销只与新增点数有关, 与已采集的总点数无关。
+        有界内存模式下环形缓冲区中的点会被覆盖, 新增部分复制后再发送。
+        """
+        buffer = self.protocol.data_buffer
+        count = buffer.total
+        if count < self._emitted:
+            # 协议缓冲区被重置 (收到新的 *), 从头发送
+            self._emitted = 0
+        if count == self._emitted:
+            return
         
-        self.finished.emit(False, "检测超时")
+        start = max(self._emitted, buffer.first)
+        chunk = buffer.view(start - buffer.first, len(buffer))
+        if self.protocol.max_points:
+            chunk = tuple(column.copy() for column in chunk)
+        self.data_update.emit(start, chunk)
+        self._emitted = count
 
 
 class PlotCanvas(FigureCanvas):
@@ -227,6 +247,27 @@ class PlotCanvas(FigureCanvas):
         self.axes.set_ylabel('电流 (μA)', fontsize=12, fontproperties=self.font_prop)
         self.axes.set_title('电化学检测数据', fontsize=14, fontweight='bold', fontproperties=self.font_prop)
         self.axes.grid(True, alpha=0.3)
+        
+        # 实时绘图状态
+        self.line = None
+        self._analysis_artists = []
+        self.placeholder = None
+        self._method = None
+        self._data = None
+        self._plotted = 0
+        self._bounds = None
+        self._view_fitted = False
+        self._user_view = False
+        self._updating = False
+        
+        # 窗口尺寸变化时按新的像素宽度重新降采样
+        self.mpl_connect('resize_event', lambda event: self._refresh_line())
+    
+    def draw(self):
+        """重绘画布 (draw_idle 合并后的实际渲染), 记录每帧耗时"""
+        started = time.perf_counter()
+        super().draw()
+        PLOT_FRAME_TIME.observe(time.perf_counter() - started)
     
     def _get_chinese_font(self):
         """获取中文字体属性"""
@@ -249,29 +290,26 @@ class PlotCanvas(FigureCanvas):
         # 默认字体
         return font_manager.FontProperties()
         
-    def plot_data(self, data, method='CV'):
-        """绘制数据"""
+    def reset_plot(self, method='CV'):
+        """
+        重建坐标轴 (仅在开始检测或切换方法时调用)
+
+        标题、坐标轴标签、图例和布局只在这里设置一次, 之后的实时更新只修改曲线数据。
+        """
         self.axes.clear()
+        self._analysis_artists = []
+        self._method = method
+        self._data = None
+        self._plotted = 0
+        self._bounds = None
+        self._view_fitted = False
+        self._user_view = False
         
-        if not data or len(data) == 0:
-            self.axes.text(0.5, 0.5, '暂无数据', 
-                          ha='center', va='center', 
-                          transform=self.axes.transAxes,
-                          fontsize=16, color='gray',
-                          fontproperties=self.font_prop)
-            self.draw()
-            return
-        
-        # 提取电位和电流
-        voltages = [point[0] for point in data]
-        currents = [point[1] for point in data]
-        
-        # 绘制
         if method == 'CV':
-            self.axes.plot(voltages, currents, 'b-', linewidth=1.5, label='CV 曲线')
+            self.line, = self.axes.plot([], [], 'b-', linewidth=1.5, label='CV 曲线')
             self.axes.set_title('循环伏安法 (CV) 检测结果', fontsize=14, fontweight='bold', fontproperties=self.font_prop)
         else:
-            self.axes.plot(voltages, currents, 'r-', linewidth=1.5, label='DPV 曲线')
+            self.line, = self.axes.plot([], [], 'r-', linewidth=1.5, label='DPV 曲线')
             self.axes.set_title('差分脉冲伏安法 (DPV) 检测结果', fontsize=14, fontweight='bold', fontproperties=self.font_prop)
         
         self.axes.set_xlabel('电位 (V)', fontsize=12, fontproperties=self.font_prop)
@@ -279,10 +317,201 @@ class PlotCanvas(FigureCanvas):
         self.axes.grid(True, alpha=0.3)
         
         # 设置图例字体
-        legend = self.axes.legend(prop=self.font_prop)
+        self.axes.legend(prop=self.font_prop)
+        
+        self.placeholder = self.axes.text(0.5, 0.5, '暂无数据', 
+                                          ha='center', va='center', 
+                                          transform=self.axes.transAxes,
+                                          fontsize=16, color='gray',
+                                          fontproperties=self.font_prop)
+        
+        # 坐标范围由 _expand_limits 管理, 关闭 matplotlib 的延迟自动缩放
+        self.axes.set_autoscale_on(False)
+        
+        # 用户缩放/平移后从完整数据重新降采样 (axes.clear 会清除回调, 需重新注册)
+        self.axes.callbacks.connect('xlim_changed', self._on_view_changed)
+        self.axes.callbacks.connect('ylim_changed', self._on_view_changed)
         
         self.fig.tight_layout()
         self.draw()
+    
+    def update_plot(self, data):
+        """
+        增量更新曲线
+
+        只对新增的数据点计算范围; 数据仍在当前视图内时不改变坐标轴,
+        重绘通过 draw_idle 合并。曲线按像素宽度做 min/max 降采样,
+        绘制的点数与已采集点数无关。
+
+        有界内存模式 (环形缓冲区已覆盖较早的点) 下只显示保留的最近数据,
+        坐标范围按保留的数据重新计算, 曲线随新数据滚动。
+        """
+        count = 0 if data is None else data.total
+        if count < self._plotted:
+            # 数据被重置 (新的检测), 重新统计范围
+            self._plotted = 0
+            self._bounds = None
+            self._view_fitted = False
+        
+        self._data = data
+        if data is None or len(data) == 0:
+            self.line.set_data([], [])
+            self.placeholder.set_visible(True)
+            self.draw_idle()
+            return
+        
+        voltages = data.voltages
+        currents = data.currents
+        self.placeholder.set_visible(False)
+        
+        if data.first:
+            # 滚动窗口: 较早的点已移出, 范围按保留的数据计算 (可缩小)
+            self._bounds = (voltages.min(), voltages.max(), currents.min(), currents.max())
+            self._view_fitted = False
+            new_v = voltages[:0]
+        else:
+            # 只用新增点更新数据范围
+            new_v = voltages[max(len(voltages) - (count - self._plotted), 0):]
+        new_i = currents[len(currents) - len(new_v):]
+        if len(new_v):
+            bounds = (new_v.min(), new_v.max(), new_i.min(), new_i.max())
+            if self._bounds is not None:
+                old = self._bounds
+                bounds = (min(old[0], bounds[0]), max(old[1], bounds[1]),
+                          min(old[2], bounds[2]), max(old[3], bounds[3]))
+            self._bounds = bounds
+        self._plotted = count
+        
+        self._updating = True
+        try:
+            if self._user_view and self._view_contains_data():
+                # 用户已恢复到包含全部数据的视图 (如工具栏"主页"), 恢复自动缩放
+                self._user_view = False
+            if not self._user_view:
+                self._expand_limits()
+        finally:
+            self._updating = False
+        
+        self._refresh_line()
+    
+    def _view_contains_data(self):
+        """当前视图是否包含全部数据"""
+        x_min, x_max, y_min, y_max = self._bounds
+        xlim = self.axes.get_xlim()
+        ylim = self.axes.get_ylim()
+        return xlim[0] <= x_min and x_max <= xlim[1] and ylim[0] <= y_min and y_max <= ylim[1]
+    
+    def _refresh_line(self):
+        """按当前视图和像素宽度从完整数据重新降采样并更新曲线"""
+        if self.line is None or self._data is None or len(self._data) == 0:
+            return
+        
+        n_bins = max(int(self.axes.bbox.width), 100)
+        if self._view_contains_data():
+            voltages, currents = decimate_view(self._data.voltages, self._data.currents, n_bins)
+        else:
+            voltages, currents = decimate_view(self._data.voltages, self._data.currents, n_bins,
+                                               xlim=self.axes.get_xlim(), ylim=self.axes.get_ylim())
+        self.line.set_data(voltages, currents)
+        self.draw_idle()
+    
+    def _on_view_changed(self, axes):
+        """坐标范围变化回调 (用户缩放/平移)"""
+        if self._updating:
+            return
+        self._user_view = True
+        self._refresh_line()
+    
+    def _expand_limits(self):
+        """数据超出当前视图时才扩大坐标范围 (留 5% 余量)"""
+        x_min, x_max, y_min, y_max = self._bounds
+        fitted = self._view_fitted
+        
+        def expanded(current, low, high):
+            if fitted and current[0] <= low and high <= current[1]:
+                return None
+            margin = (high - low) * 0.05 or max(abs(low) * 0.05, 1e-6)
+            if not fitted:
+                return low - margin, high + margin
+            return min(current[0], low - margin), max(current[1], high + margin)
+        
+        xlim = expanded(self.axes.get_xlim(), x_min, x_max)
+        ylim = expanded(self.axes.get_ylim(), y_min, y_max)
+        if xlim:
+            self.axes.set_xlim(xlim)
+        if ylim:
+            self.axes.set_ylim(ylim)
+        self._view_fitted = True
+    
+    def show_analysis(self, result):
+        """
+        标出分析结果 (峰位置和基线)
+
+        Args:
+            result: 分析结果 (带 peaks 的 PeakResult, 或带 cycles 的 CV 循环分析结果; 其他结果忽略)
+        """
+        for artist in self._analysis_artists:
+            artist.remove()
+        self._analysis_artists = []
+        if getattr(result, 'cycles', None) is not None:
+            self._show_cycles(result)
+            return
+        peaks = getattr(result, 'peaks', None)
+        if not peaks or self._data is None:
+            self.draw_idle()
+            return
+        
+        self._updating = True
+        try:
+            # 分析基于最近的 result.points 个点 (有界内存模式下为保留的窗口)
+            points = min(result.points, len(self._data), len(result.baseline))
+            voltages = self._data.voltages[len(self._data) - points:]
+            step = max(len(voltages) // max(int(self.axes.bbox.width), 100), 1)
+            baseline, = self.axes.plot(voltages[::step], result.baseline[-points:][::step], '--',
+                                       color='gray', linewidth=1)
+            self._analysis_artists.append(baseline)
+            for peak in peaks:
+                marker, = self.axes.plot(peak.potential, peak.current, 'kv', markersize=8)
+                label = self.axes.annotate(f"{peak.potential:.3f} V\n{peak.height:.3g} μA",
+                                           (peak.potential, peak.current),
+                                           textcoords='offset points', xytext=(10, 0),
+                                           ha='left', va='top', fontsize=9)
+                self._analysis_artists.extend([marker, label])
+        finally:
+            self._updating = False
+        self.draw_idle()
+    
+    def _show_cycles(self, result):
+        """标出 CV 逐圈的氧化峰 (▲) 和还原峰 (▼), 颜色表示圈数"""
+        if not len(result):
+            self.draw_idle()
+            return
+        
+        self._updating = True
+        try:
+            cycles = result.cycles
+            number = range(1, len(result) + 1)
+            for potentials, currents, marker in ((cycles['epa'], cycles['anodic_current'], '^'),
+                                                 (cycles['epc'], cycles['cathodic_current'], 'v')):
+                self._analysis_artists.append(
+                    self.axes.scatter(potentials, currents, c=number, cmap='viridis',
+                                      marker=marker, s=30, zorder=3))
+            last = result.cycle_table()[-1]
+            label = self.axes.text(0.98, 0.02,
+                                   f"{len(result)} 圈, ΔEp = {last['delta_ep'] * 1000:.1f} mV, "
+                                   f"ipa/ipc = {last['ratio']:.3f}",
+                                   transform=self.axes.transAxes, ha='right', va='bottom',
+                                   fontsize=10, fontproperties=self.font_prop)
+            self._analysis_artists.append(label)
+        finally:
+            self._updating = False
+        self.draw_idle()
+    
+    def plot_data(self, data, method='CV'):
+        """绘制数据 (实时模式: 方法变化时重建坐标轴, 否则增量更新)"""
+        if self.line is None or method != self._method:
+            self.reset_plot(method)
+        self.update_plot(data)
 
 
 class ElectrochemicalGUI(QMainWindow):
@@ -294,7 +523,7 @@ class ElectrochemicalGUI(QMainWindow):
         self.setGeometry(100, 100, 1400, 800)
         
         # 数据存储
-        self.current_data = []
+        self.current_data = create_buffer()
         self.detection_worker = None
         
         # 初始化界面
@@ -379,6 +608,18 @@ class ElectrochemicalGUI(QMainWindow):
         
         conn_layout.addRow("串口:", port_layout)
         
+        # 有界内存模式: 长时间监测时内存中只保留最近的点, 完整数据在自动保存文件中
+        self.max_points_spin = QSpinBox()
+        self.max_points_spin.setRange(0, 10000000)
+        self.max_points_spin.setSingleStep(10000)
+        self.max_points_spin.setValue(0)
+        self.max_points_spin.setSpecialValueText("不限")
+        self.max_points_spin.setSuffix(" 点")
+        self.max_points_spin.setToolTip("内存中最多保留的数据点数 (0 = 不限)。\n"
+                                        "设置后实时曲线和分析只基于最近的点, 曲线随新数据滚动;\n"
+                                        "完整数据实时写入 autosave 目录下的数据文件。")
+        conn_layout.addRow("内存保留:", self.max_points_spin)
+        
         conn_group.setLayout(conn_layout)
         layout.addWidget(conn_group)
         
@@ -568,6 +809,7 @@ class ElectrochemicalGUI(QMainWindow):
         chart_layout = QVBoxLayout()
         
         self.canvas = PlotCanvas(self, width=8, height=5, dpi=100)
+        chart_layout.addWidget(NavigationToolbar(self.canvas, self))
         chart_layout.addWidget(self.canvas)
         
         chart_group.setLayout(chart_layout)
@@ -642,7 +884,8 @@ class ElectrochemicalGUI(QMainWindow):
         # 获取参数
         params = {
             'port': port,
-            'baudrate': 115200
+            'baudrate': 115200,
+            'max_points': self.max_points_spin.value() or None
         }
         
         if method == 'CV':
@@ -668,10 +911,10 @@ class ElectrochemicalGUI(QMainWindow):
             })
         
         # 重置界面
-        self.current_data = []
+        self.current_data = create_buffer(params['max_points'])
         self.progress_bar.setValue(0)
         self.log_text.clear()
-        self.canvas.plot_data([], method)
+        self.canvas.reset_plot(method)
         
         # 禁用开始按钮
         self.start_btn.setEnabled(False)
@@ -686,6 +929,7 @@ class ElectrochemicalGUI(QMainWindow):
         self.detection_worker = DetectionWorker(method, params)
         self.detection_worker.progress_update.connect(self.on_progress_update)
         self.detection_worker.data_update.connect(self.on_data_update)
+        self.detection_worker.analysis_ready.connect(self.on_analysis_ready)
         self.detection_worker.finished.connect(self.on_detection_finished)
         self.detection_worker.start()
     
@@ -703,11 +947,35 @@ class ElectrochemicalGUI(QMainWindow):
         self.status_label.setText(message)
         self.log_message(message)
     
-    def on_data_update(self, data):
-        """更新数据显示"""
-        self.current_data = data
+    def on_data_update(self, offset, chunk):
+        """
+        追加新数据并更新显示
+
+        Args:
+            offset: 新数据在采集缓冲区中的起始下标
+            chunk: (电位, 电流, 时间戳) 数组
+        """
+        if offset == 0 and self.current_data.total > 0:
+            # 采集重新开始
+            self.current_data = create_buffer(self.detection_worker.params.get('max_points')
+                                               if self.detection_worker else None)
+        elif offset > self.current_data.total and isinstance(self.current_data, RingBuffer):
+            # 有界内存模式: 两次更新之间的新数据超过了保留的点数, 较早的点只在数据文件中
+            self.current_data.skip(offset - self.current_data.total)
+        elif offset != self.current_data.total:
+            self.log_message(f"数据更新不连续: 期望下标 {self.current_data.total}, 收到 {offset}")
+            return
+        
+        voltages, currents, timestamps = chunk
+        self.current_data.extend(voltages, currents, timestamps)
         method = 'CV' if self.method_combo.currentIndex() == 0 else 'DPV'
-        self.canvas.plot_data(data, method)
+        self.canvas.plot_data(self.current_data, method)
+    
+    def on_analysis_ready(self, result):
+        """显示测量结束时的分析结果"""
+        for line in result.summary_lines():
+            self.log_message(line)
+        self.canvas.show_analysis(result)
     
     def on_detection_finished(self, success, message):
         """检测完成"""
@@ -724,7 +992,7 @@ class ElectrochemicalGUI(QMainWindow):
     
     def save_data(self):
         """保存数据到文件"""
-        if not self.current_data:
+        if len(self.current_data) == 0:
             QMessageBox.warning(self, "警告", "没有可保存的数据")
             return
         
@@ -736,17 +1004,23 @@ class ElectrochemicalGUI(QMainWindow):
             self,
             "保存数据",
             default_filename,
-            "CSV 文件 (*.csv);;所有文件 (*.*)"
+            "CSV 文件 (*.csv);;二进制数据文件 (*.ecb);;所有文件 (*.*)"
         )
         
         if filename:
             try:
-                import csv
-                with open(filename, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['电位 (V)', '电流 (μA)'])
-                    for voltage, current in self.current_data:
-                        writer.writerow([voltage, current])
+                # 采集时已完整写入自动保存文件的, 直接复制, 不再重新格式化
+                protocol = self.detection_worker.protocol if self.detection_worker else None
+                stream_file = protocol.stream_file if protocol else None
+                if stream_file and os.path.exists(stream_file) and \
+                        format_from_path(filename) == protocol.stream_format:
+                    shutil.copyfile(stream_file, filename)
+                else:
+                    if self.current_data.first:
+                        self.log_message(f"⚠️ 内存中只保留了最近 {len(self.current_data)} 个点, "
+                                         f"完整数据见自动保存文件: {stream_file or protocol.stream_path}")
+                    write_file(filename, *self.current_data.view(),
+                               columns=('电位 (V)', '电流 (μA)'))
                 
                 self.log_message(f"数据已保存到: {filename}")
                 QMessageBox.information(self, "保存成功", f"数据已保存到:\n{filename}")
@@ -3,133 +3,142 @@
 
 """串口 HEX 日志分析工具"""
 
+import argparse
+import glob
+import hashlib
+import json
 import os
+import shutil
+import sys
 import csv
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 
-def parse_hex_log(log_file):
+# 添加父目录到路径，以便导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.sessions import iter_sessions
+from utils.peak_analysis import analyze_peaks
+from utils.cv_analysis import analyze_cycles, default_hysteresis
+from utils.timing_stats import session_timing, throughput
+from utils.result_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResultCache, code_version, file_digest
+from utils import capture, cv_analysis, frame_parser, hex_log, peak_analysis, sessions, timing_stats
+
+
+def empty_analysis():
     """
-    解析串口 HEX 日志文件
+    空的分析结果 (日志中没有任何命令或响应时仍输出报告)
     
-    Args:
-        log_file: 日志文件路径
-        
     Returns:
-        (发送数据, 接收数据) 元组
+        分析结果字典, 键与 analyze_session 的结果相同 (不含会话信息)
     """
-    with open(log_file, 'r') as f:
-        lines = f.readlines()
-    
-    data_to_send = []
-    data_to_recv = []
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        parts = line.split()
-        if len(parts) >= 3:
-            direction = parts[1]  # VIRT->REAL 或 REAL->VIRT
-            hex_value = parts[2]
-            
-            try:
-                char = chr(int(hex_value, 16))
-                if direction == "VIRT->REAL":
-                    data_to_send.append(char)
-                else:
-                    data_to_recv.append(char)
-            except:
-                pass
-    
-    return ''.join(data_to_send), ''.join(data_to_recv)
+    return {
+        'command': None,
+        'parameters': [],
+        'responses': [],
+        'voltages': np.empty(0),
+        'currents': np.empty(0),
+        'malformed': [],
+        'timing': {},
+        'statistics': {},
+        'peaks': None,
+        'cycles': None,
+    }
 
 
-def analyze_dpv_protocol(send_data, recv_data):
+def compute_statistics(voltages, currents, timing=None):
     """
-    分析 DPV 通信协议
+    计算数据统计
     
     Args:
-        send_data: 发送的数据字符串
-        recv_data: 接收的数据字符串
+        voltages: 电位数组
+        currents: 电流数组
+        timing: 时序统计 (utils.timing_stats), 用于采样频率
         
     Returns:
-        分析结果字典
+        统计字典 (没有数据时为空字典)
     """
-    result = {
-        'command': None,
-        'parameters': [],
-        'responses': [],
-        'data_points': [],
-        'statistics': {}
+    if not len(voltages):
+        return {}
+    rate = (timing or {}).get('effective_rate')
+    return {
+        'total_points': len(voltages),
+        'voltage_min': float(voltages.min()),
+        'voltage_max': float(voltages.max()),
+        'current_min': float(currents.min()),
+        'current_max': float(currents.max()),
+        'current_mean': float(currents.mean()),
+        'sampling_rate': f"{rate:.2f} Hz (按接收时间戳)" if rate else "N/A (时间戳不足以计算)"
     }
+
+
+def analyze_session(session, gap_threshold=None):
+    """
+    分析一个测量会话
     
-    # 解析发送命令
-    if send_data:
-        cmd_line = send_data.split('\r\n')[0]
-        result['command'] = cmd_line
-        
-        # 提取参数
-        if cmd_line.startswith('P'):
-            params = cmd_line[2:].split(',')
-            result['parameters'] = [p.strip() for p in params if p.strip()]
-    
-    # 解析响应
-    if recv_data:
-        lines = recv_data.split('\r\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            if line in ['#', '*', '@']:
-                result['responses'].append(line)
-            elif ',' in line:
-                try:
-                    parts = line.split(',')
-                    if len(parts) >= 2:
-                        voltage = float(parts[0])
-                        current = float(parts[1])
-                        result['data_points'].append({
-                            'voltage': voltage,
-                            'current': current
-                        })
-                except:
-                    pass
-    
-    # 统计数据
-    if result['data_points']:
-        currents = [p['current'] for p in result['data_points']]
-        voltages = [p['voltage'] for p in result['data_points']]
+    Args:
+        session: utils.sessions.Session
+        gap_threshold: 数据间隙阈值 (秒), 默认按有效采样率自动确定
         
-        result['statistics'] = {
-            'total_points': len(result['data_points']),
-            'voltage_min': min(voltages),
-            'voltage_max': max(voltages),
-            'current_min': min(currents),
-            'current_max': max(currents),
-            'current_mean': sum(currents) / len(currents),
-            'sampling_rate': f"≈ {len(result['data_points']) / 5.0:.1f} Hz" if len(result['data_points']) > 0 else "N/A"
-        }
-    
-    return result
+    Returns:
+        分析结果字典, 另含 'session' (会话序号)、'technique'、'complete'、'start_time'、'end_time',
+        以及 CV 会话的 'cycles' (循环分析)
+    """
+    voltages = session.voltages
+    currents = session.currents
+    timing = session_timing(session, gap_threshold)
+    params = session.parameters
+    return {
+        'session': session.index,
+        'technique': session.technique,
+        'complete': session.complete,
+        'start_time': session.start_time,
+        'end_time': session.end_time,
+        'command': session.command,
+        'parameters': session.parameter_fields,
+        'responses': [token for token in session.responses if token in ['#', '*', '@', '$']],
+        'voltages': voltages,
+        'currents': currents,
+        'malformed': session.malformed,
+        'timing': timing,
+        'statistics': compute_statistics(voltages, currents, timing),
+        'peaks': analyze_peaks(voltages, currents)
+        if session.technique == 'DPV' and len(voltages) else None,
+        'cycles': analyze_cycles(
+            voltages, currents,
+            hysteresis=default_hysteresis(params.get('start_v'), params.get('end_v')),
+            scan_rate=params.get('scan_rate'), timestamps=session.timestamps
+        ) if session.technique == 'CV' and len(voltages) else None
+    }
 
 
-def save_analysis_report(analysis_result, output_file):
+def save_analysis_report(analysis_result, output_file, title="DPV 协议分析报告"):
     """
     保存分析报告
     
     Args:
         analysis_result: 分析结果字典
         output_file: 输出文件路径
+        title: 报告标题
     """
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("=" * 70 + "\n")
-        f.write("DPV 协议分析报告\n")
+        f.write(title + "\n")
         f.write("=" * 70 + "\n\n")
         
+        # 会话信息
+        if analysis_result.get('session') and not analysis_result.get('single_session'):
+            f.write("【会话】\n")
+            f.write(f"  序号: {analysis_result['session']}\n")
+            f.write(f"  测量技术: {analysis_result['technique'] or '未知'}\n")
+            f.write(f"  开始时间: {format_timestamp(analysis_result['start_time'])}\n")
+            f.write(f"  结束时间: {format_timestamp(analysis_result['end_time'])}\n")
+            f.write(f"  是否完整: {'是' if analysis_result['complete'] else '否'}\n\n")
+        
         # 命令信息
         f.write("【发送命令】\n")
         f.write(f"命令: {analysis_result['command']}\n\n")
@@ -160,6 +169,8 @@ def save_analysis_report(analysis_result, output_file):
                     f.write(f"  {i+1}. * - 开始扫描\n")
                 elif resp == '@':
                     f.write(f"  {i+1}. @ - 扫描完成\n")
+                elif resp == '$':
+                    f.write(f"  {i+1}. $ - 扫描完成信号\n")
             f.write("\n")
         
         # 数据统计
@@ -173,17 +184,114 @@ def save_analysis_report(analysis_result, output_file):
             f.write(f"  采样频率: {stats.get('sampling_rate', 'N/A')}\n")
             f.write("\n")
         
+        # 时序统计
+        if analysis_result.get('timing', {}).get('duration'):
+            write_timing_section(f, analysis_result['timing'])
+        
+        # 峰分析
+        if analysis_result.get('peaks') is not None:
+            f.write("【峰分析】(基线校正 + Savitzky-Golay 平滑)\n")
+            for line in analysis_result['peaks'].summary_lines():
+                f.write(f"  {line}\n")
+            f.write("\n")
+        
+        # 循环分析
+        if analysis_result.get('cycles') is not None:
+            write_cycle_section(f, analysis_result['cycles'])
+        
+        # 无效数据行
+        if analysis_result['malformed']:
+            f.write(f"【无效数据行】(共 {len(analysis_result['malformed'])} 行, 前 5 行)\n")
+            for line in analysis_result['malformed'][:5]:
+                f.write(f"  {line.decode(errors='replace')}\n")
+            f.write("\n")
+        
         # 数据样本
-        if analysis_result['data_points']:
+        voltages = analysis_result['voltages']
+        currents = analysis_result['currents']
+        if len(voltages):
             f.write("【数据样本】(前 10 条)\n")
             f.write("  电位 (V)    |  电流 (μA)\n")
             f.write("  " + "-" * 25 + "\n")
             
-            for i, point in enumerate(analysis_result['data_points'][:10]):
-                f.write(f"  {point['voltage']:8.4f}   |  {point['current']:8.2f}\n")
+            for voltage, current in zip(voltages[:10].tolist(), currents[:10].tolist()):
+                f.write(f"  {voltage:8.4f}   |  {current:8.2f}\n")
             
-            if len(analysis_result['data_points']) > 10:
-                f.write(f"  ... (共 {len(analysis_result['data_points'])} 条数据)\n")
+            if len(voltages) > 10:
+                f.write(f"  ... (共 {len(voltages)} 条数据)\n")
+
+
+def write_cycle_section(f, cycles, max_rows=50):
+    """
+    写出报告中的 CV 循环分析部分 (摘要 + 逐圈表格)
+    
+    Args:
+        f: 报告文件
+        cycles: utils.cv_analysis.CycleResult
+        max_rows: 逐圈表格的最大行数 (超过时只列出首尾各一半)
+    """
+    f.write("【循环分析】(峰高相对充电电流基线, 电量 = ∫i·dt)\n")
+    for line in cycles.summary_lines():
+        f.write(f"  {line}\n")
+    table = cycles.cycle_table()
+    if len(table) > 1:
+        f.write("\n  圈数 |  Epa (V) |  Epc (V) | ΔEp (mV) | ipa (μA) | ipc (μA) | ipa/ipc |  Qa (μC) |  Qc (μC)\n")
+        f.write("  " + "-" * 94 + "\n")
+        half = max_rows // 2
+        rows = table if len(table) <= max_rows else table[:half] + [None] + table[-half:]
+        for row in rows:
+            if row is None:
+                f.write(f"  ... (共 {len(table)} 圈)\n")
+                continue
+            f.write(f"  {row['cycle']:4d} | {row['epa']:8.4f} | {row['epc']:8.4f} | "
+                    f"{row['delta_ep'] * 1000:8.1f} | {row['ipa']:8.4g} | {row['ipc']:8.4g} | "
+                    f"{row['ratio']:7.3f} | {row['qa']:8.4g} | {row['qc']:8.4g}\n")
+    f.write("\n")
+
+
+def format_ms(seconds):
+    """秒 → 毫秒文本 (None 时返回 N/A)"""
+    return "N/A" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+def write_timing_section(f, timing):
+    """
+    写出报告中的时序统计部分
+    
+    Args:
+        f: 报告文件
+        timing: 时序统计字典 (utils.timing_stats)
+    """
+    f.write("【时序统计】(按接收时间戳)\n")
+    f.write(f"  数据行数: {timing['lines']}\n")
+    f.write(f"  持续时间: {timing['duration']:.3f} s\n")
+    f.write(f"  有效采样率: {timing['effective_rate']:.2f} Hz\n")
+    f.write(f"  行间隔: 平均 {format_ms(timing['interval_mean'])}, "
+            f"标准差 {format_ms(timing['interval_std'])}, 最大 {format_ms(timing['interval_max'])}\n")
+    f.write(f"  行间隔分位数: P50 {format_ms(timing['interval_p50'])}, "
+            f"P90 {format_ms(timing['interval_p90'])}, P99 {format_ms(timing['interval_p99'])}\n")
+    f.write(f"  抖动 (与平均间隔之差): P50 {format_ms(timing['jitter_p50'])}, "
+            f"P90 {format_ms(timing['jitter_p90'])}, P99 {format_ms(timing['jitter_p99'])}\n")
+    f.write(f"  数据间隙 (> {format_ms(timing['gap_threshold'])}): {timing['gap_count']} 处, "
+            f"共 {timing['gap_total']:.3f} s, 最长 {format_ms(timing['gap_longest'])}\n")
+    for start, duration in timing['gaps']:
+        f.write(f"    {format_timestamp(start)}  {format_ms(duration)}\n")
+    if timing['gap_count'] > len(timing['gaps']):
+        f.write(f"    ... (共 {timing['gap_count']} 处)\n")
+    if timing.get('throughput') is not None:
+        f.write(f"  吞吐量: {timing['throughput']:.1f} 字节/秒 ({timing['recv_bytes']} 字节)\n")
+    if 'latency_start' in timing:
+        f.write(f"  延迟: 参数帧 → # {format_ms(timing['latency_ack'])}, "
+                f"开始命令 → * {format_ms(timing['latency_start'])}, "
+                f"开始命令 → 首个数据行 {format_ms(timing['latency_first_data'])}\n")
+    f.write("\n")
+
+
+def format_timestamp(timestamp):
+    """把 Unix 时间戳格式化为本地时间 (无效时返回 N/A)"""
+    if timestamp is None or np.isnan(timestamp):
+        return "N/A"
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
 
 def save_data_to_csv(analysis_result, output_file):
@@ -198,56 +306,349 @@ def save_data_to_csv(analysis_result, output_file):
         writer = csv.writer(f)
         writer.writerow(['电位(V)', '电流(μA)'])
         
-        for point in analysis_result['data_points']:
-            writer.writerow([point['voltage'], point['current']])
+        writer.writerows(zip(analysis_result['voltages'].tolist(),
+                             analysis_result['currents'].tolist()))
+
+
+def analyze_file(log_file, output_dir, verbose=True, gap_threshold=None, cache=None,
+                 content_hash=None):
+    """
+    分析一个日志文件并写出报告和数据
+    
+    Args:
+        log_file: HEX 日志或 .ecap 抓包文件
+        output_dir: 输出目录
+        verbose: 是否在控制台显示过程和摘要
+        gap_threshold: 数据间隙阈值 (秒), 默认按有效采样率自动确定
+        cache: ResultCache, 缓存各会话的解析和分析结果 (None = 不使用缓存)
+        content_hash: 文件内容的 SHA-256 (已计算过时传入, 避免重复读取文件)
+        
+    Returns:
+        各会话的摘要字典列表 (见 session_summary)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output = SessionOutputWriter(output_dir, verbose=verbose)
+    
+    key = None
+    cached = None
+    if cache is not None:
+        key = ResultCache.key(content_hash or file_digest(log_file), 'sessions',
+                              {'gap_threshold': gap_threshold}, analysis_code_version())
+        cached = cache.get(key)
+    
+    if cached is not None:
+        if verbose:
+            print("\n📊 使用缓存的分析结果 (日志内容、参数和分析代码均未变化)")
+        analyses, totals = cached
+        for analysis in analyses:
+            output.add_analysis(analysis)
+    else:
+        # 流式切分测量会话, 每个会话完成后立即输出
+        if verbose:
+            print("\n📊 分析协议 (按测量会话切分)...")
+        totals = {}
+        analyses = [] if cache is not None else None
+        for session in iter_sessions(log_file, totals):
+            analysis = analyze_session(session, gap_threshold)
+            if analyses is not None:
+                analyses.append(analysis)
+            output.add_analysis(analysis)
+        if cache is not None:
+            cache.put(key, (analyses, totals))
+    output.finish()
+    
+    if not verbose:
+        return output.summaries
+    
+    if totals.get('skipped_lines'):
+        print(f"   ⚠️  跳过 {totals['skipped_lines']} 行无法解析的日志")
+    print(f"   发送数据长度: {totals['send_bytes']} 字节")
+    print(f"   接收数据长度: {totals['recv_bytes']} 字节")
+    
+    # 显示摘要
+    print("\n" + "=" * 70)
+    print("分析摘要")
+    print("=" * 70)
+    if output.count == 1:
+        print_analysis_summary(output.last_analysis)
+    else:
+        print(f"会话数: {output.count}")
+        shown = output.summaries[:SUMMARY_ROWS]
+        for summary in shown:
+            print(f"  会话 {summary['session']:3d}: {summary['technique']:4s} "
+                  f"{format_timestamp(summary['start_time'])}  数据点 {summary['points']:6d}  "
+                  f"{'完整' if summary['complete'] else '不完整'}")
+        if output.count > len(shown):
+            print(f"  ... 其余 {output.count - len(shown)} 个会话见 sessions_summary.csv")
+    return output.summaries
+
+
+def analysis_code_version():
+    """缓存用的代码版本: 本工具和参与解析/分析的模块的源码哈希"""
+    return code_version([sys.modules[__name__], capture, cv_analysis, frame_parser, hex_log,
+                         peak_analysis, sessions, timing_stats])
+
+
+def open_cache(args):
+    """按命令行参数打开结果缓存 (--no-cache 时为 None)"""
+    if args.no_cache:
+        return None
+    try:
+        return ResultCache(args.cache_dir, int(args.cache_size * (1 << 20)))
+    except OSError as e:
+        print(f"⚠️  无法使用缓存目录 {args.cache_dir}: {e}")
+        return None
 
 
 def main():
     """主函数"""
-    import sys
+    parser = argparse.ArgumentParser(
+        description='串口日志分析工具 (单个文件, 或目录/通配符批量分析)',
+        epilog='兼容旧用法: analyze_serial_log.py <日志文件> [输出目录]')
+    parser.add_argument('paths', nargs='+', help='HEX 日志/.ecap 抓包文件、目录或通配符 (如 "logs/**/*.ecap")')
+    parser.add_argument('-o', '--output', help='输出目录 (默认: 当前目录)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='批量分析的并行进程数 (默认: CPU 核数)')
+    parser.add_argument('--check', choices=['mtime', 'hash'], default='mtime',
+                        help='批量分析时判断结果是否最新的方式 (默认: mtime = 大小和修改时间)')
+    parser.add_argument('--force', action='store_true', help='批量分析时重新分析所有文件')
+    parser.add_argument('--gap', type=float, default=None,
+                        help='数据间隙阈值 (秒, 默认: 5 倍平均行间隔)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'分析结果缓存目录 (默认: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / (1 << 20),
+                        help=f'缓存总大小上限 (MB, 默认: {DEFAULT_MAX_BYTES >> 20}), 超出时淘汰最久未用的结果')
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不写入缓存')
     
-    if len(sys.argv) < 2:
-        print("使用方法: python analyze_serial_log.py <hex_log_file> [output_dir]")
-        print("\n示例:")
-        print("  python analyze_serial_log.py serial_log.hex")
-        print("  python analyze_serial_log.py serial_log.hex ./analysis")
-        sys.exit(1)
+    args = parser.parse_args()
+    
+    paths = args.paths
+    output_dir = args.output
+    if output_dir is None and len(paths) == 2 and not os.path.isfile(paths[1]) and \
+            not glob.has_magic(paths[1]):
+        # 旧用法: <日志文件> <输出目录>
+        paths, output_dir = paths[:1], paths[1]
+    output_dir = output_dir or "."
+    cache = open_cache(args)
     
-    log_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "."
+    if len(paths) == 1 and os.path.isfile(paths[0]):
+        log_file = paths[0]
+        print(f"📖 正在分析日志文件: {log_file}")
+        analyze_file(log_file, output_dir, gap_threshold=args.gap, cache=cache)
+        return
     
-    if not os.path.exists(log_file):
-        print(f"错误: 文件不存在 - {log_file}")
+    files = collect_log_files(paths)
+    if not files:
+        print(f"错误: 没有找到日志文件 - {' '.join(paths)}")
         sys.exit(1)
+    run_batch(files, output_dir, jobs=args.jobs, check=args.check, force=args.force,
+              gap_threshold=args.gap, cache=cache)
+
+
+LOG_EXTENSIONS = ('.hex', '.ecap', '.log', '.txt')  # 目录中按扩展名查找的日志文件
+MANIFEST_FILE = "batch_manifest.json"
+BATCH_SUMMARY_FILE = "batch_summary.csv"
+
+
+def collect_log_files(paths):
+    """
+    展开目录和通配符, 返回去重、排序后的日志文件列表
     
+    Args:
+        paths: 文件、目录或通配符列表 (目录递归查找 LOG_EXTENSIONS 中的文件)
+    """
+    files = []
+    for path in paths:
+        if glob.has_magic(path):
+            files.extend(p for p in glob.glob(path, recursive=True) if os.path.isfile(p))
+        elif os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names
+                             if name.lower().endswith(LOG_EXTENSIONS))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"   ⚠️  文件不存在 - {path}")
+    return sorted(set(os.path.abspath(f) for f in files))
+
+
+def load_manifest(output_dir):
+    """读取批量分析清单 (不存在或损坏时返回空清单)"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+
+
+def save_manifest(output_dir, manifest):
+    """原子地写出批量分析清单 (每完成一个文件写一次, 中断后可续跑)"""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    temp = path + ".tmp"
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp, path)
+
+
+def output_name(source, used):
+    """为日志文件选择输出子目录名 (文件名, 重名时附加路径哈希)"""
+    name = Path(source).stem
+    if name in used:
+        name = f"{name}_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+def analyze_batch_file(source, output_dir, gap_threshold=None, cache=None, content_hash=None):
+    """
+    批量分析的工作进程入口 (参数见 analyze_file)
+    
+    Returns:
+        (source, 会话摘要列表, 用时, 错误信息)
+    """
+    start = time.perf_counter()
+    try:
+        # 清除上次分析的结果 (会话数可能变化)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        summaries = analyze_file(source, output_dir, verbose=False, gap_threshold=gap_threshold,
+                                 cache=cache, content_hash=content_hash)
+    except Exception as e:
+        return source, [], time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return source, summaries, time.perf_counter() - start, None
+
+
+def run_batch(files, output_dir, jobs=None, check='mtime', force=False, gap_threshold=None,
+              cache=None):
+    """
+    并行分析多个日志文件
+    
+    每个文件的结果写入 output_dir/<文件名>/, 汇总表写入 output_dir/batch_summary.csv。
+    已分析过且源文件未变化 (大小和修改时间, 或内容哈希) 的文件直接跳过, 结果从清单中读取。
+    
+    Args:
+        files: 日志文件绝对路径列表
+        output_dir: 输出目录
+        jobs: 并行进程数 (默认: CPU 核数; 1 = 在当前进程中顺序分析)
+        check: 'mtime' 或 'hash'
+        force: 是否忽略清单, 重新分析所有文件
+        gap_threshold: 数据间隙阈值 (秒), 默认按有效采样率自动确定
+        cache: ResultCache (--force 或清单缺失时, 内容未变的文件仍可从缓存直接输出)
+    """
     os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    entries = manifest.setdefault('files', {})
+    used = {entry['output'] for entry in entries.values()}
     
-    print(f"📖 正在分析日志文件: {log_file}")
+    pending = []
+    for source in files:
+        stat = os.stat(source)
+        entry = entries.get(source)
+        fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        if check == 'hash':
+            fingerprint['sha256'] = file_digest(source)
+        
+        if entry is None:
+            entry = {'output': output_name(source, used)}
+            used.add(entry['output'])
+        
+        up_to_date = not force and entry.get('error') is None and 'sessions' in entry and \
+            os.path.isdir(os.path.join(output_dir, entry['output']))
+        if up_to_date:
+            if check == 'hash' and 'sha256' in entry:
+                up_to_date = entry['sha256'] == fingerprint['sha256']
+            else:
+                up_to_date = entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime
+        entry.update(fingerprint)
+        entries[source] = entry
+        if not up_to_date:
+            entry.pop('sessions', None)
+            pending.append(source)
     
-    # 解析日志
-    send_data, recv_data = parse_hex_log(log_file)
-    print(f"   发送数据长度: {len(send_data)} 字节")
-    print(f"   接收数据长度: {len(recv_data)} 字节")
+    skipped = len(files) - len(pending)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(pending) or 1))
+    print(f"📂 批量分析 {len(files)} 个文件: {len(pending)} 个待分析, {skipped} 个已是最新 "
+          f"(并行 {jobs} 个进程)")
+    save_manifest(output_dir, manifest)
     
-    # 分析协议
-    print("\n📊 分析 DPV 协议...")
-    analysis = analyze_dpv_protocol(send_data, recv_data)
+    def record(result, done):
+        source, summaries, elapsed, error = result
+        entry = entries[source]
+        entry['error'] = error
+        entry['analyzed'] = datetime.now().isoformat(timespec='seconds')
+        if error:
+            print(f"   [{done}/{len(pending)}] ❌ {source}: {error}")
+        else:
+            entry['sessions'] = summaries
+            points = sum(summary['points'] for summary in summaries)
+            print(f"   [{done}/{len(pending)}] ✓ {source} ({len(summaries)} 个会话, "
+                  f"{points} 个数据点, {elapsed:.2f} 秒)")
+        save_manifest(output_dir, manifest)
     
-    # 保存报告
-    report_file = os.path.join(output_dir, "analysis_report.txt")
-    save_analysis_report(analysis, report_file)
-    print(f"   ✓ 报告已保存: {report_file}")
+    def content_hash(source):
+        # 只有 hash 模式下清单中的哈希是本次计算的
+        return entries[source].get('sha256') if check == 'hash' else None
     
-    # 保存数据
-    if analysis['data_points']:
-        csv_file = os.path.join(output_dir, "dpv_data.csv")
-        save_data_to_csv(analysis, csv_file)
-        print(f"   ✓ 数据已保存: {csv_file}")
+    start = time.perf_counter()
+    if jobs == 1:
+        for done, source in enumerate(pending, 1):
+            record(analyze_batch_file(source, os.path.join(output_dir, entries[source]['output']),
+                                      gap_threshold, cache, content_hash(source)), done)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(analyze_batch_file, source,
+                                   os.path.join(output_dir, entries[source]['output']),
+                                   gap_threshold, cache, content_hash(source))
+                       for source in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                record(future.result(), done)
+    elapsed = time.perf_counter() - start
     
-    # 显示摘要
-    print("\n" + "=" * 70)
-    print("分析摘要")
-    print("=" * 70)
+    summary_file = os.path.join(output_dir, BATCH_SUMMARY_FILE)
+    errors = save_batch_summary(files, entries, summary_file)
+    print(f"\n✓ 汇总表已保存: {summary_file}")
+    print(f"   分析 {len(pending)} 个文件, 用时 {elapsed:.1f} 秒; 跳过 {skipped} 个"
+          + (f"; ❌ {errors} 个失败" if errors else ""))
+
+
+def save_batch_summary(files, entries, summary_file):
+    """
+    写出批量分析汇总表 (每个会话一行)
+    
+    Returns:
+        分析失败的文件数
+    """
+    errors = 0
+    with open(summary_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['文件', '输出目录', '会话', '测量技术', '开始时间', '数据点数',
+                         '电位最小(V)', '电位最大(V)', '电流最小(μA)', '电流最大(μA)',
+                         '平均电流(μA)', '采样频率(Hz)', '抖动P99(ms)', '间隙数', '最长间隙(ms)',
+                         '吞吐量(B/s)', '启动延迟(ms)', '首数据延迟(ms)', '峰数', '主峰电位(V)',
+                         '主峰高度(μA)', '主峰面积(μA·V)', '循环数', '末圈ΔEp(mV)', '末圈ipa/ipc',
+                         '是否完整', '错误'])
+        for source in files:
+            entry = entries[source]
+            if entry.get('error'):
+                errors += 1
+                writer.writerow([source, entry['output']] + [''] * 24 + [entry['error']])
+                continue
+            for summary in entry.get('sessions', []):
+                writer.writerow([
+                    source, entry['output'], summary['session'], summary['technique'],
+                    format_timestamp(summary['start_time']), summary['points'],
+                    summary['voltage_min'], summary['voltage_max'],
+                    summary['current_min'], summary['current_max'], summary['current_mean'],
+                    summary['sampling_rate'], summary['jitter_p99_ms'], summary['gap_count'],
+                    summary['gap_longest_ms'], summary['throughput'], summary['latency_start_ms'],
+                    summary['latency_first_data_ms'], summary['peak_count'],
+                    summary['peak_potential'], summary['peak_height'], summary['peak_area'],
+                    summary.get('cycle_count'), summary.get('delta_ep_mv'), summary.get('ipa_ipc'),
+                    summary['complete'], ''
+                ])
+    return errors
+
+
+def print_analysis_summary(analysis):
+    """在控制台显示单个会话的摘要"""
     print(f"命令: {analysis['command']}")
     print(f"参数数量: {len(analysis['parameters'])}")
     print(f"设备响应: {', '.join(analysis['responses'])}")
@@ -259,6 +660,156 @@ def main():
         print(f"电流范围: {stats['current_min']:.2f} ~ {stats['current_max']:.2f} μA")
         print(f"平均电流: {stats['current_mean']:.4f} μA")
         print(f"采样频率: {stats['sampling_rate']}")
+    
+    if analysis.get('peaks') is not None:
+        for line in analysis['peaks'].summary_lines():
+            print(line)
+    
+    if analysis.get('cycles') is not None:
+        for line in analysis['cycles'].summary_lines():
+            print(line)
+    
+    timing = analysis.get('timing', {})
+    if timing.get('duration'):
+        print(f"行间隔抖动: P50 {format_ms(timing['jitter_p50'])}, P99 {format_ms(timing['jitter_p99'])}")
+        print(f"数据间隙: {timing['gap_count']} 处, 最长 {format_ms(timing['gap_longest'])}")
+    if timing.get('throughput') is not None:
+        print(f"吞吐量: {timing['throughput']:.1f} 字节/秒")
+    if timing.get('latency_start') is not None or timing.get('latency_first_data') is not None:
+        print(f"启动延迟: 开始命令 → * {format_ms(timing.get('latency_start'))}, "
+              f"→ 首个数据行 {format_ms(timing.get('latency_first_data'))}")
+
+
+SUMMARY_ROWS = 20  # 控制台摘要中显示的会话数
+
+
+class SessionOutputWriter:
+    """
+    逐个写出会话的分析结果
+    
+    只有一个会话时输出到 output_dir (analysis_report.txt + dpv_data.csv, 与单次测量日志的原有布局相同);
+    有多个会话时每个会话输出到 session_NN/ 子目录, 并在 output_dir 写出 sessions_summary.csv。
+    第一个会话暂缓一步写出, 直到确定日志中是否还有其他会话。
+    """
+    
+    def __init__(self, output_dir, verbose=True):
+        self.output_dir = output_dir
+        self.verbose = verbose
+        self.count = 0
+        self.summaries = []
+        self.last_analysis = None
+        self._pending = None
+    
+    def add_analysis(self, analysis):
+        self.count += 1
+        self.last_analysis = analysis
+        if self.count == 1:
+            self._pending = analysis
+            return
+        if self._pending is not None:
+            self._write(self._pending, single=False)
+            self._pending = None
+        self._write(analysis, single=False)
+    
+    def finish(self):
+        if self._pending is not None:
+            self._write(self._pending, single=True)
+            self._pending = None
+        if self.count == 0:
+            # 日志中没有任何命令或响应, 仍然输出空报告
+            self._write(empty_analysis(), single=True)
+        if self.count > 1:
+            summary_file = os.path.join(self.output_dir, "sessions_summary.csv")
+            with open(summary_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['会话', '测量技术', '开始时间', '结束时间', '数据点数', '是否完整', '命令'])
+                for summary in self.summaries:
+                    writer.writerow([summary['session'], summary['technique'],
+                                     format_timestamp(summary['start_time']),
+                                     format_timestamp(summary['end_time']), summary['points'],
+                                     summary['complete'], summary['command']])
+            if self.verbose:
+                print(f"   ✓ 会话汇总已保存: {summary_file}")
+    
+    def _write(self, analysis, single):
+        technique = analysis.get('technique') or 'DPV'
+        if single:
+            directory = self.output_dir
+            title = f"{technique} 协议分析报告"
+            analysis['single_session'] = True
+        else:
+            directory = os.path.join(self.output_dir, f"session_{analysis['session']:02d}")
+            os.makedirs(directory, exist_ok=True)
+            title = f"{technique} 协议分析报告 - 会话 {analysis['session']}"
+        
+        report_file = os.path.join(directory, "analysis_report.txt")
+        save_analysis_report(analysis, report_file, title=title)
+        if self.verbose:
+            print(f"   ✓ 报告已保存: {report_file}")
+        
+        if len(analysis['voltages']):
+            csv_file = os.path.join(directory, f"{technique.lower()}_data.csv")
+            save_data_to_csv(analysis, csv_file)
+            if self.verbose:
+                print(f"   ✓ 数据已保存: {csv_file}")
+        
+        if analysis.get('session'):
+            self.summaries.append(session_summary(analysis))
+
+
+def session_summary(analysis):
+    """
+    会话摘要 (用于会话汇总表和批量分析汇总表, 可 JSON 序列化)
+    
+    Args:
+        analysis: analyze_session 的结果
+    """
+    stats = analysis['statistics']
+    timing = analysis['timing']
+    peaks = analysis.get('peaks')
+    main_peak = peaks.main_peak if peaks is not None else None
+    cycles = analysis.get('cycles')
+    last_cycle = cycles.cycle_table()[-1] if cycles is not None and len(cycles) else None
+    return {
+        'session': analysis['session'],
+        'technique': analysis['technique'] or 'DPV',
+        'start_time': none_if_nan(analysis['start_time']),
+        'end_time': none_if_nan(analysis['end_time']),
+        'points': stats.get('total_points', 0),
+        'voltage_min': stats.get('voltage_min'),
+        'voltage_max': stats.get('voltage_max'),
+        'current_min': stats.get('current_min'),
+        'current_max': stats.get('current_max'),
+        'current_mean': stats.get('current_mean'),
+        'sampling_rate': timing.get('effective_rate'),
+        'jitter_p99_ms': to_ms(timing.get('jitter_p99')),
+        'gap_count': timing.get('gap_count'),
+        'gap_longest_ms': to_ms(timing.get('gap_longest')),
+        'throughput': timing.get('throughput'),
+        'latency_start_ms': to_ms(timing.get('latency_start')),
+        'latency_first_data_ms': to_ms(timing.get('latency_first_data')),
+        'peak_count': len(peaks) if peaks is not None else None,
+        'peak_potential': main_peak.potential if main_peak else None,
+        'peak_height': main_peak.height if main_peak else None,
+        'peak_area': main_peak.area if main_peak else None,
+        'cycle_count': len(cycles) if cycles is not None else None,
+        'delta_ep_mv': round(last_cycle['delta_ep'] * 1000, 3) if last_cycle else None,
+        'ipa_ipc': none_if_nan(last_cycle['ratio']) if last_cycle else None,
+        'complete': analysis['complete'],
+        'command': analysis['command'],
+    }
+
+
+def to_ms(seconds):
+    """秒 → 毫秒 (保留 3 位小数, None 保持不变)"""
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def none_if_nan(value):
+    """NaN → None (JSON 中没有 NaN)"""
+    if value is None or np.isnan(value):
+        return None
+    return float(value)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""把 HEX 文本串口日志转换为二进制抓包文件 (.ecap)"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加父目录到路径，以便导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.capture import convert_hex_log
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='把 HEX 文本串口日志转换为二进制抓包文件 (.ecap)')
+    parser.add_argument('hex_log', nargs='+', help='HEX 日志文件')
+    parser.add_argument('-o', '--output', help='输出文件 (仅转换单个文件时, 默认: 同名 .ecap)')
+    parser.add_argument('--no-compress', action='store_false', dest='compress', help='不压缩数据块')
+
+    args = parser.parse_args()
+
+    if args.output and len(args.hex_log) > 1:
+        print("❌ 错误: 转换多个文件时不能指定 -o")
+        sys.exit(1)
+
+    for hex_log in args.hex_log:
+        if not os.path.exists(hex_log):
+            print(f"错误: 文件不存在 - {hex_log}")
+            sys.exit(1)
+
+        output = args.output or os.path.splitext(hex_log)[0] + ".ecap"
+        start = time.perf_counter()
+        writer = convert_hex_log(hex_log, output, compress=args.compress)
+        elapsed = time.perf_counter() - start
+
+        source_size = os.path.getsize(hex_log)
+        output_size = os.path.getsize(output)
+        print(f"✓ {hex_log} → {output}")
+        print(f"   {writer.records} 条记录, {writer.payload_bytes} 字节数据, "
+              f"{source_size} → {output_size} 字节 ({source_size / max(output_size, 1):.1f}x), "
+              f"用时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils import ElectrochemicalProtocol, run_cv_test
+from utils.metrics import REGISTRY, configure_logging
 
 def main():
     """主函数"""
@@ -22,6 +23,24 @@ def main():
     parser.add_argument('--no-save', action='store_false', dest='save_data', help='不保存数据')
     parser.add_argument('--save-plot', action='store_true', default=True, help='保存图形到文件 (默认: 是)')
     parser.add_argument('--no-plot', action='store_false', dest='save_plot', help='不保存图形')
+    parser.add_argument('--read-mode', choices=['line', 'bulk'], default='line',
+                        help='串口读取方式: line=逐行读取, bulk=批量读取 (高波特率/高采样率时使用)')
+    parser.add_argument('--sim-seed', type=int, default=0, help='模拟模式随机数种子 (默认: 0)')
+    parser.add_argument('--sim-speed', type=float, default=1.0,
+                        help='模拟模式倍速 (默认: 1=实时, 0=尽可能快)')
+    parser.add_argument('--data-format', choices=['csv', 'binary'], default='csv',
+                        help='数据文件格式: csv 或 binary (.ecb 二进制列式), 采集过程中实时写入 (默认: csv)')
+    parser.add_argument('--max-points', type=int, default=None, metavar='N',
+                        help='有界内存模式: 内存中只保留最近 N 个点 (实时分析和曲线图基于这些点), '
+                             '完整数据只在数据文件中 (默认: 不限)')
+    parser.add_argument('--capture', metavar='FILE', default=None,
+                        help='记录串口收发原始数据到抓包文件 (.ecap), 可用 analyze_serial_log.py 分析')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='日志级别: INFO 显示采集进度, WARNING 只显示问题 (默认: INFO)')
+    parser.add_argument('--metrics-file', metavar='FILE', default=None,
+                        help='结束时写出运行指标 (.json, 或 .prom 为 Prometheus 文本格式)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='运行期间在本机该端口提供运行指标 (/metrics, /metrics.json)')
     
     args = parser.parse_args()
     
@@ -34,6 +53,15 @@ def main():
         print("  python cv_protocol.py -p /dev/ttyUSB0       # Linux串口")
         return
     
+    if args.max_points is not None and (args.max_points < 1 or not args.save_data):
+        print("❌ 错误: --max-points 必须为正数, 且不能与 --no-save 同时使用 (完整数据只写入数据文件)")
+        sys.exit(1)
+    
+    configure_logging(args.log_level)
+    if args.metrics_port is not None:
+        port = REGISTRY.serve(args.metrics_port)
+        print(f"📈 运行指标: http://127.0.0.1:{port}/metrics")
+    
     # 运行测试
     success = run_cv_test(
         port=args.port,
@@ -44,9 +72,19 @@ def main():
         cycles=args.cycles,
         current_range=args.current_range,
         save_data=args.save_data,
-        save_plot=args.save_plot
+        save_plot=args.save_plot,
+        read_mode=args.read_mode,
+        sim_seed=args.sim_seed,
+        sim_speed=args.sim_speed,
+        data_format=args.data_format,
+        capture_path=args.capture,
+        max_points=args.max_points
     )
     
+    if args.metrics_file:
+        REGISTRY.write(args.metrics_file)
+        print(f"✓ 运行指标已保存: {args.metrics_file}")
+    
     if not success:
         print("❌ 测试失败")
         sys.exit(1)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""多设备并发采集工具: 在一个进程中同时驱动多台电化学工作站"""
+
+import argparse
+import json
+import sys
+import os
+import time
+
+# 添加父目录到路径，以便导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.acquisition import AcquisitionEngine, save_plot_file
+from utils.data_store import FORMAT_EXTENSIONS
+from utils.instrument_manager import Instrument, InstrumentManager
+from utils.metrics import REGISTRY, configure_logging
+from utils.sequence import TECHNIQUES
+
+SUMMARY_FILE = "multi_acquire_summary.json"
+
+
+def parse_value(text):
+    """命令行参数值: 按 JSON 解析 (数字、列表等), 失败时作为字符串"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_devices(specs):
+    """
+    解析 --device NAME=PORT 列表
+
+    Returns:
+        [(名称, 串口)]
+    """
+    devices = []
+    for spec in specs:
+        name, sep, port = spec.partition('=')
+        if not sep:
+            name, port = os.path.basename(spec), spec
+        if not name or not port:
+            raise ValueError(f"设备格式应为 NAME=PORT: {spec}")
+        devices.append((name, port))
+    return devices
+
+
+def print_metrics(metrics):
+    """输出一行汇总统计"""
+    utilization = metrics['loop_utilization'] or 0.0
+    print(f"📊 {metrics['elapsed_s']:7.1f}s  采集中 {metrics['active']}/{metrics['connected']}  "
+          f"{metrics['points_total']} 点 ({metrics['points_per_s'] or 0:.0f} 点/s)  "
+          f"{(metrics['bytes_per_s'] or 0) / 1024:.1f} KB/s  I/O 线程占用 {utilization:.1%}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='多设备并发采集工具 (一个 I/O 线程同时驱动多个串口, 各设备数据分别写入文件)')
+    parser.add_argument('-d', '--device', action='append', default=[], metavar='NAME=PORT',
+                        help='设备名称和串口 (可重复, 如: -d cell1=COM3 -d cell2=COM4)')
+    parser.add_argument('-s', '--simulate', type=int, default=0, metavar='N',
+                        help='添加 N 台模拟设备 (sim01 ~ simNN)')
+    parser.add_argument('-t', '--technique', choices=sorted(TECHNIQUES), default='CV',
+                        help='测量技术 (默认: CV)')
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                        help='测量参数 (可重复, 如: --param scan_rate=0.1 --param cycles=3)')
+    parser.add_argument('-b', '--baudrate', type=int, default=115200, help='波特率 (默认: 115200)')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='采集超时 (秒, 默认: 测量技术的默认值)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='输出目录 (默认: multi_YYYYMMDD_HHMMSS)')
+    parser.add_argument('--data-format', choices=['csv', 'binary'], default='csv',
+                        help='数据文件格式: csv 或 binary (.ecb 二进制列式), 采集过程中实时写入 (默认: csv)')
+    parser.add_argument('--max-points', type=int, default=None, metavar='N',
+                        help='有界内存模式: 内存中只保留最近 N 个点 (实时分析和曲线图基于这些点), '
+                             '完整数据只在数据文件中 (默认: 不限)')
+    parser.add_argument('--no-plot', action='store_false', dest='plot', help='不输出曲线图')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='汇总统计的输出间隔 (秒, 默认: 2)')
+    parser.add_argument('--sim-seed', type=int, default=0, help='模拟模式随机数种子 (默认: 0, 各设备依次加 1)')
+    parser.add_argument('--sim-speed', type=float, default=1.0,
+                        help='模拟模式倍速 (默认: 1=实时, 0=尽可能快)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='日志级别: INFO 显示采集进度, WARNING 只显示问题 (默认: INFO)')
+    parser.add_argument('--metrics-file', metavar='FILE', default=None,
+                        help='结束时写出运行指标 (.json, 或 .prom 为 Prometheus 文本格式)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='运行期间在本机该端口提供运行指标 (/metrics, /metrics.json)')
+
+    args = parser.parse_args()
+
+    try:
+        devices = parse_devices(args.device)
+        params = {}
+        for spec in args.param:
+            key, sep, value = spec.partition('=')
+            if not sep:
+                raise ValueError(f"参数格式应为 KEY=VALUE: {spec}")
+            params[key.strip()] = parse_value(value)
+        technique_class = TECHNIQUES[args.technique]
+        technique_class().build_parameter_frame(**params)
+    except (ValueError, TypeError) as e:
+        print(f"❌ 参数错误: {e}")
+        sys.exit(1)
+
+    if args.max_points is not None and args.max_points < 1:
+        print("❌ 错误: --max-points 必须为正数")
+        sys.exit(1)
+
+    devices += [(f"sim{i:02d}", None) for i in range(1, args.simulate + 1)]
+    if not devices:
+        print("❌ 错误: 请用 -d 指定设备或用 -s N 添加模拟设备")
+        sys.exit(1)
+    names = [name for name, _ in devices]
+    if len(set(names)) != len(names):
+        print("❌ 错误: 设备名称重复")
+        sys.exit(1)
+
+    configure_logging(args.log_level)
+    if args.metrics_port is not None:
+        port = REGISTRY.serve(args.metrics_port)
+        print(f"📈 运行指标: http://127.0.0.1:{port}/metrics")
+
+    output_dir = args.output or time.strftime("multi_%Y%m%d_%H%M%S")
+    os.makedirs(output_dir, exist_ok=True)
+    extension = FORMAT_EXTENSIONS[args.data_format]
+
+    manager = InstrumentManager()
+    for number, (name, port) in enumerate(devices):
+        engine = AcquisitionEngine(port=port, baudrate=args.baudrate, simulate=port is None,
+                                   technique=technique_class(),
+                                   sim_seed=args.sim_seed + number, sim_speed=args.sim_speed,
+                                   stream_format=args.data_format,
+                                   stream_path=os.path.join(output_dir, name + extension), name=name,
+                                   max_points=args.max_points)
+        manager.add(name, engine)
+
+    print(f"🔌 连接 {len(devices)} 台设备 ({args.technique})")
+    if not manager.open():
+        print("❌ 没有可用的设备")
+        manager.close()
+        sys.exit(1)
+
+    try:
+        manager.start_all(params, timeout=args.timeout)
+        while not manager.wait(timeout=args.interval):
+            print_metrics(manager.metrics())
+    except KeyboardInterrupt:
+        print("\n⏹️  用户中断")
+    finally:
+        metrics = manager.metrics()
+        manager.close()
+    print_metrics(metrics)
+
+    # 曲线图和分析摘要 (采集全部结束后在主线程中生成)
+    for item in metrics['instruments']:
+        engine = manager.instruments[item['name']].engine
+        analysis = engine.analysis
+        item['analysis'] = analysis.summary_lines() if analysis is not None else None
+        item['plot_file'] = None
+        if args.plot and item['points']:
+            path = os.path.join(output_dir, item['name'] + ".png")
+            save_plot_file(path, f"{engine.technique.title} - {item['name']}",
+                           engine.data_buffer.voltages, engine.data_buffer.currents, analysis,
+                           total=engine.data_buffer.total)
+            item['plot_file'] = os.path.basename(path)
+
+    summary = dict(metrics, technique=args.technique, parameters=params,
+                   finished=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    summary_path = os.path.join(output_dir, SUMMARY_FILE)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=1, default=str)
+    if args.metrics_file:
+        REGISTRY.write(args.metrics_file)
+        print(f"✓ 运行指标已保存: {args.metrics_file}")
+
+    print("\n" + "=" * 50)
+    failed = [item for item in metrics['instruments'] if item['status'] != Instrument.COMPLETE]
+    for item in metrics['instruments']:
+        mark = "✓" if item['status'] == Instrument.COMPLETE else "❌"
+        detail = f" - {item['error']}" if item['error'] else ""
+        print(f"{mark} {item['name']:10s} {item['points']:8d} 点  {item['elapsed_s'] or 0:7.1f}s{detail}")
+    print(f"✅ 完成 {len(metrics['instruments']) - len(failed)} 台, 失败 {len(failed)} 台")
+    print(f"✓ 结果汇总: {summary_path}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
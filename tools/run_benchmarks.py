@@ -0,0 +1,562 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""性能基准测试: 数据解析、数据缓冲、数据保存、实时绘图和日志分析的热路径
+
+数据来自带种子的模拟设备 (CV/DPV) 和放大 N 倍的 logs/serial_log.hex, 同一台机器上结果可重复。
+结果保存为 JSON (附 git 提交和运行环境), 可与其他提交的结果对比::
+
+    python tools/run_benchmarks.py -o before.json
+    python tools/run_benchmarks.py -o after.json --compare before.json
+    python tools/run_benchmarks.py --compare before.json after.json     # 只对比, 不运行
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+# 添加父目录到路径，以便导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.acquisition import AcquisitionEngine, ProtocolState
+from utils.data_buffer import DataBuffer
+from utils.data_store import open_stream_writer
+from utils.hex_log import read_hex_log
+from utils.sequence import TECHNIQUES
+from utils.simulator import SimulatedDevice
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LOG = os.path.join(ROOT, 'logs', 'serial_log.hex')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')  # 默认结果目录 (不纳入版本库)
+RESULT_VERSION = 1
+GROUPS = ('parse', 'memory', 'write', 'log', 'plot')
+LINE_BATCH = 256            # 逐行读取模式每次放入响应队列的最大行数 (与读取线程一致)
+READ_CHUNK = 65536          # 外部 I/O 线程单次读取的字节数
+EXTEND_BLOCK = 4096         # 批量读取模式每批的点数
+PLOT_FRAMES = 20            # 每个数据规模测量的增量重绘帧数
+PLOT_STEP = 100             # 每帧新增的点数
+
+
+def synthetic_points(technique, points, seed):
+    """
+    带种子的模拟数据 (默认参数的波形按需重复到指定点数)
+
+    Returns:
+        (电位, 电流) 数组
+    """
+    _, voltages, currents = SimulatedDevice(technique, seed=seed).generate({})
+    return np.resize(voltages, points), np.resize(currents, points)
+
+
+def synthetic_stream(technique, points, seed):
+    """与设备输出相同的数据行字节流 (<电位>,<电流>,\\r\\n)"""
+    voltages, currents = synthetic_points(technique, points, seed)
+    return SimulatedDevice(technique, seed=seed).format_block(voltages, currents)
+
+
+def quiet():
+    """屏蔽被测代码的控制台输出 (状态提示、分析摘要)"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def receiving_engine(technique):
+    """创建一个已处于接收数据状态的采集引擎 (不连接设备, 不写文件)"""
+    engine = AcquisitionEngine(technique=technique, name='benchmark')
+    engine.show_progress = False
+    engine.state = ProtocolState.STARTING_TEST
+    with quiet():
+        engine._handle_response("*")
+    return engine
+
+
+def best_of(repeat, run):
+    """运行 repeat 次, 返回最短用时 (run 返回本次计时的秒数)"""
+    return min(run() for _ in range(repeat))
+
+
+def rate(amount, seconds):
+    return round(amount / seconds, 1) if seconds else None
+
+
+def scale_hex_log(source, scale, path):
+    """
+    把 HEX 日志重复 scale 次写成一个大日志 (每份的时间戳依次后移, 保持单调)
+
+    Returns:
+        (写出的行数, 字节数)
+    """
+    records = []
+    with open(source, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            timestamp, sep, rest = line.rstrip('\r\n').partition(' ')
+            try:
+                records.append((float(timestamp), rest))
+            except ValueError:
+                continue
+    if not records:
+        raise ValueError(f"日志中没有可用的记录: {source}")
+    span = records[-1][0] - records[0][0] + 1.0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for copy in range(scale):
+            offset = copy * span
+            f.write("".join(f"{timestamp + offset:.6f} {rest}\n" for timestamp, rest in records))
+    return len(records) * scale, os.path.getsize(path)
+
+
+def bench_parse(args, workdir):
+    """数据解析: 逐行模式 (_handle_response 处理行列表) 和批量模式 (feed_bytes 分帧 + 批量解析)"""
+    results = {}
+    for name in args.techniques:
+        technique = TECHNIQUES[name]()
+        raw = synthetic_stream(technique, args.points, args.seed)
+        lines = raw.decode().splitlines(keepends=True)
+        terminator = technique.terminators[0] + "\r\n"
+
+        def run_lines():
+            engine = receiving_engine(technique)
+            started = time.perf_counter()
+            with quiet():
+                for start in range(0, len(lines), LINE_BATCH):
+                    engine._handle_response(lines[start:start + LINE_BATCH])
+                engine._handle_response(terminator)
+            elapsed = time.perf_counter() - started
+            check_points(engine, args.points)
+            return elapsed
+
+        def run_bulk():
+            engine = receiving_engine(technique)
+            started = time.perf_counter()
+            with quiet():
+                for start in range(0, len(raw), READ_CHUNK):
+                    engine.feed_bytes(raw[start:start + READ_CHUNK])
+                engine.feed_bytes(terminator.encode())
+            elapsed = time.perf_counter() - started
+            check_points(engine, args.points)
+            return elapsed
+
+        for mode, run in (('line', run_lines), ('bulk', run_bulk)):
+            seconds = best_of(args.repeat, run)
+            results[f"parse_{mode}_{name.lower()}"] = {
+                'points': args.points,
+                'bytes': len(raw),
+                'seconds': round(seconds, 4),
+                'lines_per_s': rate(args.points, seconds),
+                'mb_per_s': rate(len(raw) / 1e6, seconds),
+            }
+
+        # 解析后引擎保留的内存 (数据缓冲 + 实时分析状态)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        engine = receiving_engine(technique)
+        for start in range(0, len(raw), READ_CHUNK):
+            engine.feed_bytes(raw[start:start + READ_CHUNK])
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"parse_bulk_{name.lower()}"].update({
+            'retained_bytes_per_million_points': round((retained - baseline) * 1e6 / args.points),
+            'peak_bytes_per_million_points': round((peak - baseline) * 1e6 / args.points),
+        })
+    return results
+
+
+def check_points(engine, expected):
+    if len(engine.data_buffer) != expected:
+        raise RuntimeError(f"解析结果点数不符: {len(engine.data_buffer)} != {expected}")
+
+
+def bench_memory(args, workdir):
+    """数据缓冲: 批量追加的速度和每百万点的内存占用"""
+    points = args.memory_points
+    voltages, currents = synthetic_points(TECHNIQUES['CV'](), points, args.seed)
+
+    def fill():
+        buffer = DataBuffer()
+        now = time.time()
+        for start in range(0, points, EXTEND_BLOCK):
+            buffer.extend(voltages[start:start + EXTEND_BLOCK], currents[start:start + EXTEND_BLOCK], now)
+        return buffer
+
+    def run():
+        started = time.perf_counter()
+        fill()
+        return time.perf_counter() - started
+
+    seconds = best_of(args.repeat, run)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    buffer = fill()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'buffer_extend': {
+        'points': points,
+        'seconds': round(seconds, 4),
+        'points_per_s': rate(points, seconds),
+        'retained_bytes_per_million_points': round((retained - baseline) * 1e6 / points),
+        'peak_bytes_per_million_points': round((peak - baseline) * 1e6 / points),
+        'capacity': buffer.capacity,
+    }}
+
+
+def bench_write(args, workdir):
+    """数据保存: save_data 一次性写 CSV, 以及采集时的流式写入 (CSV / 二进制)"""
+    points = args.write_points
+    technique = TECHNIQUES['CV']()
+    voltages, currents = synthetic_points(technique, points, args.seed)
+    buffer = DataBuffer(points)
+    buffer.extend(voltages, currents, time.time())
+    results = {}
+
+    def run_save():
+        engine = AcquisitionEngine(technique=technique, name='benchmark')
+        engine.data_buffer = buffer
+        path = os.path.join(workdir, 'save_data.csv')
+        started = time.perf_counter()
+        with quiet():
+            if engine.save_data(path) is None:
+                raise RuntimeError("save_data 失败")
+        run_save.size = os.path.getsize(path)
+        return time.perf_counter() - started
+
+    seconds = best_of(args.repeat, run_save)
+    results['save_data_csv'] = {
+        'points': points,
+        'bytes': run_save.size,
+        'seconds': round(seconds, 4),
+        'points_per_s': rate(points, seconds),
+        'mb_per_s': rate(run_save.size / 1e6, seconds),
+    }
+
+    # 流式写入: 与采集时相同, 每 flush_points 个点写一批
+    for fmt, extension in (('csv', '.csv'), ('binary', '.ecb')):
+        path = os.path.join(workdir, 'stream' + extension)
+
+        def run_stream():
+            writer = open_stream_writer(path, fmt, columns=technique.data_schema.columns)
+            batch = writer.flush_points
+            started = time.perf_counter()
+            for start in range(0, points, batch):
+                writer.write_batch(*buffer.view(start, min(start + batch, points)))
+            writer.close(complete=True)
+            return time.perf_counter() - started
+
+        seconds = best_of(args.repeat, run_stream)
+        size = os.path.getsize(path)
+        results[f"stream_write_{fmt}"] = {
+            'points': points,
+            'bytes': size,
+            'seconds': round(seconds, 4),
+            'points_per_s': rate(points, seconds),
+            'mb_per_s': rate(size / 1e6, seconds),
+        }
+    return results
+
+
+def bench_log(args, workdir):
+    """日志分析: 放大后的 HEX 日志的解析和完整分析 (会话切分、分析、写报告)"""
+    from tools.analyze_serial_log import analyze_file
+
+    path = os.path.join(workdir, 'serial_log_x%d.hex' % args.log_scale)
+    lines, size = scale_hex_log(args.log, args.log_scale, path)
+    results = {}
+
+    def run_read():
+        started = time.perf_counter()
+        read_hex_log(path)
+        return time.perf_counter() - started
+
+    seconds = best_of(args.repeat, run_read)
+    results['hex_log_read'] = {
+        'lines': lines,
+        'bytes': size,
+        'seconds': round(seconds, 4),
+        'lines_per_s': rate(lines, seconds),
+        'mb_per_s': rate(size / 1e6, seconds),
+    }
+
+    def run_analyze():
+        output_dir = tempfile.mkdtemp(dir=workdir)
+        started = time.perf_counter()
+        with quiet():
+            run_analyze.sessions = len(analyze_file(path, output_dir, verbose=False))
+        return time.perf_counter() - started
+
+    seconds = best_of(args.repeat, run_analyze)
+    results['hex_log_analyze'] = {
+        'lines': lines,
+        'bytes': size,
+        'sessions': run_analyze.sessions,
+        'seconds': round(seconds, 4),
+        'lines_per_s': rate(lines, seconds),
+        'mb_per_s': rate(size / 1e6, seconds),
+    }
+    return results
+
+
+def bench_plot(args, workdir):
+    """实时绘图: 图形界面 PlotCanvas 在不同数据量下的首帧和增量重绘耗时 (离屏渲染)"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PySide6.QtWidgets import QApplication
+        # 先创建 QApplication: matplotlib 据此判断 Qt 后端可用 (pyplot 已在导入 utils 时加载)
+        app = QApplication.instance() or QApplication([])
+        from electrochemical_gui import PlotCanvas
+    except ImportError as e:
+        print(f"⚠️  跳过实时绘图测试 (无法导入图形界面: {e})")
+        return {}
+
+    # 缺少中文字体时的逐字警告与性能无关
+    warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
+    warnings.filterwarnings('ignore', category=UserWarning, module='electrochemical_gui')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    canvas = PlotCanvas(width=8, height=6, dpi=100)
+    canvas.resize(800, 600)
+    technique = TECHNIQUES['CV']()
+    results = {}
+    for size in args.plot_sizes:
+        voltages, currents = synthetic_points(technique, size + PLOT_FRAMES * PLOT_STEP, args.seed)
+        with quiet():
+            canvas.reset_plot('CV')
+        data = DataBuffer(len(voltages))
+        data.extend(voltages[:size], currents[:size], time.time())
+
+        started = time.perf_counter()
+        canvas.update_plot(data)
+        canvas.draw()
+        first = time.perf_counter() - started
+
+        frames = []
+        for frame in range(PLOT_FRAMES):
+            start = size + frame * PLOT_STEP
+            data.extend(voltages[start:start + PLOT_STEP], currents[start:start + PLOT_STEP], time.time())
+            started = time.perf_counter()
+            canvas.update_plot(data)
+            canvas.draw()
+            frames.append(time.perf_counter() - started)
+        app.processEvents()
+
+        results[f"plot_frame_{size_label(size)}"] = {
+            'points': size,
+            'first_frame_ms': round(first * 1000, 2),
+            'frame_median_ms': round(float(np.median(frames)) * 1000, 2),
+            'frame_p95_ms': round(float(np.percentile(frames, 95)) * 1000, 2),
+            'frames_per_s': rate(1, float(np.median(frames))),
+        }
+    return results
+
+
+def size_label(size):
+    """1000 → 1k, 100000 → 100k, 1000000 → 1M"""
+    for divisor, suffix in ((1000000, 'M'), (1000, 'k')):
+        if size >= divisor and size % divisor == 0:
+            return f"{size // divisor}{suffix}"
+    return str(size)
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'memory': bench_memory,
+    'write': bench_write,
+    'log': bench_log,
+    'plot': bench_plot,
+}
+
+
+def git_commit():
+    """当前 git 提交 (有未提交修改时加 -dirty); 不在 git 仓库中时为 None"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def environment():
+    """运行环境 (对比不同机器的结果时参考)"""
+    import matplotlib
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def is_performance_metric(key):
+    """参与对比的指标 (速率、每帧耗时、每百万点内存); 总用时和点数、字节数等随规模变化, 不对比"""
+    return key.endswith(('_per_s', '_ms', '_per_million_points'))
+
+
+def higher_is_better(key):
+    return key.endswith('_per_s')
+
+
+def compare_results(base, current, threshold):
+    """
+    对比两次结果, 输出各指标的变化
+
+    Returns:
+        变差超过 threshold (比例) 的指标数
+    """
+    print(f"\n对比: {base.get('commit') or '?'} ({base.get('created', '?')}) → "
+          f"{current.get('commit') or '?'} ({current.get('created', '?')})")
+    if base.get('settings') != current.get('settings'):
+        print("⚠️  两次运行的设置不同, 结果不能直接比较")
+    if base.get('environment') != current.get('environment'):
+        print("⚠️  两次运行的环境不同 (见结果文件中的 environment)")
+
+    regressions = 0
+    for name, metrics in current['results'].items():
+        old = base['results'].get(name)
+        if old is None:
+            continue
+        for key, value in metrics.items():
+            previous = old.get(key)
+            if not is_performance_metric(key) or not value or not previous:
+                continue
+            change = value / previous - 1
+            worse = -change if higher_is_better(key) else change
+            if worse > threshold:
+                mark = "❌"
+                regressions += 1
+            elif worse < -threshold:
+                mark = "✅"
+            else:
+                mark = "  "
+            print(f"{mark} {name:24s} {key:36s} {format_value(previous):>12s} → "
+                  f"{format_value(value):>12s}  {change:+7.1%}")
+    print(f"\n{'⚠️ ' if regressions else '✓'} 变差超过 {threshold:.0%} 的指标: {regressions} 个")
+    return regressions
+
+
+def format_value(value):
+    if isinstance(value, float) and value < 100:
+        return f"{value:.4g}"
+    return f"{value:,.0f}" if isinstance(value, (int, float)) else str(value)
+
+
+def print_results(name, metrics):
+    """输出一个测试项的结果"""
+    shown = [f"{key} {format_value(value)}" for key, value in metrics.items() if is_performance_metric(key)]
+    print(f"   {name:24s} " + "  ".join(shown))
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    if results.get('version') != RESULT_VERSION or 'results' not in results:
+        raise ValueError(f"不是基准测试结果文件: {path}")
+    return results
+
+
+def parse_sizes(text):
+    return [int(float(size)) for size in text.split(',') if size.strip()]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='性能基准测试: 数据解析、数据缓冲、数据保存、实时绘图和日志分析 (结果保存为 JSON, 可对比)')
+    parser.add_argument('--only', action='append', choices=GROUPS, default=None,
+                        help='只运行指定的测试组 (可重复, 默认: 全部)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='结果文件 (默认: benchmarks/results/benchmark_<提交>_YYYYMMDD_HHMMSS.json)')
+    parser.add_argument('--compare', nargs='+', metavar='RESULT',
+                        help='与已有结果对比; 给出两个文件时只对比这两个文件, 不运行测试')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='对比时视为变化的比例 (默认: 0.1 = 10%%)')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数, 取最快的一次 (默认: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='模拟数据随机数种子 (默认: 0)')
+    parser.add_argument('-t', '--technique', action='append', choices=sorted(TECHNIQUES), default=None,
+                        dest='techniques', help='解析测试的测量技术 (可重复, 默认: CV 和 DPV)')
+    parser.add_argument('--points', type=int, default=200000, help='解析测试的数据点数 (默认: 200000)')
+    parser.add_argument('--memory-points', type=int, default=1000000,
+                        help='数据缓冲测试的数据点数 (默认: 1000000)')
+    parser.add_argument('--write-points', type=int, default=1000000,
+                        help='数据保存测试的数据点数 (默认: 1000000)')
+    parser.add_argument('--log', default=DEFAULT_LOG, help='日志分析测试的 HEX 日志 (默认: logs/serial_log.hex)')
+    parser.add_argument('--log-scale', type=int, default=32, help='日志重复次数 (默认: 32)')
+    parser.add_argument('--plot-sizes', type=parse_sizes, default=[1000, 100000, 1000000],
+                        help='实时绘图测试的数据点数, 逗号分隔 (默认: 1000,100000,1000000)')
+
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        print("❌ 错误: --compare 最多给出两个结果文件")
+        sys.exit(1)
+    try:
+        baseline = load_results(args.compare[0]) if args.compare else None
+        if args.compare and len(args.compare) == 2:
+            regressions = compare_results(baseline, load_results(args.compare[1]), args.threshold)
+            sys.exit(1 if regressions else 0)
+    except (OSError, ValueError) as e:
+        print(f"❌ 无法读取结果文件: {e}")
+        sys.exit(1)
+
+    if args.repeat < 1 or args.points < 1 or args.memory_points < 1 or args.write_points < 1 or \
+            args.log_scale < 1 or not args.plot_sizes:
+        print("❌ 错误: 重复次数、点数和日志重复次数必须为正数")
+        sys.exit(1)
+    groups = args.only or list(GROUPS)
+    if 'log' in groups and not os.path.exists(args.log):
+        print(f"❌ 错误: 日志文件不存在 - {args.log}")
+        sys.exit(1)
+    args.techniques = args.techniques or ['CV', 'DPV']
+
+    commit = git_commit()
+    settings = {key: getattr(args, key) for key in ('repeat', 'seed', 'techniques', 'points', 'memory_points',
+                                                    'write_points', 'log_scale', 'plot_sizes')}
+    settings['log'] = os.path.basename(args.log)
+    settings['groups'] = groups
+    output = {
+        'version': RESULT_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': commit,
+        'environment': environment(),
+        'settings': settings,
+        'results': {},
+    }
+
+    print(f"⏱️  基准测试 (提交 {commit or '未知'}, 每项重复 {args.repeat} 次)")
+    with tempfile.TemporaryDirectory(prefix='echem_bench_') as workdir:
+        for group in groups:
+            print(f"\n▶ {group}: {BENCHMARKS[group].__doc__.strip()}")
+            started = time.perf_counter()
+            results = BENCHMARKS[group](args, workdir)
+            for name, metrics in results.items():
+                print_results(name, metrics)
+            output['results'].update(results)
+            print(f"   ({time.perf_counter() - started:.1f} 秒)")
+
+    path = args.output
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR,
+                            f"benchmark_{commit or 'unknown'}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=1)
+    print(f"\n✓ 结果已保存: {path}")
+
+    if baseline is not None and compare_results(baseline, output, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
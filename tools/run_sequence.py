@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""测量序列运行工具: 按计划文件无人值守地依次运行多次测量"""
+
+import argparse
+import sys
+import os
+
+# 添加父目录到路径，以便导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.acquisition import AcquisitionEngine
+from utils.metrics import REGISTRY, configure_logging
+from utils.sequence import TECHNIQUES, MANIFEST_FILE, SequenceRunner, load_plan
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='测量序列运行工具 (参数扫描、重复测量、CV 与 DPV 交替等, 全程保持串口连接)')
+    parser.add_argument('plan', help='计划文件 (JSON, 格式见 docs/CLI_USAGE_GUIDE.md)')
+    parser.add_argument('-p', '--port', help='串口号 (如: COM3 或 /dev/ttyUSB0)')
+    parser.add_argument('-b', '--baudrate', type=int, default=115200, help='波特率 (默认: 115200)')
+    parser.add_argument('-s', '--simulate', action='store_true', help='使用模拟模式')
+    parser.add_argument('-o', '--output', default=None,
+                        help='输出目录 (默认: sequence_<计划文件名>)')
+    parser.add_argument('-j', '--workers', type=int, default=2,
+                        help='后台处理 (写文件、绘图) 的线程数 (默认: 2)')
+    parser.add_argument('--stop-on-error', action='store_true',
+                        help='某个步骤失败时停止整个序列 (默认: 记录失败后继续)')
+    parser.add_argument('--dry-run', action='store_true', help='只检查并列出展开后的步骤, 不连接设备')
+    parser.add_argument('--read-mode', choices=['line', 'bulk'], default='line',
+                        help='串口读取方式: line=逐行读取, bulk=批量读取 (高波特率/高采样率时使用)')
+    parser.add_argument('--sim-seed', type=int, default=0, help='模拟模式随机数种子 (默认: 0)')
+    parser.add_argument('--sim-speed', type=float, default=1.0,
+                        help='模拟模式倍速 (默认: 1=实时, 0=尽可能快)')
+    parser.add_argument('--data-format', choices=['csv', 'binary'], default='csv',
+                        help='数据文件格式: csv 或 binary (.ecb 二进制列式), 采集过程中实时写入 (默认: csv)')
+    parser.add_argument('--max-points', type=int, default=None, metavar='N',
+                        help='有界内存模式: 内存中只保留最近 N 个点 (实时分析和曲线图基于这些点), '
+                             '完整数据只在数据文件中 (默认: 不限)')
+    parser.add_argument('--capture', metavar='FILE', default=None,
+                        help='记录整个序列的串口收发原始数据到抓包文件 (.ecap)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='日志级别: INFO 显示采集进度, WARNING 只显示问题 (默认: INFO)')
+    parser.add_argument('--metrics-file', metavar='FILE', default=None,
+                        help='结束时写出运行指标 (.json, 或 .prom 为 Prometheus 文本格式)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='运行期间在本机该端口提供运行指标 (/metrics, /metrics.json)')
+    
+    args = parser.parse_args()
+    
+    try:
+        plan, steps = load_plan(args.plan)
+    except (OSError, ValueError) as e:
+        print(f"❌ 计划文件错误: {e}")
+        sys.exit(1)
+    
+    print(f"📋 计划 {plan.get('name') or args.plan}: {len(steps)} 个步骤")
+    for step in steps:
+        params = ", ".join(f"{key}={value}" for key, value in step['params'].items())
+        print(f"   {step['label']:30s} {step['technique']:4s} {params}")
+    if args.dry_run:
+        return
+    
+    if not args.simulate and not args.port:
+        print("❌ 错误: 请指定串口 (-p) 或使用模拟模式 (-s)")
+        sys.exit(1)
+    if args.max_points is not None and args.max_points < 1:
+        print("❌ 错误: --max-points 必须为正数")
+        sys.exit(1)
+    
+    configure_logging(args.log_level)
+    if args.metrics_port is not None:
+        port = REGISTRY.serve(args.metrics_port)
+        print(f"📈 运行指标: http://127.0.0.1:{port}/metrics")
+    
+    output_dir = args.output or f"sequence_{os.path.splitext(os.path.basename(args.plan))[0]}"
+    engine = AcquisitionEngine(port=args.port, baudrate=args.baudrate, simulate=args.simulate,
+                               read_mode=args.read_mode,
+                               technique=TECHNIQUES[steps[0]['technique']](),
+                               sim_seed=args.sim_seed, sim_speed=args.sim_speed,
+                               stream_format=args.data_format, capture_path=args.capture,
+                               max_points=args.max_points)
+    runner = SequenceRunner(engine, output_dir, workers=args.workers,
+                            stop_on_error=args.stop_on_error)
+    manifest = runner.run(steps, plan)
+    if args.metrics_file:
+        REGISTRY.write(args.metrics_file)
+        print(f"✓ 运行指标已保存: {args.metrics_file}")
+    
+    print("\n" + "=" * 50)
+    if manifest.get('error'):
+        print(f"❌ 序列未运行: {manifest['error']}")
+        sys.exit(1)
+    print(f"✅ 序列结束: 完成 {manifest['completed']} 个, 失败 {manifest['failed']} 个, "
+          f"用时 {manifest['elapsed_s']:.1f} 秒 (步骤间空闲共 {manifest['idle_s']:.2f} 秒)")
+    print(f"✓ 结果清单: {os.path.join(output_dir, MANIFEST_FILE)}")
+    if manifest['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
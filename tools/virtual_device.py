@@ -0,0 +1,52 @@
+import argparse
+import sys
+import os
+import time
+
+# 添加父目录到路径，以便导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.virtual_device import VirtualSerialDevice
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='虚拟串口设备 (伪终端, 模拟下位机 CV/DPV 固件协议)')
+    parser.add_argument('-b', '--baudrate', type=int, default=115200,
+                        help='模拟波特率, 限制输出速度 (默认: 115200, 0=不限速)')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子 (默认: 0)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='数据生成倍速 (默认: 1=实时, 0=尽可能快)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='每次写入附加的随机延迟上限 (秒)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='数据字节丢失概率 (0~1)')
+    parser.add_argument('--burst-size', type=int, default=None, help='每次写入的最大字节数')
+
+    args = parser.parse_args()
+
+    device = VirtualSerialDevice(
+        baudrate=args.baudrate,
+        seed=args.seed,
+        speed=args.speed,
+        jitter=args.jitter,
+        drop_rate=args.drop_rate,
+        burst_size=args.burst_size
+    )
+    port = device.start()
+
+    print(f"🔌 虚拟设备已启动: {port}")
+    print("示例:")
+    print(f"  python tools/cv_protocol_cli.py -p {port}")
+    print(f"  python tools/dpv_protocol_cli.py -p {port} --read-mode bulk")
+    print("按 Ctrl+C 退出")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.stop()
+        print(f"\n🔌 虚拟设备已关闭 (测量 {device.sessions} 次, 输出 {device.bytes_written} 字节, "
+              f"丢弃 {device.bytes_dropped} 字节)")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,39 @@
 """utils 模块 - 电化学设备通信和数据处理工具"""
 
-from .electrochemical_protocol import (
+from .acquisition import (
     ProtocolState,
+    DataLineSchema,
+    Technique,
+    AcquisitionEngine,
+    run_technique_test
+)
+
+from .data_buffer import DataBuffer, RingBuffer
+
+from .electrochemical_protocol import (
+    CVTechnique,
     ElectrochemicalProtocol,
     run_cv_test
 )
 
 from .dpv_protocol import (
+    DPVTechnique,
     DPVProtocol,
     run_dpv_test
 )
 
 __all__ = [
     'ProtocolState',
+    'DataLineSchema',
+    'Technique',
+    'AcquisitionEngine',
+    'run_technique_test',
+    'DataBuffer',
+    'RingBuffer',
+    'CVTechnique',
     'ElectrochemicalProtocol',
     'run_cv_test',
+    'DPVTechnique',
     'DPVProtocol',
     'run_dpv_test'
 ]
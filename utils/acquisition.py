@@ -0,0 +1,1140 @@
+"""电化学采集引擎: 串口传输、协议状态机和数据处理的公共实现
+
+具体的测量技术 (CV、DPV 等) 只需定义一个 Technique, 描述参数帧格式、
+开始命令、结束标记和数据行格式, 其余流程由 AcquisitionEngine 统一完成。
+"""
+
+import serial
+import time
+import csv
+import logging
+import os
+import shutil
+import threading
+import queue
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from datetime import datetime
+from enum import Enum
+
+from utils.capture import RECV, SEND, CaptureWriter
+from utils.data_buffer import create_buffer
+from utils.data_store import FORMAT_EXTENSIONS, format_from_path, open_stream_writer, write_file
+from utils.decimation import minmax_decimate
+from utils.frame_parser import parse_data_block
+from utils.metrics import PipelineMetrics
+from utils.serial_reader import BulkLineReader, LineFramer
+from utils.simulator import SimulatedDevice
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProtocolState(Enum):
+    """协议状态枚举"""
+    IDLE = 0
+    PARAMETER_SET = 1
+    WAITING_ACK = 2
+    STARTING_TEST = 3
+    RECEIVING_DATA = 4
+    TEST_COMPLETE = 5
+    ERROR = 6
+
+
+class DataLineSchema:
+    """数据行格式: <电位>,<电流>,"""
+
+    def __init__(self, columns=('电位(V)', '电流(μA)'), voltage_format='.4f',
+                 current_format='.4f', min_fields=2):
+        """
+        Args:
+            columns: CSV 表头
+            voltage_format: 进度输出中电位的格式
+            current_format: 进度输出中电流的格式
+            min_fields: 一行至少包含的字段数
+        """
+        self.columns = columns
+        self.voltage_format = voltage_format
+        self.current_format = current_format
+        self.min_fields = min_fields
+
+    def parse(self, response):
+        """
+        解析一行数据
+
+        Returns:
+            (voltage, current) 元组, 字段不足时返回 None
+
+        Raises:
+            ValueError: 字段无法转换为数值
+        """
+        parts = response.split(",")
+        if len(parts) < self.min_fields:
+            return None
+        return float(parts[0]), float(parts[1])
+
+    def format_point(self, voltage, current):
+        """格式化一个数据点用于进度输出"""
+        return (f"V={voltage:{self.voltage_format}}V, "
+                f"I={current:{self.current_format}}μA")
+
+
+class Technique:
+    """
+    测量技术定义
+
+    子类需要实现 build_parameter_frame 和 simulate_waveform, 并按需覆盖类属性。
+    """
+
+    name = None                     # 技术名称 (如 'CV')
+    title = None                    # 绘图标题
+    file_prefix = None              # 数据/图形文件名前缀
+    start_command = "S"             # 开始测试命令
+    terminators = ("@",)            # 数据结束标记
+    data_schema = DataLineSchema()  # 数据行格式
+    progress_interval = 10          # 每多少个点输出一次进度
+    default_timeout = 30            # process_responses 默认超时 (秒)
+
+    sim_noise = 0.02                # 模拟电流噪声标准差 (μA)
+
+    # 参数帧格式: "P <参数1>,<参数2>,...,<参数N>,<后缀>"
+    frame_suffix = ""               # 参数帧后缀 (DPV 为 'D')
+    frame_fields = 18               # 参数个数
+    parameter_layout = {}           # 参数名 → 在参数帧中的位置
+    integer_parameters = ()         # 需要按整数解析的参数名
+
+    def build_parameter_frame(self, **params):
+        """根据参数构建参数设置命令帧 (str)"""
+        raise NotImplementedError
+
+    def parse_parameter_frame(self, command):
+        """
+        解析参数设置命令帧 (build_parameter_frame 的逆过程)
+
+        Args:
+            command: 参数帧 (str 或 bytes)
+
+        Returns:
+            参数字典
+
+        Raises:
+            ValueError: 帧格式错误
+        """
+        if isinstance(command, (bytes, bytearray)):
+            command = command.decode(errors='replace')
+        command = command.strip()
+        if not command.startswith("P"):
+            raise ValueError(f"不是参数帧: {command}")
+
+        fields = [field.strip() for field in command[1:].split(",")]
+        if len(fields) < self.frame_fields:
+            raise ValueError(f"参数个数不足: {len(fields)} < {self.frame_fields}")
+
+        params = {}
+        for name, index in self.parameter_layout.items():
+            value = float(fields[index])
+            params[name] = int(value) if name in self.integer_parameters else value
+        return params
+
+    def create_analyzer(self, params):
+        """
+        创建采集过程中的增量分析器 (默认: 不分析)
+
+        Args:
+            params: 本次测量的参数 (send_parameters 的关键字参数)
+
+        分析器需提供 update(voltages, currents) 和 finish(voltages, currents) → 结果,
+        结果需提供 summary_lines()。
+        """
+        return None
+
+    def simulate_waveform(self, params):
+        """
+        按测量参数生成无噪声的模拟波形
+
+        Args:
+            params: 传给 build_parameter_frame 的测量参数
+
+        Returns:
+            (times, voltages, currents) 数组, 时间单位为秒
+        """
+        raise NotImplementedError
+
+
+class AcquisitionEngine:
+    """电化学采集引擎: 串口连接、读取线程、协议状态机和数据保存/绘图"""
+
+    technique_class = None
+
+    def __init__(self, port=None, baudrate=115200, simulate=False, read_mode='line',
+                 technique=None, sim_seed=0, sim_speed=1.0, stream_format=None, stream_path=None,
+                 capture_path=None, name=None, max_points=None):
+        """
+        初始化采集引擎
+
+        Args:
+            port: 串口号 (如: COM3 或 /dev/ttyUSB0)
+            baudrate: 波特率 (默认: 115200)
+            simulate: 是否使用模拟模式 (默认: False)
+            read_mode: 串口读取方式 ('line'=逐行 readline, 'bulk'=批量读取 in_waiting 并自行分帧)
+            technique: 测量技术定义 (默认: 使用 technique_class 创建)
+            sim_seed: 模拟模式随机数种子 (相同种子数据完全一致)
+            sim_speed: 模拟模式虚拟时间倍速 (1=实时, 0=尽可能快)
+            stream_format: 采集过程中流式写入磁盘的格式 ('csv' / 'binary', 默认: 不写入)
+            stream_path: 流式写入的文件路径 (默认: <前缀>_data_YYYYMMDD_HHMMSS.csv/.ecb)
+            capture_path: 串口抓包文件路径 (.ecap, 记录全部收发原始数据, 默认: 不抓包)
+            name: 设备名称, 用作运行指标的 device 标签 (默认: 串口号, 模拟模式为 'simulated')
+            max_points: 有界内存模式: 内存中只保留最近的这么多个点 (环形缓冲区, 实时分析和绘图
+                基于这些点), 更早的数据只在流式存储文件中; 需要同时指定 stream_format (默认: 不限)
+        """
+        if read_mode not in ('line', 'bulk'):
+            raise ValueError(f"不支持的读取方式: {read_mode}")
+        if stream_format not in (None,) + tuple(FORMAT_EXTENSIONS):
+            raise ValueError(f"不支持的存储格式: {stream_format}")
+        if max_points is not None:
+            if max_points < 1:
+                raise ValueError(f"最大保留点数必须为正数: {max_points}")
+            if not stream_format:
+                raise ValueError("有界内存模式需要流式存储 (stream_format), 否则较早的数据会丢失")
+
+        self.technique = technique if technique is not None else self.technique_class()
+        self.port = port
+        self.baudrate = baudrate
+        self.simulate = simulate
+        self.read_mode = read_mode
+        self.serial_conn = None
+        self._state = ProtocolState.IDLE
+        self._state_listeners = []
+        self.external_io = False  # 由外部 I/O 线程读取并处理响应 (见 connect)
+        self.parameters = {}
+        self.max_points = max_points
+        self.data_buffer = self.create_buffer()
+        self.malformed_lines = 0
+        self.show_progress = True  # 是否定期输出接收进度 (INFO 级别日志)
+        self.metrics = PipelineMetrics(name or port or 'simulated')  # 运行指标
+        self.framer = None  # feed_bytes 使用的分帧器 (由外部 I/O 线程读取时创建)
+        self.analyzer = None
+        self.analysis = None  # 最近一次测量的分析结果 (如 DPV 峰分析)
+        self.response_queue = queue.Queue()
+        self.stop_flag = threading.Event()
+        self.read_thread = None
+
+        # 流式存储
+        self.stream_format = stream_format
+        self.stream_path = stream_path
+        self.stream_writer = None
+        self.stream_file = None  # 最近一次完整写入的文件
+        self._persisted = 0
+        self._flushed = 0           # 已写入磁盘并交给分析的点数 (见 _flush_points)
+
+        # 串口抓包
+        self.capture_path = capture_path
+        self.capture_writer = None
+
+        # 模拟参数
+        self.sim_trigger = threading.Event()  # 开始命令: 模拟设备输出一次测量
+        self.sim_abort = threading.Event()  # 中止当前模拟测量 (连接保持)
+        self.simulator = SimulatedDevice(self.technique, seed=sim_seed, speed=sim_speed)
+
+    @property
+    def state(self):
+        """协议状态 (ProtocolState)"""
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        previous = self._state
+        self._state = state
+        if state != previous:
+            for listener in list(self._state_listeners):
+                listener(previous, state)
+
+    def add_state_listener(self, listener):
+        """
+        注册状态转换回调 listener(原状态, 新状态)
+
+        回调在处理响应的线程中调用 (wait_for / process_responses 的调用者, 或外部 I/O 线程), 应尽快返回。
+        """
+        self._state_listeners.append(listener)
+
+    def remove_state_listener(self, listener):
+        """注销状态转换回调"""
+        try:
+            self._state_listeners.remove(listener)
+        except ValueError:
+            pass
+
+    def create_buffer(self):
+        """新建一次测量的数据缓冲区 (有界内存模式下为固定容量的环形缓冲区)"""
+        return create_buffer(self.max_points)
+
+    def set_technique(self, technique):
+        """
+        切换测量技术 (保持连接, 用于在同一连接上依次运行不同技术的测量)
+
+        Args:
+            technique: Technique 实例
+        """
+        self.technique = technique
+        self.simulator = SimulatedDevice(technique, seed=self.simulator.seed,
+                                         speed=self.simulator.speed)
+
+    def connect(self, start_reader=True):
+        """
+        连接串口设备或启动模拟模式
+
+        Args:
+            start_reader: 是否启动本实例的读取线程 (False: 由外部 I/O 线程读取并调用 feed_bytes,
+                          见 utils.instrument_manager)
+        """
+        self._open_capture()
+        self.external_io = not start_reader
+
+        if self.simulate:
+            print(f"启动 {self.technique.name} 模拟模式...")
+            self._start_simulation()
+            return True
+
+        if not self.port:
+            print("错误: 未指定串口")
+            return False
+
+        try:
+            self.serial_conn = serial.Serial(
+                port=self.port,
+                baudrate=self.baudrate,
+                bytesize=8,
+                parity='N',
+                stopbits=1,
+                timeout=5,  # 增加读超时到5秒,避免长时间等待时断连
+                write_timeout=2  # 添加写超时,防止写阻塞
+            )
+            print(f"已连接到设备: {self.port} @ {self.baudrate}")
+
+            # 启动读取线程
+            if start_reader:
+                self.read_thread = threading.Thread(target=self._read_serial_data)
+                self.read_thread.daemon = True
+                self.read_thread.start()
+
+            return True
+
+        except Exception as e:
+            print(f"连接失败: {e}")
+            return False
+
+    def disconnect(self):
+        """断开连接"""
+        self.stop_flag.set()
+        self.sim_abort.set()
+        self.sim_trigger.set()  # 唤醒模拟线程使其退出
+        self._close_stream(complete=False)
+
+        if self.read_thread and self.read_thread.is_alive():
+            # 唤醒阻塞中的读取 (读超时 5 秒, 长于 join 等待时间)
+            if self.serial_conn and self.serial_conn.is_open and hasattr(self.serial_conn, 'cancel_read'):
+                self.serial_conn.cancel_read()
+            self.read_thread.join(timeout=2)
+
+        if self.serial_conn and self.serial_conn.is_open:
+            self.serial_conn.close()
+            print("设备连接已断开")
+
+        if self.capture_writer is not None:
+            self.capture_writer.close()
+            print(f"✓ 抓包已保存: {self.capture_path} ({self.capture_writer.records} 条记录)")
+            self.capture_writer = None
+
+    def _open_capture(self):
+        """打开串口抓包文件"""
+        if not self.capture_path or self.capture_writer is not None:
+            return
+        try:
+            self.capture_writer = CaptureWriter(self.capture_path, metadata={
+                'port': self.port,
+                'baudrate': self.baudrate,
+                'technique': self.technique.name,
+                'simulate': self.simulate,
+            })
+        except OSError as e:
+            print(f"⚠️  无法创建抓包文件: {e}")
+
+    def _capture(self, direction, data):
+        """记录一次串口收发"""
+        if self.capture_writer is not None:
+            self.capture_writer.write(direction, data)
+
+    def send_parameters(self, **params):
+        """
+        发送参数设置命令
+
+        Args:
+            **params: 传给 technique.build_parameter_frame 的测量参数
+        """
+        command = self.technique.build_parameter_frame(**params)
+        name = self.technique.name
+
+        if self.simulate:
+            print(f"模拟发送 {name} 参数命令: {command}")
+            self._capture(SEND, command)
+            # 模拟响应
+            self._sim_emit("#\r\n")
+        elif self.serial_conn and self.serial_conn.is_open:
+            self.serial_conn.write(command.encode())
+            self._capture(SEND, command)
+            print(f"发送 {name} 参数命令: {command}")
+        else:
+            print("错误: 设备未连接")
+            return False
+
+        self.parameters = params
+        self.state = ProtocolState.WAITING_ACK
+        return True
+
+    def send_start_command(self):
+        """发送开始测试命令"""
+        command = self.technique.start_command
+
+        if self.simulate:
+            print(f"模拟发送开始命令: {command}")
+            self._capture(SEND, command)
+            self.state = ProtocolState.STARTING_TEST
+            # 模拟响应; 数据排在开始确认之后, 由模拟线程输出
+            self._sim_emit("*\r\n")
+            self.sim_trigger.set()
+        elif self.serial_conn and self.serial_conn.is_open:
+            self.serial_conn.write(command.encode())
+            self._capture(SEND, command)
+            print(f"发送开始命令: {command}")
+            self.state = ProtocolState.STARTING_TEST
+        else:
+            print("错误: 设备未连接")
+            return False
+
+        return True
+
+    def _read_serial_data(self):
+        """串口数据读取线程"""
+        consecutive_errors = 0
+        max_consecutive_errors = 3
+
+        bulk_reader = None
+        if self.read_mode == 'bulk':
+            bulk_reader = BulkLineReader(self.serial_conn)
+
+        while not self.stop_flag.is_set():
+            try:
+                if self.serial_conn and self.serial_conn.is_open:
+                    if bulk_reader:
+                        # 批量读取: 一次取出所有已到达的完整行, 整块交给批量解析器, 无需 sleep
+                        block = bulk_reader.read_block()
+                        if block:
+                            self._capture(RECV, block)
+                            self.metrics.bytes_read.inc(len(block))
+                            self._put_response(block)
+                            consecutive_errors = 0
+                        continue
+
+                    # 逐行读取: readline 阻塞等待 (读超时 5 秒), 已到达的后续行一起放入队列
+                    lines = self._read_lines()
+                    if lines:
+                        self._put_response(lines[0] if len(lines) == 1 else lines)
+                        consecutive_errors = 0  # 成功读取后重置错误计数
+                    # 即使没有数据也不算错误,可能只是设备暂时没发送
+                else:
+                    print("串口未打开或已断开")
+                    break
+
+            except serial.SerialException as e:
+                consecutive_errors += 1
+                self.metrics.serial_errors.inc()
+                logger.warning(f"串口异常 ({consecutive_errors}/{max_consecutive_errors}): {e}")
+                if consecutive_errors >= max_consecutive_errors:
+                    logger.error("连续串口错误过多,停止读取")
+                    break
+                time.sleep(0.5)  # 串口错误后等待一段时间
+
+            except Exception as e:
+                consecutive_errors += 1
+                self.metrics.serial_errors.inc()
+                logger.warning(f"读取串口数据错误 ({consecutive_errors}/{max_consecutive_errors}): {e}")
+                if consecutive_errors >= max_consecutive_errors:
+                    logger.error("连续错误过多,停止读取")
+                    break
+                time.sleep(0.5)
+
+    def _read_lines(self, max_lines=256):
+        """
+        逐行读取模式: 阻塞读取一行, 再读出缓冲区中已到达的其余行
+
+        Returns:
+            解码后的行列表 (可能为空)
+        """
+        conn = self.serial_conn
+        lines = []
+        line = conn.readline()
+        while line:
+            self._capture(RECV, line)
+            self.metrics.bytes_read.inc(len(line))
+            try:
+                lines.append(line.decode().strip())
+            except UnicodeDecodeError as e:
+                # 解码错误不致命,跳过这条数据
+                self.metrics.parse_errors.inc()
+                logger.warning(f"数据解码错误: {e}")
+            if len(lines) >= max_lines or not conn.in_waiting:
+                break
+            line = conn.readline()
+        return lines
+
+    def feed_bytes(self, data):
+        """
+        处理一块从串口读到的原始字节 (由外部 I/O 线程读取时使用, 任意切分均可)
+
+        按 CRLF 分帧后整块交给批量解析器, 与批量读取模式的处理方式相同。
+
+        Returns:
+            本次处理的完整行字节数
+        """
+        self._capture(RECV, data)
+        self.metrics.bytes_read.inc(len(data))
+        if self.framer is None:
+            self.framer = LineFramer()
+        block = self.framer.feed_block(data)
+        if block:
+            self._handle_response(block)
+        return len(block)
+
+    def _start_simulation(self):
+        """启动模拟数据生成 (每个开始命令按虚拟时间输出一次测量, 直到断开连接)"""
+        def simulate_data():
+            while True:
+                self.sim_trigger.wait()
+                self.sim_trigger.clear()
+                if self.stop_flag.is_set():
+                    break
+                self.sim_abort.clear()
+                self.simulator.run(self.parameters, self._sim_emit, self.sim_abort)
+
+        sim_thread = threading.Thread(target=simulate_data)
+        sim_thread.daemon = True
+        sim_thread.start()
+
+    def _sim_emit(self, response):
+        """模拟设备输出: 与真实串口一样记录抓包后放入响应队列"""
+        self._capture(RECV, response)
+        self.metrics.bytes_read.inc(len(response))
+        self._put_response(response)
+
+    def _put_response(self, response):
+        """把响应放入响应队列 (附带放入时间, 用于统计处理延迟)"""
+        self.response_queue.put((time.perf_counter(), response))
+
+    def _get_response(self, timeout=None):
+        """
+        从响应队列取出一个响应 (timeout=0: 不等待)
+
+        Raises:
+            queue.Empty: 超时或队列为空
+        """
+        if timeout == 0:
+            queued, response = self.response_queue.get_nowait()
+        else:
+            queued, response = self.response_queue.get(timeout=timeout)
+        self.metrics.queue_latency.observe(time.perf_counter() - queued)
+        self.metrics.queue_depth.set(self.response_queue.qsize())
+        return response
+
+    def abort_measurement(self):
+        """
+        结束未完成的测量: 已写入的数据标记为不完整并关闭文件, 停止分析, 回到空闲状态
+
+        模拟模式下同时中止模拟设备的输出; 真实设备没有停止命令, 会继续发送到扫描结束
+        (可用 discard_responses 等待并丢弃)。
+        """
+        self.sim_abort.set()
+        self._close_stream(complete=False)
+        self.analyzer = None
+        self.state = ProtocolState.IDLE
+
+    def discard_responses(self, quiet=0.0, timeout=0.0):
+        """
+        丢弃尚未处理的响应 (如上一次测量中止后设备继续发送的数据)
+
+        Args:
+            quiet: 持续丢弃, 直到设备安静 (这么长时间没有新数据) 或收到结束标记 (秒, 0 = 只丢弃已到达的)
+            timeout: 最长等待时间 (秒)
+
+        Returns:
+            丢弃的响应数
+        """
+        terminators = self.technique.terminators
+        deadline = time.time() + timeout
+        count = 0
+        while True:
+            try:
+                if quiet > 0:
+                    wait = max(min(quiet, deadline - time.time()), 0.001)
+                    response = self._get_response(timeout=wait)
+                else:
+                    response = self._get_response(timeout=0)
+            except queue.Empty:
+                return count
+            count += 1
+            if quiet > 0:
+                if isinstance(response, (bytes, bytearray)):
+                    response = response.decode(errors='replace')
+                elif isinstance(response, list):
+                    response = "\n".join(response)
+                lines = response.split()
+                if any(line in terminators for line in lines) or time.time() >= deadline:
+                    quiet = 0.0  # 扫描已结束: 只再丢弃已到达的
+
+    def process_responses(self, timeout=None):
+        """
+        处理设备响应, 直到测试完成或超时
+
+        Args:
+            timeout: 超时时间 (秒, 默认: technique.default_timeout)
+        """
+        if timeout is None:
+            timeout = self.technique.default_timeout
+        if not self.wait_for(ProtocolState.TEST_COMPLETE, timeout=timeout):
+            print("警告: 测试未正常完成")
+
+    def wait_for(self, states, timeout=None, on_update=None, update_interval=0.5):
+        """
+        处理设备响应, 直到进入指定状态
+
+        每个响应到达后立即处理 (阻塞在响应队列上, 不轮询); 由外部 I/O 线程处理响应时
+        (connect(start_reader=False)) 只等待状态转换通知。
+
+        Args:
+            states: 目标状态 (ProtocolState 或其元组)
+            timeout: 最长等待时间 (秒, None = 不限)
+            on_update: 定期回调 on_update(), 返回 False 时停止等待 (如界面刷新、检查连接)
+            update_interval: on_update 的调用间隔 (秒)
+
+        Returns:
+            是否已进入目标状态 (等待期间曾进入即算, 即使同一批响应又推进到了后续状态)
+        """
+        if isinstance(states, ProtocolState):
+            states = (states,)
+        if self._state in states:
+            return True
+
+        reached = threading.Event()
+
+        def listener(previous, state):
+            if state in states:
+                reached.set()
+
+        now = time.time()
+        deadline = None if timeout is None else now + timeout
+        next_update = now + update_interval if on_update is not None else None
+        self.add_state_listener(listener)
+        try:
+            while not reached.is_set():
+                if self.stop_flag.is_set() or self._state == ProtocolState.ERROR:
+                    break
+                now = time.time()
+                if deadline is not None and now >= deadline:
+                    break
+                if next_update is not None and now >= next_update:
+                    if on_update() is False:
+                        break
+                    next_update = now + update_interval
+
+                # 最多阻塞 1 秒, 以便发现断开连接
+                wait = 1.0
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                if next_update is not None:
+                    wait = min(wait, next_update - now)
+                if self.external_io:
+                    reached.wait(wait)
+                    continue
+                try:
+                    response = self._get_response(timeout=max(wait, 0.0))
+                except queue.Empty:
+                    continue
+                try:
+                    self._handle_response(response)
+                except Exception as e:
+                    print(f"处理响应错误: {e}")
+                    self.state = ProtocolState.ERROR
+        finally:
+            self.remove_state_listener(listener)
+        return reached.is_set()
+
+    def _handle_response(self, response):
+        """处理单个响应 (str)、逐行读取的一批响应 (list), 或批量读取得到的原始数据块 (bytes)"""
+        if isinstance(response, (bytes, bytearray)):
+            self._handle_block(response)
+            return
+        if isinstance(response, list):
+            for line in response:
+                self._handle_line(line)
+        else:
+            self._handle_line(response)
+        # 写入磁盘和实时分析每批执行一次 (固定开销不随行数增加)
+        self._flush_points()
+
+    def _handle_line(self, response):
+        """处理一行响应 (数据点只追加到缓冲区, 由 _flush_points 统一写入和分析)"""
+        response = response.replace('\r\n', '').replace('\r', '').replace('\n', '')
+        technique = self.technique
+
+        if response == "#":
+            print("✓ 收到参数确认响应")
+            if self.state == ProtocolState.WAITING_ACK:
+                self.state = ProtocolState.PARAMETER_SET
+
+        elif response == "*":
+            print(f"✓ {technique.name} 扫描开始，开始接收数据")
+            if self.state == ProtocolState.STARTING_TEST:
+                self.state = ProtocolState.RECEIVING_DATA
+                self.data_buffer = self.create_buffer()
+                self.analyzer = technique.create_analyzer(self.parameters)
+                self.analysis = None
+                self._open_stream()
+
+        elif response in technique.terminators:
+            print(f"✓ {technique.name} 扫描完成，数据接收结束 ({response})")
+            if self.state == ProtocolState.RECEIVING_DATA:
+                self.state = ProtocolState.TEST_COMPLETE
+                self.metrics.measurements.inc()
+                self._close_stream(complete=True)
+                self._analyze()
+                self._finish_analysis()
+
+        elif "," in response:
+            # 数据点: 电位,电流
+            if self.state == ProtocolState.RECEIVING_DATA:
+                try:
+                    point = technique.data_schema.parse(response)
+                    if point is not None:
+                        self.data_buffer.append(point[0], point[1], time.time())
+                        self.metrics.points.inc()
+                        if self.max_points and \
+                                self.data_buffer.total - self._flushed >= max(self.max_points // 4, 1):
+                            self._flush_points()  # 有界内存模式: 在被环形缓冲区覆盖之前处理
+
+                        # 定期显示进度
+                        if self.show_progress and \
+                                self.data_buffer.total % technique.progress_interval == 0 and \
+                                logger.isEnabledFor(logging.INFO):
+                            logger.info(f"📊 已接收 {self.data_buffer.total} 个数据点 "
+                                        f"(最新: {technique.data_schema.format_point(*point)})")
+
+                except ValueError as e:
+                    self.metrics.parse_errors.inc()
+                    logger.warning(f"无效数据格式: {response} - {e}")
+        elif response:
+            self.metrics.parse_errors.inc()
+            logger.warning(f"⚠️  未知响应: {response}")
+
+    def _handle_block(self, raw):
+        """批量处理一段由完整行组成的原始数据"""
+        block = parse_data_block(raw)
+
+        if block.malformed:
+            self.malformed_lines += len(block.malformed)
+            self.metrics.parse_errors.inc(len(block.malformed))
+            logger.warning(f"无效数据格式: 本批 {len(block.malformed)} 行 "
+                           f"(例: {block.malformed[0].decode(errors='replace')})")
+
+        # 按标记位置把数据分段, 保证状态转换与数据顺序一致
+        start = 0
+        for index, token in block.markers:
+            self._append_points(block.voltages[start:index], block.currents[start:index])
+            self._handle_response(token)
+            start = index
+        self._append_points(block.voltages[start:], block.currents[start:])
+
+    def _append_points(self, voltages, currents):
+        """追加一批数据点 (仅在接收数据状态下)"""
+        if not len(voltages) or self.state != ProtocolState.RECEIVING_DATA:
+            return
+
+        technique = self.technique
+        buffer = self.data_buffer
+        before = buffer.total
+        now = time.time()
+        # 有界内存模式: 分批追加, 每批在被环形缓冲区覆盖之前写入磁盘并交给分析
+        step = max(buffer.capacity // 4, 1) if self.max_points else len(voltages)
+        for start in range(0, len(voltages), step):
+            buffer.extend(voltages[start:start + step], currents[start:start + step], now)
+            self._flush_points()
+        after = buffer.total
+        self.metrics.points.inc(after - before)
+
+        # 定期显示进度
+        if self.show_progress and \
+                after // technique.progress_interval > before // technique.progress_interval and \
+                logger.isEnabledFor(logging.INFO):
+            logger.info(f"📊 已接收 {after} 个数据点 "
+                        f"(最新: {technique.data_schema.format_point(voltages[-1], currents[-1])})")
+
+    def _flush_points(self):
+        """把上次之后新增的数据点写入磁盘并交给增量分析器"""
+        if self.data_buffer.total == self._flushed or self.state != ProtocolState.RECEIVING_DATA:
+            return
+        self._persist()
+        self._analyze()
+        self._flushed = self.data_buffer.total
+
+    def _analyze(self):
+        """把新数据交给增量分析器"""
+        if self.analyzer is None:
+            return
+        started = time.perf_counter()
+        try:
+            buffer = self.data_buffer
+            self.analyzer.update(buffer.voltages, buffer.currents, offset=buffer.first)
+            self.metrics.analysis_time.observe(time.perf_counter() - started)
+        except Exception as e:
+            print(f"⚠️  实时分析失败, 停止分析: {e}")
+            self.analyzer = None
+
+    def _finish_analysis(self):
+        """测量结束: 完成分析并显示结果"""
+        if self.analyzer is None:
+            return
+        try:
+            buffer = self.data_buffer
+            self.analysis = self.analyzer.finish(buffer.voltages, buffer.currents, offset=buffer.first)
+        except Exception as e:
+            print(f"⚠️  分析失败: {e}")
+            return
+        finally:
+            self.analyzer = None
+        for line in self.analysis.summary_lines():
+            print(f"🔍 {line}")
+
+    def _open_stream(self):
+        """开始接收数据时打开流式写入器"""
+        self._close_stream(complete=False)
+        self._persisted = 0
+        self._flushed = 0
+        if not self.stream_format:
+            return
+
+        path = self.stream_path
+        if path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = (f"{self.technique.file_prefix}_data_{timestamp}"
+                    f"{FORMAT_EXTENSIONS[self.stream_format]}")
+        try:
+            self.stream_writer = open_stream_writer(
+                path, self.stream_format,
+                columns=self.technique.data_schema.columns,
+                metadata={'technique': self.technique.name, 'parameters': self.parameters}
+            )
+            self.stream_file = None
+            print(f"💾 数据实时写入: {path}")
+        except OSError as e:
+            print(f"⚠️  无法创建数据文件, 仅在内存中保存: {e}")
+            self.stream_writer = None
+
+    def _persist(self, final=False):
+        """把尚未写入磁盘的数据点分批写入流式写入器"""
+        writer = self.stream_writer
+        if writer is None:
+            return
+        buffer = self.data_buffer
+        count = buffer.total
+        pending = count - self._persisted
+        # 有界内存模式下未写入的点超过半个缓冲区就写入, 保证在被覆盖之前落盘
+        if pending and (final or writer.due(pending) or
+                        (self.max_points and 2 * pending >= buffer.capacity)):
+            try:
+                writer.write_batch(*buffer.view(max(self._persisted - buffer.first, 0), len(buffer)))
+                self._persisted = count
+            except OSError as e:
+                print(f"⚠️  数据写入磁盘失败, 停止实时写入: {e}")
+                self.stream_writer = None
+
+    def _close_stream(self, complete=True):
+        """写出剩余数据和尾部索引, 关闭流式写入器"""
+        writer = self.stream_writer
+        if writer is None:
+            return
+        self._persist(final=True)
+        self.stream_writer = None
+        try:
+            writer.close(complete=complete)
+        except OSError as e:
+            print(f"⚠️  关闭数据文件失败: {e}")
+            return
+        if complete:
+            self.stream_file = writer.path
+        else:
+            print(f"⚠️  测试未完成, 已写入的 {writer.count} 个数据点保存在: {writer.path}")
+
+    def save_data(self, filename=None):
+        """
+        保存测试数据到 CSV 文件
+
+        采集时已流式写入完整文件的, 直接使用该文件 (指定了其他文件名时复制), 不再重新写入。
+
+        Args:
+            filename: 保存文件名 (默认: <前缀>_data_YYYYMMDD_HHMMSS.csv)
+
+        Returns:
+            保存的文件名或 None (如果失败)
+        """
+        if not self.data_buffer:
+            print("❌ 没有数据可保存")
+            return None
+        streamed = self.stream_file and (filename is None or
+                                         format_from_path(filename) == self.stream_format)
+        if self.data_buffer.first and not streamed:
+            print(f"⚠️  有界内存模式下只能保存内存中最近的 {len(self.data_buffer)} 个点, "
+                  f"完整数据见流式数据文件")
+
+        if streamed:
+            try:
+                if filename is not None and os.path.abspath(filename) != os.path.abspath(self.stream_file):
+                    shutil.copyfile(self.stream_file, filename)
+                else:
+                    filename = self.stream_file
+                print(f"✓ 数据已保存到: {filename}")
+                print(f"✓ 共保存 {self.data_buffer.total} 个数据点")
+                return filename
+            except OSError as e:
+                print(f"❌ 保存数据失败: {e}")
+                return None
+
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{self.technique.file_prefix}_data_{timestamp}.csv"
+
+        try:
+            if format_from_path(filename) == 'binary':
+                write_file(filename, *self.data_buffer.view(),
+                           columns=self.technique.data_schema.columns,
+                           metadata={'technique': self.technique.name, 'parameters': self.parameters})
+                print(f"✓ 数据已保存到: {filename}")
+                print(f"✓ 共保存 {len(self.data_buffer)} 个数据点")
+                return filename
+
+            with open(filename, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(list(self.technique.data_schema.columns))
+                writer.writerows(zip(self.data_buffer.voltages.tolist(),
+                                     self.data_buffer.currents.tolist()))
+
+            print(f"✓ 数据已保存到: {filename}")
+            print(f"✓ 共保存 {len(self.data_buffer)} 个数据点")
+            return filename
+
+        except Exception as e:
+            print(f"❌ 保存数据失败: {e}")
+            return None
+
+    def plot_data(self, save_plot=True):
+        """
+        绘制测试曲线
+
+        Args:
+            save_plot: 是否保存图形到文件 (默认: True)
+        """
+        if not self.data_buffer:
+            print("❌ 没有数据可绘制")
+            return
+
+        try:
+            # 设置中文字体
+            plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
+            plt.rcParams['axes.unicode_minus'] = False
+
+            # 按输出分辨率 (10 英寸 × 300 dpi) 降采样, 保留峰值和转折点; 保存的数据不受影响
+            voltages, currents = minmax_decimate(self.data_buffer.voltages,
+                                                 self.data_buffer.currents, 10 * 300)
+
+            plt.figure(figsize=(10, 6))
+            plt.plot(voltages, currents, 'b-', linewidth=1.5)
+            self._plot_analysis(plt.gca())
+            plt.xlabel('Potential (V)')
+            plt.ylabel('Current (μA)')
+            plt.title(self.technique.title)
+            plt.grid(True, alpha=0.3)
+
+            # 添加数据点信息
+            plt.text(0.02, 0.98, data_points_label(len(self.data_buffer), self.data_buffer.total),
+                     transform=plt.gca().transAxes,
+                     verticalalignment='top',
+                     bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+
+            if save_plot:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                plot_filename = f"{self.technique.file_prefix}_curve_{timestamp}.png"
+                plt.savefig(plot_filename, dpi=300, bbox_inches='tight')
+                print(f"✓ 图形已保存到: {plot_filename}")
+
+            plt.show()
+
+        except Exception as e:
+            print(f"❌ 绘图失败: {e}")
+
+    def _plot_analysis(self, axes):
+        """在图中标出分析结果"""
+        draw_analysis(axes, self.analysis, self.data_buffer.voltages)
+
+    def wait_for_parameter_ack(self, timeout=5):
+        """
+        等待参数确认响应 (#)
+
+        Returns:
+            是否已确认
+        """
+        return self.wait_for(ProtocolState.PARAMETER_SET, timeout=timeout)
+
+
+def draw_analysis(axes, analysis, voltages):
+    """
+    在坐标轴中标出分析结果 (DPV: 峰位置和基线; CV: 逐圈的氧化/还原峰)
+
+    Args:
+        axes: matplotlib 坐标轴
+        analysis: 分析结果 (PeakResult / CycleResult, None 时不绘制)
+        voltages: 测量的全部电位
+    """
+    cycles = getattr(analysis, 'cycles', None)
+    if cycles is not None:
+        if len(analysis):
+            # 颜色表示圈数, 上千圈时可看出峰位置的漂移
+            number = range(1, len(analysis) + 1)
+            axes.scatter(cycles['epa'], cycles['anodic_current'], c=number,
+                         cmap='viridis', marker='^', s=20, zorder=3)
+            axes.scatter(cycles['epc'], cycles['cathodic_current'], c=number,
+                         cmap='viridis', marker='v', s=20, zorder=3)
+        return
+    peaks = getattr(analysis, 'peaks', None)
+    if not peaks:
+        return
+    voltages = voltages[:analysis.points]
+    step = max(len(voltages) // 3000, 1)
+    axes.plot(voltages[::step], analysis.baseline[::step], '--', color='gray',
+              linewidth=1, label='Baseline')
+    for peak in peaks:
+        axes.plot(peak.potential, peak.current, 'rv', markersize=8)
+        axes.annotate(f"{peak.potential:.3f} V\n{peak.height:.3g} μA",
+                      (peak.potential, peak.current), textcoords='offset points',
+                      xytext=(10, 0), ha='left', va='top', fontsize=9)
+
+
+def data_points_label(shown, total=None):
+    """图中的数据点数说明 (有界内存模式下只绘制最近的点时注明)"""
+    if total is not None and total > shown:
+        return f'Data points: {total} (last {shown} shown)'
+    return f'Data points: {shown}'
+
+
+def save_plot_file(path, title, voltages, currents, analysis=None, dpi=150, total=None):
+    """
+    不经过 pyplot 直接把曲线渲染为图片文件 (不显示窗口, 可在后台线程中调用)
+
+    Args:
+        path: 图片文件路径
+        title: 图标题
+        voltages: 电位数组
+        currents: 电流数组
+        analysis: 分析结果 (见 draw_analysis)
+        dpi: 分辨率
+        total: 测量的总点数 (有界内存模式下只传入了最近的点时, 在图中注明)
+    """
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    plot_v, plot_i = minmax_decimate(voltages, currents, 10 * dpi)
+    axes.plot(plot_v, plot_i, 'b-', linewidth=1.5)
+    draw_analysis(axes, analysis, voltages)
+    axes.set_xlabel('Potential (V)')
+    axes.set_ylabel('Current (μA)')
+    axes.set_title(title)
+    axes.grid(True, alpha=0.3)
+    axes.text(0.02, 0.98, data_points_label(len(voltages), total), transform=axes.transAxes,
+              verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+    figure.savefig(path, dpi=dpi, bbox_inches='tight')
+
+
+def run_technique_test(protocol, params, title, param_lines, save_data=True, save_plot=True,
+                       timeout=60):
+    """
+    运行一次完整测试: 连接 → 设置参数 → 等待确认 → 开始 → 采集 → 保存/绘图
+
+    Args:
+        protocol: AcquisitionEngine 实例
+        params: 传给 protocol.send_parameters 的测量参数
+        title: 测试标题
+        param_lines: 需要显示的参数说明行
+        save_data: 是否保存数据到 CSV (默认: True)
+        save_plot: 是否保存图形到文件 (默认: True)
+        timeout: 数据采集超时 (秒)
+
+    Returns:
+        测试是否成功 (True/False)
+    """
+    name = protocol.technique.name
+
+    print(f"🔬 {title}")
+    print("=" * 50)
+
+    try:
+        # 1. 连接设备
+        print("\n📡 步骤1: 连接设备...")
+        if not protocol.connect():
+            return False
+
+        # 2. 发送参数设置
+        print(f"\n⚙️ 步骤2: 设置 {name} 参数...")
+        for line in param_lines:
+            print(f"   {line}")
+
+        if not protocol.send_parameters(**params):
+            return False
+
+        # 3. 等待参数确认
+        print("\n⏳ 步骤3: 等待参数确认...")
+        if not protocol.wait_for_parameter_ack(timeout=5):
+            print("❌ 参数设置失败")
+            return False
+
+        # 4. 发送开始命令
+        print(f"\n🚀 步骤4: 开始 {name} 测试...")
+        if not protocol.send_start_command():
+            return False
+
+        # 5. 处理测试数据
+        print("\n📊 步骤5: 接收测试数据...")
+        protocol.process_responses(timeout=timeout)
+
+        if protocol.state != ProtocolState.TEST_COMPLETE:
+            print(f"❌ {name} 测试未正常完成")
+            return False
+
+        # 6. 保存和显示结果
+        if save_data:
+            print(f"\n💾 步骤6: 保存结果...")
+            filename = protocol.save_data()
+
+            if filename and save_plot:
+                print(f"\n📈 步骤7: 绘制曲线...")
+                protocol.plot_data(save_plot=True)
+        else:
+            if save_plot:
+                print(f"\n📈 步骤6: 绘制曲线...")
+                protocol.plot_data(save_plot=False)
+
+        print(f"\n✅ {name} 测试完成!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 测试过程出错: {e}")
+        return False
+
+    finally:
+        protocol.disconnect()
@@ -0,0 +1,318 @@
+"""asyncio 采集接口: 在事件循环中驱动采集引擎, 不需要读取线程
+
+与同步接口共用 AcquisitionEngine 的协议状态机、数据缓冲、流式写入和实时分析,
+只替换传输层: 串口可读时由事件循环回调读取 (loop.add_reader; Windows 的串口句柄不支持,
+改为定时检查 in_waiting), 模拟设备作为事件循环中的任务按虚拟时间输出。
+多台设备可以在同一个事件循环中并发采集::
+
+    async def measure(port, params):
+        device = AsyncAcquisition(ElectrochemicalProtocol(port=port, stream_format='csv'))
+        if not await device.connect():
+            return None
+        try:
+            await device.configure(params)
+            await device.start()
+            async for voltages, currents, timestamps in device.batches(timeout=120):
+                ...  # 实时处理新数据
+            return device.analysis
+        finally:
+            await device.close()
+
+    results = await asyncio.gather(*(measure(port, {'cycles': 3}) for port in ports))
+"""
+
+import asyncio
+import os
+import queue
+
+from utils.acquisition import ProtocolState
+from utils.capture import RECV
+
+
+ACK_TIMEOUT = 5             # 等待参数确认 / 开始确认的超时 (秒)
+POLL_INTERVAL = 0.01        # 不能注册读回调时检查 in_waiting 的间隔 (秒)
+READ_CHUNK = 65536          # 单次读取的最大字节数
+
+
+class AsyncAcquisition:
+    """在 asyncio 事件循环中驱动一个 AcquisitionEngine (所有方法须在同一个事件循环中调用)"""
+
+    def __init__(self, engine, poll_interval=POLL_INTERVAL):
+        """
+        Args:
+            engine: AcquisitionEngine 实例 (尚未连接)
+            poll_interval: 不能注册读回调时检查串口的间隔 (秒)
+        """
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.bytes_read = 0
+        self._loop = None
+        self._fd = None
+        self._tasks = []             # 轮询读取 / 模拟输出任务
+        self._sim_task = None
+        self._waiters = []           # [(目标状态, future)]
+        self._data_event = asyncio.Event()
+        self._error = None
+        engine.show_progress = False
+
+    @property
+    def state(self):
+        return self.engine.state
+
+    @property
+    def data_buffer(self):
+        return self.engine.data_buffer
+
+    @property
+    def analysis(self):
+        return self.engine.analysis
+
+    async def connect(self):
+        """
+        连接串口设备或启动模拟模式
+
+        Returns:
+            是否连接成功
+        """
+        engine = self.engine
+        self._loop = asyncio.get_running_loop()
+        engine.add_state_listener(self._on_state)
+
+        if engine.simulate:
+            # 模拟设备在事件循环中输出 (见 _simulate), 不启动模拟线程
+            engine._open_capture()
+            engine.external_io = True
+            print(f"启动 {engine.technique.name} 模拟模式 (asyncio)...")
+            return True
+
+        # 打开串口可能阻塞 (驱动初始化), 放到线程池中执行
+        if not await self._loop.run_in_executor(None, engine.connect, False):
+            return False
+        conn = engine.serial_conn
+        conn.timeout = 0
+        try:
+            if os.name == 'nt':
+                raise OSError("串口句柄不支持 select")
+            self._fd = conn.fileno()
+            self._loop.add_reader(self._fd, self._on_readable)
+        except (AttributeError, OSError, ValueError, NotImplementedError):
+            self._fd = None
+            self._tasks.append(self._loop.create_task(self._poll()))
+        return True
+
+    async def close(self):
+        """停止读取并断开连接"""
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        self._cancel_simulation()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.engine.remove_state_listener(self._on_state)
+        self.engine.disconnect()
+        self._wake()
+
+    async def configure(self, params, timeout=ACK_TIMEOUT):
+        """
+        发送测量参数并等待设备确认 (#)
+
+        Args:
+            params: 传给 send_parameters 的测量参数
+            timeout: 确认超时 (秒)
+
+        Returns:
+            是否已确认
+        """
+        if not self.engine.send_parameters(**params):
+            return False
+        self._drain_queue()
+        return await self.wait_for(ProtocolState.PARAMETER_SET, timeout)
+
+    async def start(self, timeout=ACK_TIMEOUT):
+        """
+        发送开始命令并等待开始确认 (*)
+
+        Returns:
+            是否已开始接收数据
+        """
+        engine = self.engine
+        if not engine.send_start_command():
+            return False
+        self._drain_queue()
+        if engine.simulate and engine.state == ProtocolState.RECEIVING_DATA:
+            self._cancel_simulation()
+            self._sim_task = self._loop.create_task(self._simulate())
+        return await self.wait_for(ProtocolState.RECEIVING_DATA, timeout)
+
+    async def wait_for(self, states, timeout=None):
+        """
+        等待进入指定状态
+
+        Args:
+            states: 目标状态 (ProtocolState 或其元组)
+            timeout: 最长等待时间 (秒, None = 不限)
+
+        Returns:
+            是否已进入目标状态 (超时、出错或断开时为 False)
+        """
+        if isinstance(states, ProtocolState):
+            states = (states,)
+        if self.engine.state in states:
+            return True
+        if self._error is not None:
+            return False
+        future = self._loop.create_future()
+        waiter = (states, future)
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def batches(self, timeout=None):
+        """
+        异步迭代本次测量的新数据, 直到测量完成
+
+        每次产出上次之后新增的全部数据点 (电位, 电流, 时间戳) 数组视图 (只读, 不会再变化)。
+        有界内存模式 (engine.max_points) 下视图在下一批数据到达后可能被覆盖, 需要保留时请复制;
+        两次迭代之间新增的点超过保留的点数时, 只产出仍在内存中的部分。
+
+        Args:
+            timeout: 整个测量的超时 (秒, None = 不限); 超时后中止测量并抛出 asyncio.TimeoutError
+
+        Raises:
+            asyncio.TimeoutError: 超时
+            ConnectionError: 读取串口失败
+        """
+        engine = self.engine
+        deadline = None if timeout is None else self._loop.time() + timeout
+        sent = 0
+        while True:
+            self._data_event.clear()
+            buffer = engine.data_buffer
+            count = buffer.total
+            if count > sent:
+                yield buffer.view(max(sent - buffer.first, 0), len(buffer))
+                sent = count
+                continue
+            if self._error is not None:
+                raise ConnectionError(self._error)
+            if engine.state != ProtocolState.RECEIVING_DATA:
+                break
+            remaining = None if deadline is None else deadline - self._loop.time()
+            try:
+                await asyncio.wait_for(self._data_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                self.abort()
+                raise
+
+    async def measure(self, params, timeout=None):
+        """
+        完成一次测量: 设置参数 → 开始 → 接收全部数据
+
+        Returns:
+            是否正常完成 (数据在 data_buffer 中, 分析结果在 analysis 中)
+        """
+        if not await self.configure(params) or not await self.start():
+            self.abort()
+            return False
+        if timeout is None:
+            timeout = self.engine.technique.default_timeout
+        try:
+            async for _ in self.batches(timeout):
+                pass
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            print(f"❌ {self.engine.technique.name} 测量未完成: {str(e) or '超时'}")
+            return False
+        return self.engine.state == ProtocolState.TEST_COMPLETE
+
+    def abort(self):
+        """中止当前测量 (已写入的数据标记为不完整)"""
+        self._cancel_simulation()
+        self.engine.abort_measurement()
+        self._wake()
+
+    def _on_state(self, previous, state):
+        """状态转换回调 (在事件循环中调用): 唤醒等待该状态的协程"""
+        for states, future in self._waiters:
+            if state in states and not future.done():
+                future.set_result(True)
+        self._data_event.set()
+
+    def _wake(self):
+        """出错或断开: 结束全部等待"""
+        for _, future in self._waiters:
+            if not future.done():
+                future.set_result(False)
+        self._data_event.set()
+
+    def _receive(self, data):
+        self.bytes_read += len(data)
+        if self.engine.feed_bytes(data):
+            self._data_event.set()
+
+    def _on_readable(self):
+        """串口可读回调"""
+        try:
+            data = self.engine.serial_conn.read(READ_CHUNK)
+        except Exception as e:
+            self._fail(f"读取失败: {e}")
+            return
+        if data:
+            self._receive(data)
+
+    async def _poll(self):
+        """不能注册读回调时定时检查串口"""
+        conn = self.engine.serial_conn
+        while True:
+            try:
+                waiting = conn.in_waiting
+                data = conn.read(waiting) if waiting else b""
+            except Exception as e:
+                self._fail(f"读取失败: {e}")
+                return
+            if data:
+                self._receive(data)
+            await asyncio.sleep(self.poll_interval)
+
+    def _fail(self, error):
+        print(f"❌ {error}")
+        self.engine.metrics.serial_errors.inc()
+        self._error = error
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        self.engine.state = ProtocolState.ERROR
+        self._wake()
+
+    def _drain_queue(self):
+        """模拟模式: 处理引擎放入响应队列的确认响应 (#、*)"""
+        engine = self.engine
+        while True:
+            try:
+                engine._handle_response(engine._get_response(timeout=0))
+            except queue.Empty:
+                return
+
+    async def _simulate(self):
+        """模拟设备: 按虚拟时间输出一次测量"""
+        engine = self.engine
+        for item in engine.simulator.schedule(engine.parameters):
+            if isinstance(item, float):
+                await asyncio.sleep(item)
+                continue
+            engine._capture(RECV, item)
+            self.bytes_read += len(item)
+            engine._handle_response(item)
+            self._data_event.set()
+            await asyncio.sleep(0)  # 尽可能快模式下也让出事件循环
+
+    def _cancel_simulation(self):
+        if self._sim_task is not None:
+            self._sim_task.cancel()
+            self._sim_task = None
@@ -0,0 +1,351 @@
+"""二进制串口抓包格式 (.ecap)
+
+取代每字节一行的 HEX 文本日志。每条记录保存一次读写的原始数据::
+
+    f64 时间戳 | u8 方向 (0=发送 VIRT->REAL, 1=接收 REAL->VIRT) | u32 长度 | 数据
+
+记录按约 64 KB 打包成数据块, 可选 zlib 压缩; 文件尾部的索引记录每个数据块的位置和时间范围,
+可按时间直接定位。文件结构::
+
+    "ECHEMCAP" | u16 版本 | u16 标志 | u32 头长度 | 头 JSON
+    "CBLK" | u32 存储长度 | u32 原始长度 | u32 记录数 | f64 首条时间 | f64 末条时间 | 数据    (重复)
+    "CIDX" | u32 索引长度 | 索引 JSON
+    u64 索引偏移 | "ECAPEND!"
+
+没有尾部索引 (程序异常退出) 的文件按数据块顺序读取, 最后一个不完整的数据块被忽略。
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from utils.hex_log import HexLog, iter_hex_records
+
+
+CAPTURE_MAGIC = b"ECHEMCAP"
+CAPTURE_END = b"ECAPEND!"
+CAPTURE_VERSION = 1
+BLOCK_TAG = b"CBLK"
+INDEX_TAG = b"CIDX"
+
+FLAG_COMPRESSED = 0x1
+
+SEND = 0   # VIRT->REAL, 主机 → 设备
+RECV = 1   # REAL->VIRT, 设备 → 主机
+
+_RECORD = struct.Struct('<dBI')
+_BLOCK = struct.Struct('<4sIIIdd')
+
+
+class CaptureWriter:
+    """抓包写入器 (线程安全: 发送和接收可在不同线程中记录)"""
+
+    def __init__(self, path, compress=True, block_size=1 << 16, flush_interval=1.0,
+                 metadata=None):
+        """
+        Args:
+            path: 输出文件路径
+            compress: 是否对数据块做 zlib 压缩
+            block_size: 数据块的原始大小上限 (字节)
+            flush_interval: 未满的数据块最长缓存时间 (秒), 超时后写出并 fsync
+            metadata: 写入文件头的附加信息 (串口、波特率、测量技术等)
+        """
+        self.path = path
+        self.compress = compress
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.index = []  # [偏移, 首条时间, 末条时间, 记录数, 原始长度]
+        self.records = 0
+        self.payload_bytes = 0
+        self.closed = False
+
+        self._lock = threading.Lock()
+        self._pending = bytearray()
+        self._pending_records = 0
+        self._first_time = None
+        self._last_time = None
+        self._last_flush = time.monotonic()
+
+        self._file = open(path, 'wb')
+        header = json.dumps({
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'metadata': dict(metadata or {}),
+        }, ensure_ascii=False).encode('utf-8')
+        flags = FLAG_COMPRESSED if compress else 0
+        self._file.write(CAPTURE_MAGIC + struct.pack('<HHI', CAPTURE_VERSION, flags, len(header)) +
+                         header)
+        self._offset = self._file.tell()
+
+    def write(self, direction, data, timestamp=None):
+        """
+        记录一次读写
+
+        Args:
+            direction: SEND 或 RECV
+            data: 原始数据 (bytes/bytearray/str)
+            timestamp: 时间戳 (默认: 当前时间)
+        """
+        if not data:
+            return
+        if isinstance(data, str):
+            data = data.encode()
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            if self.closed:
+                return
+            self._pending += _RECORD.pack(timestamp, direction, len(data))
+            self._pending += data
+            self._pending_records += 1
+            self.records += 1
+            self.payload_bytes += len(data)
+            if self._first_time is None:
+                self._first_time = timestamp
+            self._last_time = timestamp
+
+            if len(self._pending) >= self.block_size or \
+                    time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_block()
+
+    def _flush_block(self):
+        """写出当前数据块并 fsync (调用者持有锁)"""
+        if self._pending_records:
+            raw = bytes(self._pending)
+            stored = zlib.compress(raw, 6) if self.compress else raw
+            self.index.append([self._offset, self._first_time, self._last_time,
+                               self._pending_records, len(raw)])
+            block = _BLOCK.pack(BLOCK_TAG, len(stored), len(raw), self._pending_records,
+                                self._first_time, self._last_time) + stored
+            self._file.write(block)
+            self._offset += len(block)
+
+            self._pending.clear()
+            self._pending_records = 0
+            self._first_time = None
+            self._last_time = None
+
+        self._file.flush()
+        try:
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """写出剩余数据和尾部索引, 关闭文件"""
+        with self._lock:
+            if self.closed:
+                return
+            self._flush_block()
+            payload = json.dumps({
+                'records': self.records,
+                'payload_bytes': self.payload_bytes,
+                'finished': datetime.now().isoformat(timespec='seconds'),
+                'blocks': self.index,
+            }).encode('utf-8')
+            self._file.write(INDEX_TAG + struct.pack('<I', len(payload)) + payload)
+            self._file.write(struct.pack('<Q', self._offset) + CAPTURE_END)
+            self._file.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CaptureReader:
+    """抓包读取器"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 抓包文件路径
+
+        Raises:
+            ValueError: 不是抓包文件
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        head = self._file.read(len(CAPTURE_MAGIC) + 8)
+        if head[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+            self._file.close()
+            raise ValueError(f"不是抓包文件: {path}")
+        self.version, self.flags, header_len = struct.unpack_from('<HHI', head, len(CAPTURE_MAGIC))
+        self.header = json.loads(self._file.read(header_len).decode('utf-8'))
+        self._data_start = self._file.tell()
+
+        self.complete = False
+        self.blocks = self._read_index()
+        if self.blocks is None:
+            self.blocks = self._scan_blocks()
+        else:
+            self.complete = True
+
+    def _read_index(self):
+        """读取尾部索引, 不存在时返回 None"""
+        f = self._file
+        size = f.seek(0, os.SEEK_END)
+        if size < self._data_start + 16:
+            return None
+        f.seek(size - 16)
+        trailer = f.read(16)
+        if trailer[8:] != CAPTURE_END:
+            return None
+        offset, = struct.unpack('<Q', trailer[:8])
+        f.seek(offset)
+        tag = f.read(8)
+        if tag[:4] != INDEX_TAG:
+            return None
+        length, = struct.unpack('<I', tag[4:])
+        self.summary = json.loads(f.read(length).decode('utf-8'))
+        return self.summary['blocks']
+
+    def _scan_blocks(self):
+        """顺序扫描数据块 (文件没有尾部索引时)"""
+        f = self._file
+        size = f.seek(0, os.SEEK_END)
+        blocks = []
+        offset = self._data_start
+        while offset + _BLOCK.size <= size:
+            f.seek(offset)
+            tag, stored, raw, records, first, last = _BLOCK.unpack(f.read(_BLOCK.size))
+            if tag != BLOCK_TAG or offset + _BLOCK.size + stored > size:
+                break
+            blocks.append([offset, first, last, records, raw])
+            offset += _BLOCK.size + stored
+        self.summary = {'records': sum(block[3] for block in blocks),
+                        'payload_bytes': None, 'blocks': blocks}
+        return blocks
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _read_block(self, offset):
+        """读取并解压一个数据块的原始记录数据"""
+        self._file.seek(offset)
+        tag, stored, raw, records, first, last = _BLOCK.unpack(self._file.read(_BLOCK.size))
+        data = self._file.read(stored)
+        if self.flags & FLAG_COMPRESSED:
+            data = zlib.decompress(data)
+        return data, records
+
+    def iter_records(self, start_time=None, end_time=None):
+        """
+        按顺序读取记录 (利用索引跳过时间范围之外的数据块)
+
+        Args:
+            start_time: 起始时间戳 (含)
+            end_time: 结束时间戳 (含)
+
+        Yields:
+            (timestamp, direction, data)
+        """
+        for offset, first, last, _, _ in self.blocks:
+            if start_time is not None and last < start_time:
+                continue
+            if end_time is not None and first > end_time:
+                break
+            data, records = self._read_block(offset)
+            position = 0
+            for _ in range(records):
+                timestamp, direction, length = _RECORD.unpack_from(data, position)
+                position += _RECORD.size
+                if (start_time is None or timestamp >= start_time) and \
+                        (end_time is None or timestamp <= end_time):
+                    yield timestamp, direction, data[position:position + length]
+                position += length
+
+    def iter_chunks(self):
+        """
+        按数据块读取, 每块展开为逐字节数组 (与 hex_log.iter_hex_records 的前三项格式相同)
+
+        Yields:
+            (is_send, values, times): 方向掩码、字节值 (uint8)、时间戳, 按时间顺序
+        """
+        for offset, _, _, _, _ in self.blocks:
+            data, records = self._read_block(offset)
+            payloads = []
+            directions = []
+            stamps = []
+            lengths = []
+            position = 0
+            for _ in range(records):
+                timestamp, direction, length = _RECORD.unpack_from(data, position)
+                position += _RECORD.size
+                payloads.append(data[position:position + length])
+                directions.append(direction == SEND)
+                stamps.append(timestamp)
+                lengths.append(length)
+                position += length
+            lengths = np.array(lengths, dtype=np.int64)
+            yield (np.repeat(np.array(directions, dtype=bool), lengths),
+                   np.frombuffer(b"".join(payloads), dtype=np.uint8),
+                   np.repeat(np.array(stamps), lengths))
+
+    def read_streams(self):
+        """
+        读取全部记录, 按方向拆分为两个字节流 (与 hex_log.read_hex_log 的结果格式相同)
+
+        Returns:
+            HexLog
+        """
+        log = HexLog()
+        for is_send, values, times in self.iter_chunks():
+            log.send.extend(values[is_send], times[is_send])
+            log.recv.extend(values[~is_send], times[~is_send])
+        log.lines = self.summary['records']
+        return log
+
+
+def is_capture_file(path):
+    """判断文件是否为 .ecap 抓包文件 (按文件头)"""
+    with open(path, 'rb') as f:
+        return f.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC
+
+
+def convert_hex_log(hex_path, capture_path, compress=True, chunk_size=16 << 20):
+    """
+    把 HEX 文本日志转换为抓包文件
+
+    同一方向、同一时间戳的连续字节合并为一条记录。
+
+    Args:
+        hex_path: HEX 日志路径
+        capture_path: 输出的抓包文件路径
+        compress: 是否压缩
+        chunk_size: 读取 HEX 日志的块大小
+
+    Returns:
+        CaptureWriter (已关闭, 可查看 records / payload_bytes)
+    """
+    writer = CaptureWriter(capture_path, compress=compress, flush_interval=float('inf'),
+                           metadata={'source': os.path.basename(hex_path)})
+    for is_send, values, times, _, _ in iter_hex_records(hex_path, chunk_size):
+        if not len(values):
+            continue
+        # 方向或时间戳变化处切分记录
+        boundary = np.flatnonzero((is_send[1:] != is_send[:-1]) |
+                                  (times[1:] != times[:-1])) + 1
+        starts = np.concatenate(([0], boundary)).tolist()
+        stops = np.concatenate((boundary, [len(values)])).tolist()
+        payload = values.tobytes()
+        for start, stop in zip(starts, stops):
+            writer.write(SEND if is_send[start] else RECV, payload[start:stop],
+                         float(times[start]))
+    writer.close()
+    return writer
@@ -0,0 +1,448 @@
+"""CV 循环分析: 按扫描方向切分扫描段和循环, 逐圈计算氧化/还原峰、峰电位差 ΔEp、ipa/ipc 和电量
+
+扫描换向按电位差分的符号变化检测, 并带滞回 (电位从极值回撤超过 hysteresis 才确认换向),
+电位噪声引起的微小反向不会被误判为换向。逐段统计 (峰值、基线、积分) 用 reduceat / bincount 一次
+对所有扫描段向量化计算, 上千圈的稳定性测试也只需一次数组遍历。
+CycleTracker 在采集过程中增量切分, 每完成一个扫描段只分析该段, 结束时结果立即可用。
+"""
+
+import numpy as np
+
+from utils.peak_analysis import savgol_coefficients, _smooth_range
+
+
+DEFAULT_HYSTERESIS = 0.01      # 未知扫描范围时的换向滞回 (V)
+HYSTERESIS_RATIO = 0.05        # 滞回 = 扫描范围 × 该比例
+BASELINE_FRACTION = 0.15       # 每段开头用于拟合充电电流基线的比例
+SMOOTH_WINDOW = 7              # 寻峰前的平滑窗口 (点数)
+SMOOTH_ORDER = 2
+
+
+def default_hysteresis(start_v=None, end_v=None):
+    """按扫描范围确定换向滞回 (V)"""
+    if start_v is None or end_v is None or start_v == end_v:
+        return DEFAULT_HYSTERESIS
+    return HYSTERESIS_RATIO * abs(end_v - start_v)
+
+
+class SweepSegmenter:
+    """
+    增量换向检测 (带滞回的 zigzag)
+
+    只在电位差分符号变化的点 (局部极值) 上运行状态机, 单调的扫描段整段跳过。
+    """
+
+    def __init__(self, hysteresis=DEFAULT_HYSTERESIS):
+        """
+        Args:
+            hysteresis: 电位从极值回撤超过该值 (V) 才确认换向
+        """
+        self.hysteresis = hysteresis
+        self.turns = []          # 已确认的换向点下标
+        self.direction = 0       # 当前扫描方向 (1 = 正扫, -1 = 负扫, 0 = 未知)
+        self._extreme = None     # 当前方向上的极值 (电位, 下标)
+        self._low = None         # 方向未知时的最低/最高点
+        self._high = None
+        self._count = 0          # 已处理的点数
+        self._last = None        # 上一个点的电位和差分符号
+        self._last_sign = 0
+
+    def feed(self, voltages, offset=0):
+        """
+        输入新增的电位 (完整数组或新增部分均可, 只处理尚未处理的点)
+
+        Args:
+            voltages: 到目前为止的全部电位 (零拷贝视图即可)
+            offset: voltages[0] 的序号 (环形缓冲区只保留最近的点时为其 first, 默认 0)
+
+        Returns:
+            本次新确认的换向点序号列表
+        """
+        n = offset + len(voltages)
+        start = max(self._count, offset)  # 来不及处理就被覆盖的点直接跳过
+        if n <= start:
+            return []
+        new = voltages[start - offset:]
+        self._count = n
+
+        # 候选点: 差分符号变化处 (每个单调段的末点) 和本批最后一点
+        if self._last is None:
+            previous = new[:1]
+            self._last = float(new[0])
+            self._low = self._high = (self._last, start)
+        else:
+            previous = np.array([self._last])
+        diff = np.diff(np.concatenate((previous, new)))
+        sign = np.sign(diff)
+        nonzero = np.flatnonzero(sign)
+        if not len(nonzero):
+            return []
+        sign = sign[nonzero]
+        change = np.flatnonzero(sign[1:] != sign[:-1])
+        candidates = nonzero[change]                  # 单调段最后一点 (相对 new 的下标)
+        if self._last_sign and sign[0] != self._last_sign:
+            candidates = np.concatenate(([-1], candidates))
+        candidates = np.append(candidates, len(new) - 1)
+        self._last_sign = int(sign[-1])
+        self._last = float(new[-1])
+
+        turns = []
+        values = np.where(candidates >= 0, new[np.maximum(candidates, 0)], previous[0]).tolist()
+        for index, value in zip((candidates + start).tolist(), values):
+            turn = self._step(index, value)
+            if turn is not None:
+                turns.append(turn)
+        self.turns.extend(turns)
+        return turns
+
+    def _step(self, index, value):
+        """状态机处理一个候选点, 确认换向时返回换向点下标"""
+        h = self.hysteresis
+        if self.direction == 0:
+            if value < self._low[0]:
+                self._low = (value, index)
+            if value > self._high[0]:
+                self._high = (value, index)
+            if value - self._low[0] >= h and self._low[1] < index:
+                self.direction, self._extreme = 1, (value, index)
+            elif self._high[0] - value >= h and self._high[1] < index:
+                self.direction, self._extreme = -1, (value, index)
+            return None
+
+        extreme, extreme_index = self._extreme
+        if (value - extreme) * self.direction > 0:
+            self._extreme = (value, index)
+            return None
+        if (extreme - value) * self.direction >= h:
+            self.direction = -self.direction
+            self._extreme = (value, index)
+            return extreme_index
+        return None
+
+
+def segment_sweeps(voltages, hysteresis=None):
+    """
+    把电位序列切分为扫描段
+
+    Args:
+        voltages: 电位数组
+        hysteresis: 换向滞回 (V, 默认: 扫描范围的 5%)
+
+    Returns:
+        扫描段边界下标数组 [0, 换向点..., n - 1]; 第 k 段为 [bounds[k], bounds[k + 1]]
+    """
+    voltages = np.asarray(voltages, dtype=np.float64)
+    n = len(voltages)
+    if n < 2:
+        return np.array([0], dtype=np.int64)[:n]
+    if hysteresis is None:
+        hysteresis = default_hysteresis(voltages.min(), voltages.max())
+    segmenter = SweepSegmenter(hysteresis)
+    segmenter.feed(voltages)
+    return np.array([0] + segmenter.turns + [n - 1], dtype=np.int64)
+
+
+def _smoothed(currents, starts, stops):
+    """平滑 [starts, stops] 覆盖的区间 (与整段平滑的结果一致)"""
+    coefficients = savgol_coefficients(SMOOTH_WINDOW, SMOOTH_ORDER)
+    lo, hi = int(starts.min()), int(stops.max()) + 1
+    if len(currents) < SMOOTH_WINDOW:
+        return currents[lo:hi].astype(np.float64), lo
+    return _smooth_range(currents, lo, hi, coefficients), lo
+
+
+def _segment_argext(values, starts, lengths, extreme):
+    """每段极值所在的下标 (向量化: reduceat 求极值, 再找每段第一个等于极值的位置)"""
+    reduced = extreme.reduceat(values, starts)
+    segment = np.repeat(np.arange(len(starts)), lengths)
+    hits = np.flatnonzero(values == reduced[segment])
+    _, first = np.unique(segment[hits], return_index=True)
+    return hits[first]
+
+
+def analyze_sweeps(voltages, currents, bounds, scan_rate=None, timestamps=None):
+    """
+    向量化分析多个扫描段
+
+    每段: 扫描方向; 开头 BASELINE_FRACTION 的点线性拟合充电电流基线并外推;
+    正扫取最大 (氧化峰), 负扫取最小 (还原峰); 峰高相对基线;
+    电量 Q = ∫ i dt (有扫描速率时按 dt = |dE| / v, 否则按时间戳)。
+
+    Args:
+        voltages: 电位数组
+        currents: 电流数组
+        bounds: 扫描段边界 (segment_sweeps 的结果, 或其中连续的一部分)
+        scan_rate: 扫描速率 (V/s)
+        timestamps: 每个点的时间戳 (没有扫描速率时用于积分)
+
+    Returns:
+        每段一个元素的数组字典: start, stop, direction, peak_index, peak_potential,
+        peak_current, peak_height, charge (μC)
+    """
+    bounds = np.asarray(bounds, dtype=np.int64)
+    starts, stops = bounds[:-1], bounds[1:]
+    keep = stops > starts
+    starts, stops = starts[keep], stops[keep]
+    result = {'start': starts, 'stop': stops}
+    if not len(starts):
+        for name in ('direction', 'peak_index', 'peak_potential', 'peak_current',
+                     'peak_height', 'charge'):
+            result[name] = np.empty(0)
+        return result
+
+    smoothed, offset = _smoothed(currents, starts, stops)
+    v = voltages[offset:offset + len(smoothed)]
+    local_starts = starts - offset
+    lengths = stops - starts          # 每段不含终点 (终点是下一段的起点)
+    direction = np.sign(voltages[stops] - voltages[starts]).astype(np.int64)
+    direction[direction == 0] = 1
+
+    # 所有段的点拼接在一起 (各段不含终点), positions 为对应的 smoothed 下标
+    segment_of = np.repeat(np.arange(len(starts)), lengths)
+    segment_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    positions = np.arange(int(lengths.sum())) + np.repeat(local_starts - segment_starts, lengths)
+
+    # 正扫找最大, 负扫找最小: 统一为找 direction × 电流 的最大值
+    values = smoothed[positions] * direction[segment_of]
+    peak_local = positions[_segment_argext(values, segment_starts, lengths, np.maximum)]
+
+    # 充电电流基线: 每段开头的点线性拟合 (bincount 分段求和, 一次得到所有段的最小二乘解)
+    # 跳过换向处的点: 平滑窗口跨过换向点, 且实际测量中换向后有充电暂态
+    skip = np.minimum(SMOOTH_WINDOW, lengths // 10)
+    fit_lengths = np.maximum((lengths * BASELINE_FRACTION).astype(np.int64), 2)
+    fit_lengths = np.minimum(fit_lengths, lengths - skip)
+    offset_in_segment = positions - local_starts[segment_of]
+    in_fit = (offset_in_segment >= skip[segment_of]) & \
+        (offset_in_segment < (skip + fit_lengths)[segment_of])
+    x = v[positions][in_fit]
+    y = smoothed[positions][in_fit]
+    fit_segment = segment_of[in_fit]
+    count = np.bincount(fit_segment, minlength=len(starts)).astype(np.float64)
+    sx = np.bincount(fit_segment, x, len(starts))
+    sy = np.bincount(fit_segment, y, len(starts))
+    sxx = np.bincount(fit_segment, x * x, len(starts))
+    sxy = np.bincount(fit_segment, x * y, len(starts))
+    denominator = count * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(np.abs(denominator) > 1e-18, (count * sxy - sx * sy) / denominator, 0.0)
+        intercept = np.where(count > 0, (sy - slope * sx) / count, 0.0)
+    peak_potential = v[peak_local]
+    peak_current = smoothed[peak_local]
+    peak_height = peak_current - (slope * peak_potential + intercept)
+
+    # 电量: 梯形积分, 每段 [start, stop]; 只对 [lo, hi] 范围求 dt (增量分析时 voltages 是整个缓冲区)
+    lo, hi = int(starts.min()), int(stops.max())
+    i_raw = np.asarray(currents[lo:hi + 1], dtype=np.float64)
+    if scan_rate:
+        dt = np.abs(np.diff(voltages[lo:hi + 1])) / abs(scan_rate)
+    elif timestamps is not None and len(timestamps) == len(voltages):
+        dt = np.diff(timestamps[lo:hi + 1])
+    else:
+        dt = None
+    if dt is not None:
+        pieces = (i_raw[1:] + i_raw[:-1]) * 0.5 * dt
+        cumulative = np.concatenate(([0.0], np.cumsum(np.nan_to_num(pieces))))
+        charge = cumulative[stops - lo] - cumulative[starts - lo]
+    else:
+        charge = np.full(len(starts), np.nan)
+
+    result.update({
+        'direction': direction,
+        'peak_index': peak_local + offset,
+        'peak_potential': peak_potential,
+        'peak_current': peak_current,
+        'peak_height': peak_height,
+        'charge': charge,
+    })
+    return result
+
+
+def _concat_sweeps(parts):
+    names = ('start', 'stop', 'direction', 'peak_index', 'peak_potential', 'peak_current',
+             'peak_height', 'charge')
+    if not parts:
+        return {name: np.empty(0) for name in names}
+    return {name: np.concatenate([part[name] for part in parts]) for name in names}
+
+
+class CycleResult:
+    """CV 循环分析结果"""
+
+    def __init__(self, sweeps, points):
+        """
+        Args:
+            sweeps: analyze_sweeps 的结果 (全部扫描段)
+            points: 参与分析的数据点数
+        """
+        self.sweeps = sweeps
+        self.points = points
+        self.cycles = self._pair_cycles(sweeps)
+
+    @staticmethod
+    def _pair_cycles(sweeps):
+        """
+        相邻的正扫和负扫组成一圈 (按第一段的方向开始配对)
+
+        Returns:
+            每圈一个元素的数组字典: start, stop, epa / epc (峰电位), ipa / ipc (相对基线的峰高),
+            delta_ep, e_half, ratio (ipa / |ipc|), qa / qc (电量),
+            anodic_current / cathodic_current (平滑后的峰处电流, 用于绘图)
+        """
+        count = len(sweeps['start']) // 2
+        names = ('start', 'stop', 'epa', 'ipa', 'epc', 'ipc', 'delta_ep', 'e_half', 'ratio',
+                 'qa', 'qc', 'anodic_current', 'cathodic_current')
+        if not count:
+            return {name: np.empty(0) for name in names}
+        first = np.arange(count) * 2
+        second = first + 1
+        anodic_first = sweeps['direction'][first] > 0
+        a = np.where(anodic_first, first, second)
+        c = np.where(anodic_first, second, first)
+        epa, ipa = sweeps['peak_potential'][a], sweeps['peak_height'][a]
+        epc, ipc = sweeps['peak_potential'][c], sweeps['peak_height'][c]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(ipc != 0, ipa / np.abs(ipc), np.nan)
+        return {
+            'start': sweeps['start'][first],
+            'stop': sweeps['stop'][second],
+            'epa': epa, 'ipa': ipa,
+            'epc': epc, 'ipc': ipc,
+            'delta_ep': epa - epc,
+            'e_half': (epa + epc) / 2.0,
+            'ratio': ratio,
+            'qa': sweeps['charge'][a],
+            'qc': sweeps['charge'][c],
+            'anodic_current': sweeps['peak_current'][a],
+            'cathodic_current': sweeps['peak_current'][c],
+        }
+
+    def __len__(self):
+        return len(self.cycles['start'])
+
+    @property
+    def sweep_bounds(self):
+        """扫描段边界 [(start, stop)]"""
+        return list(zip(self.sweeps['start'].tolist(), self.sweeps['stop'].tolist()))
+
+    @property
+    def cycle_bounds(self):
+        """每圈的数据区间 [(start, stop)] (不完整的最后半圈单独成一项)"""
+        bounds = list(zip(self.cycles['start'].tolist(), self.cycles['stop'].tolist()))
+        if len(self.sweeps['start']) % 2:
+            bounds.append((int(self.sweeps['start'][-1]), int(self.sweeps['stop'][-1])))
+        return bounds
+
+    def cycle_table(self):
+        """每圈一行的字典列表 (ΔEp 单位 V, 电流 μA, 电量 μC)"""
+        names = ('epa', 'ipa', 'epc', 'ipc', 'delta_ep', 'e_half', 'ratio', 'qa', 'qc')
+        columns = [self.cycles[name].tolist() for name in names]
+        return [dict(zip(('cycle',) + names, (number,) + row))
+                for number, row in enumerate(zip(*columns), 1)]
+
+    def summary_lines(self, max_cycles=5):
+        """结果摘要 (圈数多时只列出前几圈和最后一圈, 以及首末圈的变化)"""
+        count = len(self)
+        lines = [f"{len(self.sweeps['start'])} 个扫描段, {count} 个完整循环"]
+        if not count:
+            return lines
+        table = self.cycle_table()
+        shown = table if count <= max_cycles else table[:max_cycles - 1] + table[-1:]
+        for row in shown:
+            lines.append(
+                f"第 {row['cycle']} 圈: Epa = {row['epa']:.4f} V, Epc = {row['epc']:.4f} V, "
+                f"ΔEp = {row['delta_ep'] * 1000:.1f} mV, ipa = {row['ipa']:.4g} μA, "
+                f"ipc = {row['ipc']:.4g} μA, ipa/ipc = {row['ratio']:.3f}"
+                + (f", Qa = {row['qa']:.4g} μC, Qc = {row['qc']:.4g} μC"
+                   if not np.isnan(row['qa']) else ""))
+        if count > 1:
+            first, last = table[0], table[-1]
+            retention = last['ipa'] / first['ipa'] * 100 if first['ipa'] else float('nan')
+            lines.append(f"第 1 → {count} 圈: ΔEp 变化 "
+                         f"{(last['delta_ep'] - first['delta_ep']) * 1000:+.1f} mV, "
+                         f"ipa 保持率 {retention:.1f}%")
+        return lines
+
+
+def analyze_cycles(voltages, currents, hysteresis=None, scan_rate=None, timestamps=None):
+    """
+    CV 循环分析 (一次性处理完整数据)
+
+    Args:
+        voltages: 电位数组
+        currents: 电流数组
+        hysteresis: 换向滞回 (V, 默认: 扫描范围的 5%)
+        scan_rate: 扫描速率 (V/s, 用于电量积分)
+        timestamps: 时间戳 (没有扫描速率时用于电量积分)
+
+    Returns:
+        CycleResult
+    """
+    voltages = np.asarray(voltages, dtype=np.float64)
+    currents = np.asarray(currents, dtype=np.float64)
+    bounds = segment_sweeps(voltages, hysteresis)
+    if len(bounds) < 2:
+        return CycleResult(_concat_sweeps([]), len(voltages))
+    return CycleResult(analyze_sweeps(voltages, currents, bounds, scan_rate, timestamps),
+                       len(voltages))
+
+
+class CycleTracker:
+    """
+    采集过程中的增量循环分析
+
+    每次 update 只检测新增点中的换向; 每确认一个换向点就分析刚结束的扫描段。
+    finish 分析最后一段并组合成 CycleResult。
+
+    数据来自环形缓冲区 (有界内存模式) 时传入 offset (数组第一个点的序号): 每段结果只有
+    几个数值, 长时间重复扫描时内存基本不变; 比窗口还长的扫描段只分析窗口内的部分。
+    结果中的下标 (start, stop, peak_index) 均为序号。
+    """
+
+    def __init__(self, hysteresis=DEFAULT_HYSTERESIS, scan_rate=None):
+        """
+        Args:
+            hysteresis: 换向滞回 (V)
+            scan_rate: 扫描速率 (V/s, 用于电量积分; 默认: 按时间戳)
+        """
+        self.scan_rate = scan_rate
+        self.segmenter = SweepSegmenter(hysteresis)
+        self.result = None
+        self._parts = []         # 已分析扫描段的结果
+        self._boundary = 0       # 下一段的起点 (序号)
+        self._timestamps = None
+
+    def update(self, voltages, currents, timestamps=None, offset=0):
+        """
+        输入当前完整数据 (可直接传入 DataBuffer 的零拷贝视图)
+
+        Args:
+            offset: 数组第一个点的序号 (环形缓冲区的 first, 默认 0)
+
+        Returns:
+            已完成的扫描段数
+        """
+        for turn in self.segmenter.feed(voltages, offset):
+            self._analyze_part(voltages, currents, timestamps, offset, turn)
+        return len(self._parts)
+
+    def finish(self, voltages, currents, timestamps=None, offset=0):
+        """
+        测量结束: 分析最后一段, 返回 CycleResult
+        """
+        self.update(voltages, currents, timestamps, offset)
+        n = offset + len(voltages)
+        if n - 1 > self._boundary:
+            self._analyze_part(voltages, currents, timestamps, offset, n - 1)
+        self.result = CycleResult(_concat_sweeps(self._parts), n)
+        return self.result
+
+    def _analyze_part(self, voltages, currents, timestamps, offset, stop):
+        """分析 [_boundary, stop] 这一段 (序号), 起点已被覆盖时从窗口开头算起"""
+        start = max(self._boundary, offset)
+        part = analyze_sweeps(voltages, currents, [start - offset, stop - offset],
+                              self.scan_rate, timestamps)
+        if offset:
+            for name in ('start', 'stop', 'peak_index'):
+                part[name] = part[name] + offset
+        self._parts.append(part)
+        self._boundary = stop
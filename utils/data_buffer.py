@@ -0,0 +1,344 @@
+"""列式数据缓冲区: 基于 NumPy 的可增长 (电位, 电流, 时间戳) 存储, 以及只保留最近 N 个点的环形缓冲区"""
+
+import numpy as np
+
+
+class DataBuffer:
+    """
+    列式数据缓冲区
+
+    以 float64 列分别存储电位、电流和时间戳, 容量不足时按倍数扩容 (摊销 O(1) 追加)。
+    voltages / currents / timestamps 返回零拷贝的 NumPy 视图, 可直接用于绘图、保存和分析。
+
+    注意: 视图指向当前底层数组, 扩容后旧视图不会看到新追加的数据, 需要重新获取。
+    为兼容旧代码, 迭代和下标访问仍返回 (voltage, current) 元组。
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Args:
+            capacity: 初始容量 (数据点数)
+        """
+        capacity = max(int(capacity), 1)
+        self._voltage = np.empty(capacity, dtype=np.float64)
+        self._current = np.empty(capacity, dtype=np.float64)
+        self._timestamp = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+
+    def _reserve(self, needed):
+        """保证容量至少为 needed, 不足时按倍数扩容"""
+        capacity = len(self._voltage)
+        if needed <= capacity:
+            return
+
+        new_capacity = max(capacity * 2, needed)
+        size = self._size
+        for name in ('_voltage', '_current', '_timestamp'):
+            old = getattr(self, name)
+            new = np.empty(new_capacity, dtype=np.float64)
+            new[:size] = old[:size]
+            setattr(self, name, new)
+
+    def append(self, voltage, current, timestamp=np.nan):
+        """追加一个数据点"""
+        size = self._size
+        if size == len(self._voltage):
+            self._reserve(size + 1)
+        self._voltage[size] = voltage
+        self._current[size] = current
+        self._timestamp[size] = timestamp
+        self._size = size + 1
+
+    def extend(self, voltages, currents, timestamps=None):
+        """
+        批量追加数据点
+
+        Args:
+            voltages: 电位序列
+            currents: 电流序列 (与 voltages 等长)
+            timestamps: 时间戳序列或单个时间戳 (默认: NaN)
+        """
+        voltages = np.asarray(voltages, dtype=np.float64)
+        currents = np.asarray(currents, dtype=np.float64)
+        if voltages.shape != currents.shape:
+            raise ValueError("电位和电流长度不一致")
+
+        count = len(voltages)
+        if not count:
+            return
+
+        size = self._size
+        self._reserve(size + count)
+        end = size + count
+        self._voltage[size:end] = voltages
+        self._current[size:end] = currents
+        self._timestamp[size:end] = np.nan if timestamps is None else timestamps
+        self._size = end
+
+    def clear(self):
+        """清空数据 (保留已分配的容量)"""
+        self._size = 0
+
+    def copy(self):
+        """返回数据的独立副本"""
+        other = DataBuffer(capacity=self._size)
+        other.extend(self.voltages, self.currents, self.timestamps)
+        return other
+
+    @property
+    def voltages(self):
+        """电位列 (零拷贝视图)"""
+        return self._voltage[:self._size]
+
+    @property
+    def currents(self):
+        """电流列 (零拷贝视图)"""
+        return self._current[:self._size]
+
+    @property
+    def timestamps(self):
+        """时间戳列 (零拷贝视图)"""
+        return self._timestamp[:self._size]
+
+    def view(self, start=0, stop=None):
+        """
+        返回指定区间的 (电位, 电流, 时间戳) 视图
+
+        Args:
+            start: 起始下标
+            stop: 结束下标 (默认: 当前长度)
+        """
+        size = self._size
+        stop = size if stop is None else min(stop, size)
+        return (self._voltage[start:stop],
+                self._current[start:stop],
+                self._timestamp[start:stop])
+
+    @property
+    def capacity(self):
+        """已分配的容量 (数据点数)"""
+        return len(self._voltage)
+
+    @property
+    def nbytes(self):
+        """已分配的内存 (字节)"""
+        return self._voltage.nbytes + self._current.nbytes + self._timestamp.nbytes
+
+    @property
+    def total(self):
+        """追加过的数据点总数 (DataBuffer 不丢弃数据, 等于 len)"""
+        return self._size
+
+    @property
+    def first(self):
+        """缓冲区中第一个点的序号 (之前已丢弃的点数; DataBuffer 恒为 0)"""
+        return 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if not isinstance(index, (int, np.integer)):
+            raise TypeError("DataBuffer 仅支持整数下标, 区间请使用 view()")
+        size = self._size
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("DataBuffer 下标越界")
+        return float(self._voltage[index]), float(self._current[index])
+
+    def __iter__(self):
+        return zip(self.voltages.tolist(), self.currents.tolist())
+
+    def __repr__(self):
+        return f"DataBuffer(size={self._size}, capacity={self.capacity})"
+
+
+class RingBuffer:
+    """
+    固定容量的环形数据缓冲区 (有界内存模式)
+
+    只保留最近 capacity 个点, 内存在创建时一次分配, 之后不再增长; 更早的点被覆盖
+    (需要完整数据时应同时流式写入磁盘)。接口与 DataBuffer 相同, 下标和 view() 的区间
+    都相对于当前保留的数据; total / first 给出追加过的总点数和第一个保留点的序号。
+
+    每列分配 2 × capacity 并把每个点同时写入两处, 保留的数据在底层数组中总是连续的,
+    voltages / currents / timestamps 仍是零拷贝视图。
+
+    注意: 视图只在下一次追加之前有效 (之后其中的点可能被覆盖), 需要保留时请复制。
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity: 最多保留的数据点数
+        """
+        capacity = int(capacity)
+        if capacity < 1:
+            raise ValueError("环形缓冲区容量必须为正数")
+        self._capacity = capacity
+        self._voltage = np.empty(2 * capacity, dtype=np.float64)
+        self._current = np.empty(2 * capacity, dtype=np.float64)
+        self._timestamp = np.empty(2 * capacity, dtype=np.float64)
+        self._start = 0      # 最早保留点在前半部分中的位置
+        self._size = 0
+        self._total = 0
+
+    def _write(self, position, voltages, currents, timestamps):
+        """从 position (< capacity) 开始写入不超过 capacity 个点, 同时写入两个副本"""
+        capacity = self._capacity
+        count = len(voltages)
+        first = min(count, capacity - position)
+        for column, values in ((self._voltage, voltages), (self._current, currents),
+                               (self._timestamp, timestamps)):
+            column[position:position + first] = values[:first]
+            column[position + capacity:position + capacity + first] = values[:first]
+            if first < count:
+                # 绕回开头
+                column[:count - first] = values[first:]
+                column[capacity:capacity + count - first] = values[first:]
+
+    def append(self, voltage, current, timestamp=np.nan):
+        """追加一个数据点 (已满时覆盖最早的点)"""
+        capacity = self._capacity
+        position = (self._start + self._size) % capacity
+        for column, value in ((self._voltage, voltage), (self._current, current),
+                              (self._timestamp, timestamp)):
+            column[position] = value
+            column[position + capacity] = value
+        if self._size < capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % capacity
+        self._total += 1
+
+    def extend(self, voltages, currents, timestamps=None):
+        """
+        批量追加数据点 (已满时覆盖最早的点; 一次超过容量时只保留最后 capacity 个)
+
+        Args:
+            voltages: 电位序列
+            currents: 电流序列 (与 voltages 等长)
+            timestamps: 时间戳序列或单个时间戳 (默认: NaN)
+        """
+        voltages = np.asarray(voltages, dtype=np.float64)
+        currents = np.asarray(currents, dtype=np.float64)
+        if voltages.shape != currents.shape:
+            raise ValueError("电位和电流长度不一致")
+
+        count = len(voltages)
+        if not count:
+            return
+        timestamps = np.broadcast_to(np.nan if timestamps is None else
+                                     np.asarray(timestamps, dtype=np.float64), voltages.shape)
+
+        capacity = self._capacity
+        self._total += count
+        if count > capacity:
+            voltages, currents, timestamps = voltages[-capacity:], currents[-capacity:], timestamps[-capacity:]
+            count = capacity
+        self._write((self._start + self._size) % capacity, voltages, currents, timestamps)
+        overflow = max(self._size + count - capacity, 0)
+        self._start = (self._start + overflow) % capacity
+        self._size += count - overflow
+
+    def clear(self):
+        """清空数据 (保留已分配的内存)"""
+        self._start = 0
+        self._size = 0
+        self._total = 0
+
+    def skip(self, count):
+        """
+        跳过 count 个没有收到的点 (如两次界面更新之间的新数据超过了容量)
+
+        保留的点与之后的点不再连续, 因此一并清空; total 计入跳过的点, 之后追加的点序号保持一致。
+        """
+        self._start = 0
+        self._size = 0
+        self._total += count
+
+    def copy(self):
+        """返回当前保留数据的独立副本 (DataBuffer)"""
+        other = DataBuffer(capacity=self._size)
+        other.extend(self.voltages, self.currents, self.timestamps)
+        return other
+
+    @property
+    def voltages(self):
+        """电位列 (零拷贝视图, 按时间顺序)"""
+        return self._voltage[self._start:self._start + self._size]
+
+    @property
+    def currents(self):
+        """电流列 (零拷贝视图, 按时间顺序)"""
+        return self._current[self._start:self._start + self._size]
+
+    @property
+    def timestamps(self):
+        """时间戳列 (零拷贝视图, 按时间顺序)"""
+        return self._timestamp[self._start:self._start + self._size]
+
+    def view(self, start=0, stop=None):
+        """
+        返回指定区间的 (电位, 电流, 时间戳) 视图
+
+        Args:
+            start: 起始下标 (相对于当前保留的数据)
+            stop: 结束下标 (默认: 当前长度)
+        """
+        size = self._size
+        stop = size if stop is None else min(stop, size)
+        begin = self._start
+        return (self._voltage[begin + start:begin + stop],
+                self._current[begin + start:begin + stop],
+                self._timestamp[begin + start:begin + stop])
+
+    @property
+    def capacity(self):
+        """最多保留的数据点数"""
+        return self._capacity
+
+    @property
+    def nbytes(self):
+        """已分配的内存 (字节, 创建后不变)"""
+        return self._voltage.nbytes + self._current.nbytes + self._timestamp.nbytes
+
+    @property
+    def total(self):
+        """追加过的数据点总数 (含已覆盖的点)"""
+        return self._total
+
+    @property
+    def first(self):
+        """缓冲区中第一个点的序号 (已覆盖的点数)"""
+        return self._total - self._size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if not isinstance(index, (int, np.integer)):
+            raise TypeError("RingBuffer 仅支持整数下标, 区间请使用 view()")
+        size = self._size
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("RingBuffer 下标越界")
+        return float(self._voltage[self._start + index]), float(self._current[self._start + index])
+
+    def __iter__(self):
+        return zip(self.voltages.tolist(), self.currents.tolist())
+
+    def __repr__(self):
+        return f"RingBuffer(size={self._size}, capacity={self._capacity}, total={self._total})"
+
+
+def create_buffer(max_points=None):
+    """
+    创建采集用的数据缓冲区
+
+    Args:
+        max_points: 最多保留的点数 (None = 不限, 使用可增长的 DataBuffer)
+    """
+    return DataBuffer() if not max_points else RingBuffer(max_points)
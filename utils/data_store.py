@@ -0,0 +1,302 @@
+"""流式数据存储: 采集过程中把数据分批追加写入磁盘
+
+支持两种格式:
+
+- CSV (.csv): 与原来的保存格式相同 (表头 + <电位>,<电流> 行), 完成时写出旁路索引文件
+  <文件名>.meta.json (点数、是否完整、每批数据的行号 → 字节偏移)。
+- 二进制列式 (.ecb): 文件头 + 若干数据块 + 尾部索引, 每个数据块依次存放
+  电位/电流/时间戳三列 float64 (小端)。文件尾固定 16 字节, 记录索引位置::
+
+      "ECHEMCOL" | u16 版本 | u32 头长度 | 头 JSON
+      "CHNK" | u32 点数 | 电位[点数] | 电流[点数] | 时间戳[点数]     (重复)
+      "FOOT" | u32 索引长度 | 索引 JSON
+      u64 索引偏移 | "ECHEMEND"
+
+  采集中断 (没有尾部索引) 的文件仍可按数据块顺序读出已写入的全部完整数据块。
+
+写入器带缓冲, 并按时间间隔 flush + fsync, 崩溃或断线时最多丢失一个间隔内的数据。
+"""
+
+import json
+import os
+import struct
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+BINARY_MAGIC = b"ECHEMCOL"
+BINARY_END = b"ECHEMEND"
+BINARY_VERSION = 1
+CHUNK_TAG = b"CHNK"
+FOOTER_TAG = b"FOOT"
+
+FORMAT_EXTENSIONS = {'csv': '.csv', 'binary': '.ecb'}
+
+
+class StreamWriter:
+    """流式写入器基类"""
+
+    format_name = None
+
+    def __init__(self, path, columns=('电位(V)', '电流(μA)'), metadata=None,
+                 flush_points=256, fsync_interval=1.0, buffer_size=1 << 20):
+        """
+        Args:
+            path: 输出文件路径
+            columns: 列名 (电位, 电流)
+            metadata: 写入文件头/索引的附加信息 (测量技术、参数等, 需可 JSON 序列化)
+            flush_points: 累积多少个点后写入一批
+            fsync_interval: flush + fsync 的时间间隔 (秒)
+            buffer_size: 文件写缓冲区大小 (字节)
+        """
+        self.path = path
+        self.columns = tuple(columns)
+        self.metadata = dict(metadata or {})
+        self.flush_points = flush_points
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        self.index = []  # [起始点号, 字节偏移, 点数]
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.closed = False
+        self.complete = False
+
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._offset = 0
+        self._last_sync = time.monotonic()
+        self._write_header()
+
+    def due(self, pending):
+        """是否应写入累积的 pending 个点 (点数达到 flush_points 或超过 fsync 间隔)"""
+        return pending >= self.flush_points or \
+            time.monotonic() - self._last_sync >= self.fsync_interval
+
+    def write_batch(self, voltages, currents, timestamps=None):
+        """
+        追加写入一批数据
+
+        Args:
+            voltages: 电位数组
+            currents: 电流数组
+            timestamps: 时间戳数组 (默认: NaN)
+        """
+        n = len(voltages)
+        if not n or self.closed:
+            return
+        voltages = np.asarray(voltages, dtype=np.float64)
+        currents = np.asarray(currents, dtype=np.float64)
+        if timestamps is None:
+            timestamps = np.full(n, np.nan)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+
+        self.index.append([self.count, self._offset, n])
+        self._write_chunk(voltages, currents, timestamps)
+        self.count += n
+
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """把缓冲区写入磁盘 (flush + fsync)"""
+        if self.closed:
+            return
+        self._file.flush()
+        try:
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+        self._last_sync = time.monotonic()
+
+    def close(self, complete=True):
+        """
+        结束写入: 写出尾部索引并关闭文件
+
+        Args:
+            complete: 测量是否正常完成 (False 表示中断, 索引中标记为不完整)
+        """
+        if self.closed:
+            return
+        self.complete = complete
+        footer = {
+            'format': self.format_name,
+            'columns': list(self.columns),
+            'count': self.count,
+            'complete': complete,
+            'started': self.started,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'metadata': self.metadata,
+            'index': self.index,
+        }
+        self._write_footer(footer)
+        self.sync()
+        self._file.close()
+        self.closed = True
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _write_header(self):
+        raise NotImplementedError
+
+    def _write_chunk(self, voltages, currents, timestamps):
+        raise NotImplementedError
+
+    def _write_footer(self, footer):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
+
+class CsvStreamWriter(StreamWriter):
+    """CSV 流式写入器 (索引写入旁路文件 <文件名>.meta.json)"""
+
+    format_name = 'csv'
+
+    def _write_header(self):
+        self._write((",".join(self.columns) + "\r\n").encode('utf-8'))
+
+    def _write_chunk(self, voltages, currents, timestamps):
+        # 与 csv.writer 的输出一致: repr 格式的浮点数, \r\n 行尾
+        rows = "".join(map("{!r},{!r}\r\n".format, voltages.tolist(), currents.tolist()))
+        self._write(rows.encode('ascii'))
+
+    def _write_footer(self, footer):
+        with open(meta_path(self.path), 'w', encoding='utf-8') as f:
+            json.dump(footer, f, ensure_ascii=False)
+
+
+class BinaryStreamWriter(StreamWriter):
+    """二进制列式流式写入器"""
+
+    format_name = 'binary'
+
+    def _write_header(self):
+        header = json.dumps({
+            'columns': list(self.columns) + ['时间戳(s)'],
+            'dtype': '<f8',
+            'started': self.started,
+            'metadata': self.metadata,
+        }, ensure_ascii=False).encode('utf-8')
+        self._write(BINARY_MAGIC + struct.pack('<HI', BINARY_VERSION, len(header)) + header)
+
+    def _write_chunk(self, voltages, currents, timestamps):
+        self._write(CHUNK_TAG + struct.pack('<I', len(voltages)))
+        for column in (voltages, currents, timestamps):
+            self._write(column.astype('<f8', copy=False).tobytes())
+
+    def _write_footer(self, footer):
+        offset = self._offset
+        payload = json.dumps(footer, ensure_ascii=False).encode('utf-8')
+        self._write(FOOTER_TAG + struct.pack('<I', len(payload)) + payload)
+        self._write(struct.pack('<Q', offset) + BINARY_END)
+
+
+def meta_path(path):
+    """CSV 文件的旁路索引文件路径"""
+    return path + ".meta.json"
+
+
+def open_stream_writer(path, fmt='csv', **kwargs):
+    """
+    按格式创建流式写入器
+
+    Args:
+        path: 输出文件路径
+        fmt: 'csv' 或 'binary'
+        **kwargs: 传给写入器的参数
+
+    Returns:
+        StreamWriter 实例
+    """
+    writers = {'csv': CsvStreamWriter, 'binary': BinaryStreamWriter}
+    if fmt not in writers:
+        raise ValueError(f"不支持的存储格式: {fmt}")
+    return writers[fmt](path, **kwargs)
+
+
+def format_from_path(path):
+    """按扩展名判断存储格式 (.ecb 为二进制, 其余为 CSV)"""
+    return 'binary' if path.lower().endswith(FORMAT_EXTENSIONS['binary']) else 'csv'
+
+
+def read_binary(path):
+    """
+    读取二进制列式文件
+
+    有尾部索引时按索引读取; 没有时 (采集中断) 顺序扫描数据块, 读出所有完整的数据块。
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        (voltages, currents, timestamps, info), info 为索引/文件头信息, 含 'complete' 字段
+
+    Raises:
+        ValueError: 不是二进制列式文件
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError(f"不是二进制数据文件: {path}")
+    position = len(BINARY_MAGIC)
+    version, header_len = struct.unpack_from('<HI', data, position)
+    position += 6
+    header = json.loads(data[position:position + header_len].decode('utf-8'))
+    position += header_len
+
+    footer = None
+    if len(data) >= position + 16 and data[-8:] == BINARY_END:
+        footer_offset, = struct.unpack_from('<Q', data, len(data) - 16)
+        if data[footer_offset:footer_offset + 4] == FOOTER_TAG:
+            length, = struct.unpack_from('<I', data, footer_offset + 4)
+            footer = json.loads(data[footer_offset + 8:footer_offset + 8 + length].decode('utf-8'))
+
+    if footer is not None:
+        chunks = [(offset, count) for _, offset, count in footer['index']]
+        info = footer
+    else:
+        chunks = []
+        while position + 8 <= len(data) and data[position:position + 4] == CHUNK_TAG:
+            count, = struct.unpack_from('<I', data, position + 4)
+            if position + 8 + 24 * count > len(data):
+                break  # 最后一个数据块不完整
+            chunks.append((position, count))
+            position += 8 + 24 * count
+        info = dict(header, count=sum(count for _, count in chunks), complete=False,
+                    recovered=True)
+
+    total = sum(count for _, count in chunks)
+    columns = [np.empty(total) for _ in range(3)]
+    start = 0
+    for offset, count in chunks:
+        base = offset + 8
+        for k, column in enumerate(columns):
+            column[start:start + count] = np.frombuffer(
+                data, dtype='<f8', count=count, offset=base + 8 * count * k)
+        start += count
+
+    info['version'] = version
+    return columns[0], columns[1], columns[2], info
+
+
+def write_file(path, voltages, currents, timestamps=None, fmt=None, columns=('电位(V)', '电流(μA)'),
+               metadata=None):
+    """
+    一次性写出完整数据 (格式默认按扩展名判断)
+
+    Returns:
+        写入的点数
+    """
+    if fmt is None:
+        fmt = format_from_path(path)
+    writer = open_stream_writer(path, fmt, columns=columns, metadata=metadata)
+    writer.write_batch(voltages, currents, timestamps)
+    writer.close(complete=True)
+    return writer.count
@@ -0,0 +1,109 @@
+"""绘图降采样: 保留峰值和扫描转折点的 min/max 抽取"""
+
+import numpy as np
+
+
+def minmax_decimate(x, y, n_bins):
+    """
+    按采样顺序把曲线分成 n_bins 段, 每段只保留 x、y 的最小/最大值所在点
+
+    每段最多保留 4 个点 (x 最小/最大 和 y 最小/最大), 并保持原始顺序,
+    因此氧化还原峰 (y 极值) 和循环扫描的转折点 (x 极值) 都不会丢失。
+    通常取 n_bins ≈ 绘图区域的像素宽度。
+
+    Args:
+        x: 电位数组
+        y: 电流数组 (与 x 等长)
+        n_bins: 分段数
+
+    Returns:
+        (x_decimated, y_decimated), 点数不超过 4 * n_bins 时直接返回原数组
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(x)
+    n_bins = max(int(n_bins), 1)
+    if n <= 4 * n_bins:
+        return x, y
+
+    indices = minmax_indices(x, y, n_bins)
+    return x[indices], y[indices]
+
+
+def minmax_indices(x, y, n_bins):
+    """
+    返回 minmax_decimate 保留的点的下标 (升序, 去重)
+
+    Args:
+        x: 电位数组
+        y: 电流数组
+        n_bins: 分段数
+    """
+    n = len(x)
+    bin_size = -(-n // n_bins)  # 向上取整
+    full = (n // bin_size) * bin_size
+
+    parts = [np.array([0, n - 1])]
+    if full:
+        offsets = np.arange(0, full, bin_size)
+        for column in (x, y):
+            blocks = column[:full].reshape(-1, bin_size)
+            parts.append(offsets + blocks.argmin(axis=1))
+            parts.append(offsets + blocks.argmax(axis=1))
+    if full < n:
+        for column in (x, y):
+            tail = column[full:]
+            parts.append(np.array([full + tail.argmin(), full + tail.argmax()]))
+
+    return np.unique(np.concatenate(parts))
+
+
+def decimate_view(x, y, n_bins, xlim=None, ylim=None):
+    """
+    对当前视图范围内的点做降采样 (缩放后从完整数据重新抽取)
+
+    Args:
+        x: 完整电位数组
+        y: 完整电流数组
+        n_bins: 分段数 (绘图区域像素宽度)
+        xlim: 可见的 x 范围 (low, high), None 表示不限
+        ylim: 可见的 y 范围 (low, high), None 表示不限
+
+    Returns:
+        (x_decimated, y_decimated)
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n_bins = max(int(n_bins), 1)
+    if len(x) <= 4 * n_bins:
+        return x, y
+
+    mask = None
+    if xlim is not None:
+        mask = (x >= xlim[0]) & (x <= xlim[1])
+    if ylim is not None:
+        in_y = (y >= ylim[0]) & (y <= ylim[1])
+        mask = in_y if mask is None else mask & in_y
+
+    if mask is None or mask.all():
+        return minmax_decimate(x, y, n_bins)
+
+    # 保留可见点两侧的相邻点, 使穿出视图的线段仍能画到边界
+    visible = mask.copy()
+    visible[1:] |= mask[:-1]
+    visible[:-1] |= mask[1:]
+    candidates = np.flatnonzero(visible)
+    if not len(candidates):
+        return x[:0], y[:0]
+
+    if len(candidates) > 4 * n_bins:
+        selected = candidates[minmax_indices(x[candidates], y[candidates], n_bins)]
+    else:
+        selected = candidates
+
+    # 两个保留点之间跨过了不可见的点时插入 NaN 断开曲线, 避免画出穿过视图的假连线
+    hidden = np.cumsum(~visible)
+    gaps = np.flatnonzero(hidden[selected[1:]] - hidden[selected[:-1]] > 0) + 1
+    x_out = np.insert(x[selected].astype(np.float64), gaps, np.nan)
+    y_out = np.insert(y[selected].astype(np.float64), gaps, np.nan)
+    return x_out, y_out
@@ -1,111 +1,39 @@
-"""电化学设备通信协议实现模块"""
+"""电化学设备通信协议实现模块 - 循环伏安法 (CV)"""
 
-import serial
-import time
-import csv
-import threading
-import queue
-import matplotlib.pyplot as plt
-from datetime import datetime
-from enum import Enum
+from utils.acquisition import (
+    ProtocolState,
+    DataLineSchema,
+    Technique,
+    AcquisitionEngine,
+    run_technique_test
+)
+from utils.cv_analysis import CycleTracker, default_hysteresis
+from utils.simulator import cv_waveform
 
 
-class ProtocolState(Enum):
-    """协议状态枚举"""
-    IDLE = 0
-    PARAMETER_SET = 1
-    WAITING_ACK = 2
-    STARTING_TEST = 3
-    RECEIVING_DATA = 4
-    TEST_COMPLETE = 5
-    ERROR = 6
+class CVTechnique(Technique):
+    """循环伏安法 (CV) 技术定义"""
 
+    name = 'CV'
+    title = 'Cyclic Voltammetry Curve'
+    file_prefix = 'cv'
+    start_command = "S"
+    terminators = ("@",)
+    data_schema = DataLineSchema(voltage_format='.4f', current_format='.4f')
+    progress_interval = 10
+    default_timeout = 30
 
-class ElectrochemicalProtocol:
-    """电化学设备通信协议实现"""
-    
-    def __init__(self, port=None, baudrate=115200, simulate=False):
-        """
-        初始化电化学协议实例
-        
-        Args:
-            port: 串口号 (如: COM3 或 /dev/ttyUSB0)
-            baudrate: 波特率 (默认: 115200)
-            simulate: 是否使用模拟模式 (默认: False)
-        """
-        self.port = port
-        self.baudrate = baudrate
-        self.simulate = simulate
-        self.serial_conn = None
-        self.state = ProtocolState.IDLE
-        self.data_buffer = []
-        self.response_queue = queue.Queue()
-        self.stop_flag = threading.Event()
-        self.read_thread = None
-        
-        # 模拟参数
-        self.sim_data_index = 0
-        self.sim_start_time = None
-        
-    def connect(self):
-        """连接串口设备或启动模拟模式"""
-        if self.simulate:
-            print("启动模拟模式...")
-            self._start_simulation()
-            return True
-        
-        if not self.port:
-            print("错误: 未指定串口")
-            return False
-            
-        try:
-            self.serial_conn = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                bytesize=8,
-                parity='N',
-                stopbits=1,
-                timeout=5,  # 增加读超时到5秒,避免长时间等待时断连
-                write_timeout=2  # 添加写超时,防止写阻塞
-            )
-            print(f"已连接到设备: {self.port} @ {self.baudrate}")
-            
-            # 启动读取线程
-            self.read_thread = threading.Thread(target=self._read_serial_data)
-            self.read_thread.daemon = True
-            self.read_thread.start()
-            
-            return True
-            
-        except Exception as e:
-            print(f"连接失败: {e}")
-            return False
-    
-    def disconnect(self):
-        """断开连接"""
-        self.stop_flag.set()
-        
-        if self.read_thread and self.read_thread.is_alive():
-            self.read_thread.join(timeout=2)
-            
-        if self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.close()
-            print("设备连接已断开")
-    
-    def send_parameter_command(self, start_v=-1.0, end_v=1.0, scan_dir=1, 
-                             scan_rate=0.2, cycles=2, current_range=50):
-        """
-        发送参数设置命令
-        
-        Args:
-            start_v: 起始电位 (V)
-            end_v: 结束电位 (V)
-            scan_dir: 扫描方向 (1=正向, -1=负向)
-            scan_rate: 扫描速率 (V/s)
-            cycles: 循环次数
-            current_range: 电流量程
-        """
-        # 构建参数命令
+    sim_potential_step = 0.0125  # 模拟采样电位间隔 (V)
+
+    parameter_layout = {
+        'start_v': 0, 'end_v': 1, 'scan_dir': 2, 'scan_rate': 3,
+        'cycles': 5, 'current_range': 13,
+    }
+    integer_parameters = ('scan_dir', 'cycles', 'current_range')
+
+    def build_parameter_frame(self, start_v=-1.0, end_v=1.0, scan_dir=1,
+                              scan_rate=0.2, cycles=2, current_range=50):
+        """构建 CV 参数命令: P <18 个参数>,"""
         params = [
             start_v,        # 起始电位
             end_v,          # 结束电位
@@ -119,259 +47,55 @@ class ElectrochemicalProtocol:
             20, current_range, current_range,  # 电流设置
             2, 0, 1         # 控制参数
         ]
-        
-        command = "P " + ",".join(map(str, params)) + ","
-        
-        if self.simulate:
-            print(f"模拟发送参数命令: {command}")
-            # 模拟响应
-            self.response_queue.put("#\r\n")
-            self.state = ProtocolState.WAITING_ACK
-        elif self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.write(command.encode())
-            print(f"发送参数命令: {command}")
-            self.state = ProtocolState.WAITING_ACK
-        else:
-            print("错误: 设备未连接")
-            return False
-            
-        return True
-    
-    def send_start_command(self):
-        """发送开始测试命令"""
-        if self.simulate:
-            print("模拟发送开始命令: S")
-            # 模拟响应
-            self.response_queue.put("*\r\n")
-            self.state = ProtocolState.STARTING_TEST
-            self.sim_start_time = time.time()
-        elif self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.write(b"S")
-            print("发送开始命令: S")
-            self.state = ProtocolState.STARTING_TEST
-        else:
-            print("错误: 设备未连接")
-            return False
-            
-        return True
-    
-    def _read_serial_data(self):
-        """串口数据读取线程"""
-        consecutive_errors = 0
-        max_consecutive_errors = 3
-        
-        while not self.stop_flag.is_set():
-            try:
-                if self.serial_conn and self.serial_conn.is_open:
-                    line = self.serial_conn.readline()
-                    if line:
-                        response = line.decode().strip()
-                        self.response_queue.put(response)
-                        consecutive_errors = 0  # 成功读取后重置错误计数
-                    # 即使没有数据也不算错误,可能只是设备暂时没发送
-                else:
-                    print("串口未打开或已断开")
-                    break
-                    
-                time.sleep(0.001)  # 避免CPU占用过高
-                
-            except serial.SerialException as e:
-                consecutive_errors += 1
-                print(f"串口异常 ({consecutive_errors}/{max_consecutive_errors}): {e}")
-                if consecutive_errors >= max_consecutive_errors:
-                    print("连续串口错误过多,停止读取")
-                    break
-                time.sleep(0.5)  # 串口错误后等待一段时间
-                
-            except UnicodeDecodeError as e:
-                # 解码错误不致命,跳过这条数据
-                print(f"数据解码错误: {e}")
-                consecutive_errors = 0
-                
-            except Exception as e:
-                consecutive_errors += 1
-                print(f"读取串口数据错误 ({consecutive_errors}/{max_consecutive_errors}): {e}")
-                if consecutive_errors >= max_consecutive_errors:
-                    print("连续错误过多,停止读取")
-                    break
-                time.sleep(0.5)
-    
-    def _start_simulation(self):
-        """启动模拟数据生成"""
-        def simulate_data():
-            while not self.stop_flag.is_set():
-                if self.state == ProtocolState.RECEIVING_DATA and self.sim_start_time:
-                    # 生成模拟CV数据
-                    elapsed = time.time() - self.sim_start_time
-                    
-                    if elapsed < 20:  # 模拟20秒的测试
-                        # 生成循环伏安数据
-                        voltage = -1.0 + 2.0 * (elapsed / 10.0) % 2.0
-                        if (elapsed / 10.0) % 2.0 > 1.0:
-                            voltage = 1.0 - (voltage + 1.0)
-                        
-                        # 模拟电流响应 (简单的氧化还原峰)
-                        current = 2.0 + 0.5 * (voltage ** 2) + 0.1 * abs(voltage - 0.2) * 10
-                        current += (hash(str(elapsed)) % 100 - 50) / 1000.0  # 添加噪声
-                        
-                        data_line = f"{voltage:.4f},{current:.4f},\r\n"
-                        self.response_queue.put(data_line)
-                        time.sleep(0.062)  # 约16Hz
-                    else:
-                        # 结束数据传输
-                        self.response_queue.put("@\r\n")
-                        break
-                else:
-                    time.sleep(0.1)
-        
-        sim_thread = threading.Thread(target=simulate_data)
-        sim_thread.daemon = True
-        sim_thread.start()
-    
-    def process_responses(self, timeout=30):
-        """处理设备响应"""
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            try:
-                response = self.response_queue.get(timeout=0.1)
-                self._handle_response(response)
-                
-                if self.state == ProtocolState.TEST_COMPLETE:
-                    break
-                    
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"处理响应错误: {e}")
-                self.state = ProtocolState.ERROR
-                break
-        
-        if self.state != ProtocolState.TEST_COMPLETE:
-            print("警告: 测试未正常完成")
-    
-    def _handle_response(self, response):
-        """处理单个响应"""
-        response = response.replace('\r\n', '').replace('\r', '').replace('\n', '')
-        
-        if response == "#":
-            print("✓ 收到确认响应")
-            if self.state == ProtocolState.WAITING_ACK:
-                self.state = ProtocolState.PARAMETER_SET
-                
-        elif response == "*":
-            print("✓ 开始接收数据")
-            if self.state == ProtocolState.STARTING_TEST:
-                self.state = ProtocolState.RECEIVING_DATA
-                self.data_buffer = []
-                
-        elif response == "@":
-            print("✓ 数据接收完成")
-            if self.state == ProtocolState.RECEIVING_DATA:
-                self.state = ProtocolState.TEST_COMPLETE
-                
-        elif "," in response:
-            # 数据点: 电位,电流
-            if self.state == ProtocolState.RECEIVING_DATA:
-                try:
-                    parts = response.split(",")
-                    if len(parts) >= 2:
-                        voltage = float(parts[0])
-                        current = float(parts[1])
-                        self.data_buffer.append((voltage, current))
-                        
-                        # 每10个点显示一次进度
-                        if len(self.data_buffer) % 10 == 0:
-                            print(f"📊 已接收 {len(self.data_buffer)} 个数据点 "
-                                  f"(最新: V={voltage:.4f}V, I={current:.4f}μA)")
-                            
-                except ValueError as e:
-                    print(f"无效数据格式: {response} - {e}")
-        elif response:
-            print(f"未知响应: {response}")
-    
-    def save_data(self, filename=None):
-        """
-        保存测试数据到CSV文件
-        
-        Args:
-            filename: 保存文件名 (默认: cv_data_YYYYMMDD_HHMMSS.csv)
-            
-        Returns:
-            保存的文件名或None (如果失败)
-        """
-        if not self.data_buffer:
-            print("❌ 没有数据可保存")
-            return None
-            
-        if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"cv_data_{timestamp}.csv"
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['电位(V)', '电流(μA)'])
-                for voltage, current in self.data_buffer:
-                    writer.writerow([voltage, current])
-            
-            print(f"✓ 数据已保存到: {filename}")
-            print(f"✓ 共保存 {len(self.data_buffer)} 个数据点")
-            return filename
-            
-        except Exception as e:
-            print(f"❌ 保存数据失败: {e}")
-            return None
-    
-    def plot_data(self, save_plot=True):
+        return "P " + ",".join(map(str, params)) + ","
+
+    def create_analyzer(self, params):
+        """采集过程中逐段切分扫描并分析每圈, 收到结束标记时循环分析结果立即可用"""
+        return CycleTracker(
+            hysteresis=default_hysteresis(params.get('start_v', -1.0), params.get('end_v', 1.0)),
+            scan_rate=params.get('scan_rate', 0.2)
+        )
+
+    def simulate_waveform(self, params):
+        """按参数生成模拟 CV 波形 (约 16 Hz @ 0.2 V/s)"""
+        return cv_waveform(potential_step=self.sim_potential_step, **params)
+
+
+class ElectrochemicalProtocol(AcquisitionEngine):
+    """电化学设备通信协议实现 (CV)"""
+
+    technique_class = CVTechnique
+
+    def send_parameter_command(self, start_v=-1.0, end_v=1.0, scan_dir=1,
+                               scan_rate=0.2, cycles=2, current_range=50):
         """
-        绘制CV曲线
-        
+        发送参数设置命令
+
         Args:
-            save_plot: 是否保存图形到文件 (默认: True)
+            start_v: 起始电位 (V)
+            end_v: 结束电位 (V)
+            scan_dir: 扫描方向 (1=正向, -1=负向)
+            scan_rate: 扫描速率 (V/s)
+            cycles: 循环次数
+            current_range: 电流量程
         """
-        if not self.data_buffer:
-            print("❌ 没有数据可绘制")
-            return
-        
-        try:
-            # 设置中文字体
-            plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
-            plt.rcParams['axes.unicode_minus'] = False
-            
-            voltages = [v for v, i in self.data_buffer]
-            currents = [i for v, i in self.data_buffer]
-            
-            plt.figure(figsize=(10, 6))
-            plt.plot(voltages, currents, 'b-', linewidth=1.5)
-            plt.xlabel('Potential (V)')
-            plt.ylabel('Current (μA)')
-            plt.title('Cyclic Voltammetry Curve')
-            plt.grid(True, alpha=0.3)
-            
-            # 添加数据点信息
-            plt.text(0.02, 0.98, f'Data points: {len(self.data_buffer)}', 
-                    transform=plt.gca().transAxes, 
-                    verticalalignment='top',
-                    bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-            
-            if save_plot:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                plot_filename = f"cv_curve_{timestamp}.png"
-                plt.savefig(plot_filename, dpi=300, bbox_inches='tight')
-                print(f"✓ 图形已保存到: {plot_filename}")
-            
-            plt.show()
-            
-        except Exception as e:
-            print(f"❌ 绘图失败: {e}")
+        return self.send_parameters(
+            start_v=start_v,
+            end_v=end_v,
+            scan_dir=scan_dir,
+            scan_rate=scan_rate,
+            cycles=cycles,
+            current_range=current_range
+        )
 
 
-def run_cv_test(port=None, simulate=False, start_v=-1.0, end_v=1.0, 
-                scan_rate=0.2, cycles=2, current_range=50, save_data=True, save_plot=True):
+def run_cv_test(port=None, simulate=False, start_v=-1.0, end_v=1.0,
+                scan_rate=0.2, cycles=2, current_range=50, save_data=True, save_plot=True,
+                read_mode='line', sim_seed=0, sim_speed=1.0, data_format='csv',
+                capture_path=None, max_points=None):
     """
     运行完整的CV测试
-    
+
     Args:
         port: 串口号
         simulate: 是否使用模拟模式
@@ -382,80 +106,31 @@ def run_cv_test(port=None, simulate=False, start_v=-1.0, end_v=1.0,
         current_range: 电流量程 (μA)
         save_data: 是否保存数据到 CSV (默认: True)
         save_plot: 是否保存图形到文件 (默认: True)
-        
+        read_mode: 串口读取方式 ('line' 或 'bulk')
+        sim_seed: 模拟模式随机数种子
+        sim_speed: 模拟模式倍速 (1=实时, 0=尽可能快)
+        data_format: 数据文件格式 ('csv' 或 'binary'), 采集过程中实时写入
+        capture_path: 串口抓包文件路径 (.ecap, 默认: 不抓包)
+        max_points: 有界内存模式, 内存中只保留最近的这么多个点 (需要 save_data; 默认: 不限)
+
     Returns:
         测试是否成功 (True/False)
     """
-    
-    print("🔬 电化学设备通信协议测试")
-    print("=" * 50)
-    
-    # 创建协议实例
-    protocol = ElectrochemicalProtocol(port=port, simulate=simulate)
-    
-    try:
-        # 1. 连接设备
-        print("\n📡 步骤1: 连接设备...")
-        if not protocol.connect():
-            return False
-        
-        # 2. 发送参数设置
-        print(f"\n⚙️ 步骤2: 设置测试参数...")
-        print(f"   起始电位: {start_v}V")
-        print(f"   结束电位: {end_v}V")
-        print(f"   扫描速率: {scan_rate}V/s")
-        print(f"   循环次数: {cycles}")
-        print(f"   电流量程: {current_range}μA")
-        
-        if not protocol.send_parameter_command(start_v, end_v, 1, scan_rate, cycles, current_range):
-            return False
-        
-        # 3. 等待参数确认
-        print("\n⏳ 步骤3: 等待参数确认...")
-        start_time = time.time()
-        while protocol.state != ProtocolState.PARAMETER_SET and time.time() - start_time < 5:
-            try:
-                response = protocol.response_queue.get(timeout=0.1)
-                protocol._handle_response(response)
-            except queue.Empty:
-                continue
-        
-        if protocol.state != ProtocolState.PARAMETER_SET:
-            print("❌ 参数设置失败")
-            return False
-        
-        # 4. 发送开始命令
-        print("\n🚀 步骤4: 开始测试...")
-        if not protocol.send_start_command():
-            return False
-        
-        # 5. 处理测试数据
-        print("\n📊 步骤5: 接收测试数据...")
-        protocol.process_responses(timeout=60)
-        
-        if protocol.state != ProtocolState.TEST_COMPLETE:
-            print("❌ 测试未正常完成")
-            return False
-        
-        # 6. 保存和显示结果
-        if save_data:
-            print(f"\n💾 步骤6: 保存结果...")
-            filename = protocol.save_data()
-            
-            if filename and save_plot:
-                print(f"\n📈 步骤7: 绘制曲线...")
-                protocol.plot_data(save_plot=True)
-        else:
-            if save_plot:
-                print(f"\n📈 步骤6: 绘制曲线...")
-                protocol.plot_data(save_plot=False)
-        
-        print("\n✅ 测试完成!")
-        return True
-        
-    except Exception as e:
-        print(f"❌ 测试过程出错: {e}")
-        return False
-        
-    finally:
-        protocol.disconnect()
+    protocol = ElectrochemicalProtocol(port=port, simulate=simulate, read_mode=read_mode,
+                                      sim_seed=sim_seed, sim_speed=sim_speed,
+                                      stream_format=data_format if save_data else None,
+                                      capture_path=capture_path,
+                                      max_points=max_points)
+
+    params = dict(start_v=start_v, end_v=end_v, scan_dir=1, scan_rate=scan_rate,
+                  cycles=cycles, current_range=current_range)
+    param_lines = [
+        f"起始电位: {start_v}V",
+        f"结束电位: {end_v}V",
+        f"扫描速率: {scan_rate}V/s",
+        f"循环次数: {cycles}",
+        f"电流量程: {current_range}μA",
+    ]
+
+    return run_technique_test(protocol, params, "电化学设备通信协议测试", param_lines,
+                              save_data=save_data, save_plot=save_plot, timeout=60)
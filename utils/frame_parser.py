@@ -0,0 +1,139 @@
+"""数据帧批量解析: 把包含大量 <电位>,<电流>,\\r\\n 帧的字节块一次性解码为 NumPy 数组"""
+
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+
+ParsedBlock = namedtuple('ParsedBlock', ['voltages', 'currents', 'markers', 'malformed',
+                                         'point_offsets', 'marker_offsets'])
+ParsedBlock.__doc__ = """
+批量解析结果
+
+Attributes:
+    voltages: 电位数组 (float64)
+    currents: 电流数组 (float64)
+    markers: 非数据行列表 [(数据点下标, 内容), ...], 下标表示该行之前已有多少个数据点
+    malformed: 无法解析的数据行列表 (bytes)
+    point_offsets: 每个数据点所在行的行尾 (\n) 在输入中的字节位置
+    marker_offsets: 每个标记行的行尾字节位置 (与 markers 一一对应)
+"""
+
+
+def _parse_lines_slow(lines):
+    """逐行解析 (仅在批量解析发现格式异常时使用), 额外返回每行是否有效"""
+    voltages = []
+    currents = []
+    valid = []
+    for line in lines:
+        parts = line.split(b",")
+        try:
+            voltage = float(parts[0])
+            current = float(parts[1])
+        except (ValueError, IndexError):
+            valid.append(False)
+            continue
+        voltages.append(voltage)
+        currents.append(current)
+        valid.append(True)
+    return (np.array(voltages, dtype=np.float64),
+            np.array(currents, dtype=np.float64),
+            valid)
+
+
+def _parse_fields_fast(text, count):
+    """
+    把 "v,i,v,i,..." 形式的文本一次性转换为 (count, 2) 数组
+
+    Returns:
+        数组, 含有无法转换的字段时返回 None
+    """
+    with warnings.catch_warnings():
+        # 旧版 NumPy 遇到无法解析的内容时只给出 DeprecationWarning 并提前结束
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(text, dtype=np.float64, sep=',')
+        except (ValueError, DeprecationWarning):
+            return None
+    if len(values) != 2 * count:
+        return None
+    return values.reshape(count, 2)
+
+
+def parse_data_block(raw):
+    """
+    批量解析一段原始数据
+
+    先用 NumPy 在整个字节块上定位行尾和逗号, 找出数据行与标记行 (#、*、@、$ 等),
+    标准帧 (<电位>,<电流>,) 直接拼接后一次性转换为浮点数组;
+    只有出现格式异常时才退回逐行解析, 并把异常行单独返回而不逐条打印。
+
+    Args:
+        raw: 由完整行组成的 bytes/bytearray/str (行以 \r\n 或 \n 结尾)
+
+    Returns:
+        ParsedBlock
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+    text = bytes(raw)
+    if not text.endswith(b"\n"):
+        text += b"\n"
+
+    buf = np.frombuffer(text, dtype=np.uint8)
+    line_ends = np.flatnonzero(buf == 10)
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    commas = np.flatnonzero(buf == 44)
+    comma_counts = np.diff(np.searchsorted(commas, line_ends), prepend=0)
+
+    # 没有逗号的非空行是标记/响应行
+    markers = []
+    marker_offsets = []
+    marker_lines = np.flatnonzero(comma_counts == 0)
+    data_before = np.cumsum(comma_counts > 0)
+    for line in marker_lines.tolist():
+        token = text[line_starts[line]:line_ends[line]].strip()
+        if token:
+            markers.append((int(data_before[line]), token.decode(errors='replace')))
+            marker_offsets.append(int(line_ends[line]))
+    marker_offsets = np.array(marker_offsets, dtype=np.int64)
+
+    data_lines = np.flatnonzero(comma_counts > 0)
+    count = len(data_lines)
+    if not count:
+        empty = np.empty(0, dtype=np.float64)
+        return ParsedBlock(empty, empty.copy(), markers, [], np.empty(0, dtype=np.int64),
+                           marker_offsets)
+
+    # 快速路径: 每个数据行恰好两个逗号且以逗号结尾 (<电位>,<电流>,)
+    ends = line_ends[data_lines]
+    content_ends = ends - (buf[ends - 1] == 13)
+    last_commas = commas[np.searchsorted(commas, ends) - 1]
+    if np.all(comma_counts[data_lines] == 2) and np.all(last_commas == content_ends - 1):
+        if len(marker_lines):
+            # 去掉标记行, 只保留数据行 (标记行很少, 按连续数据段拼接)
+            breaks = np.flatnonzero(np.diff(data_lines) != 1)
+            run_starts = np.concatenate(([0], breaks + 1))
+            run_stops = np.concatenate((breaks, [count - 1]))
+            body = b"".join(
+                text[line_starts[data_lines[a]]:line_ends[data_lines[b]] + 1]
+                for a, b in zip(run_starts.tolist(), run_stops.tolist())
+            )
+        else:
+            body = text
+        values = _parse_fields_fast(body.replace(b"\r", b"").replace(b"\n", b""), count)
+        if values is not None:
+            return ParsedBlock(values[:, 0], values[:, 1], markers, [], ends, marker_offsets)
+
+    # 慢速路径: 逐行解析, 记录异常行
+    lines = [text[line_starts[i]:line_ends[i]].strip().rstrip(b",")
+             for i in data_lines.tolist()]
+    voltages, currents, valid = _parse_lines_slow(lines)
+    malformed = [line for line, ok in zip(lines, valid) if not ok]
+    if malformed:
+        # 调整标记下标, 使其对应成功解析的数据点
+        valid_before = np.concatenate(([0], np.cumsum(valid)))
+        markers = [(int(valid_before[index]), token) for index, token in markers]
+    return ParsedBlock(voltages, currents, markers, malformed,
+                       line_ends[data_lines][np.array(valid, dtype=bool)], marker_offsets)
@@ -0,0 +1,351 @@
+"""串口 HEX 日志的流式解析
+
+日志每行记录一个字节::
+
+    <时间戳> <方向> <十六进制字节>
+    1760644731.064395 VIRT->REAL 50
+
+按大块读取文件 (内存占用与文件大小无关), 在每块上用 NumPy 向量化定位字段、
+解码十六进制字节和时间戳, 按方向拆分成两个字节流 (VIRT->REAL 为发送, 其余为接收)。
+格式不规则的行退回逐行解析, 结果与向量化路径一致。
+"""
+
+import numpy as np
+
+
+SEND_DIRECTION = b"VIRT->REAL"
+
+# 十六进制字符 → 数值 (非十六进制字符为 -1)
+_HEX_VALUES = np.full(256, -1, dtype=np.int16)
+for _k, _c in enumerate(b"0123456789abcdef"):
+    _HEX_VALUES[_c] = _k
+for _k, _c in enumerate(b"ABCDEF"):
+    _HEX_VALUES[_c] = 10 + _k
+
+# 规则行: <时间戳> <10 个字符的方向> <两位十六进制>, 第一个空格到行尾的长度固定
+_FIXED_TAIL = 1 + len(SEND_DIRECTION) + 1 + 2
+
+
+class ByteStream:
+    """单方向字节流: 数据和每个字节的时间戳 (只保存时间戳变化的位置, 同一批到达的字节共用一个时间戳)"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._offsets = []
+        self._values = []
+        self._last_time = np.nan
+
+    def __len__(self):
+        return len(self.data)
+
+    def extend(self, values, times):
+        """
+        追加一批字节
+
+        Args:
+            values: uint8 字节数组
+            times: 每个字节的时间戳数组
+        """
+        if not len(values):
+            return
+        previous = np.concatenate(([self._last_time], times[:-1]))
+        changed = np.flatnonzero(times != previous)  # NaN 与任何值都不相等
+        if len(changed):
+            self._offsets.append(changed + len(self.data))
+            self._values.append(times[changed])
+        self._last_time = times[-1]
+        self.data += values.tobytes()
+
+    @property
+    def time_offsets(self):
+        """时间戳变化的字节位置"""
+        return np.concatenate(self._offsets) if self._offsets else np.empty(0, dtype=np.int64)
+
+    @property
+    def time_values(self):
+        """变化位置对应的时间戳"""
+        return np.concatenate(self._values) if self._values else np.empty(0)
+
+    def timestamps(self, positions=None):
+        """
+        查询字节的时间戳
+
+        Args:
+            positions: 字节位置数组 (默认: 全部字节)
+
+        Returns:
+            时间戳数组
+        """
+        if positions is None:
+            positions = np.arange(len(self.data))
+        offsets = self.time_offsets
+        if not len(offsets):
+            return np.full(len(positions), np.nan)
+        index = np.searchsorted(offsets, positions, side='right') - 1
+        return self.time_values[np.maximum(index, 0)]
+
+
+class HexLog:
+    """HEX 日志解析结果"""
+
+    def __init__(self):
+        self.send = ByteStream()   # VIRT->REAL
+        self.recv = ByteStream()   # REAL->VIRT
+        self.lines = 0             # 非空行数
+        self.skipped = 0           # 无法解析的行数
+
+
+def _parse_timestamps(buf, starts, lengths):
+    """
+    向量化解析定长十进制时间戳 (按 长度+小数点位置 分组)
+
+    同一批到达的字节共用一个时间戳, 因此只解析与上一行不同的时间戳, 其余沿用上一行的结果。
+
+    Returns:
+        (timestamps, ok) ok 为 False 的行需要逐行解析
+    """
+    n = len(starts)
+    times = np.full(n, np.nan)
+    ok = np.zeros(n, dtype=bool)
+    if not n:
+        return times, ok
+
+    max_len = int(lengths.max())
+    if max_len == 0 or max_len > 32:
+        return times, ok
+
+    columns = np.arange(max_len)
+    in_field = columns < lengths[:, None]
+    chars = np.where(in_field, buf[np.minimum(starts[:, None] + columns, len(buf) - 1)], 0)
+
+    changed = np.ones(n, dtype=bool)
+    changed[1:] = (chars[1:] != chars[:-1]).any(axis=1)
+    unique_rows = np.flatnonzero(changed)
+    owner = np.cumsum(changed) - 1
+    unique_times, unique_ok = _parse_fixed_decimal(chars[unique_rows], lengths[unique_rows])
+    return unique_times[owner], unique_ok[owner]
+
+
+def _parse_fixed_decimal(chars, lengths):
+    """把 (行数, 宽度) 的字符矩阵按 长度+小数点位置 分组解析为浮点数"""
+    n = len(chars)
+    times = np.full(n, np.nan)
+    ok = np.zeros(n, dtype=bool)
+
+    # 每行的小数点位置 (没有小数点时为长度)
+    in_field = np.arange(chars.shape[1]) < lengths[:, None]
+    is_dot = (chars == 46) & in_field
+    dot = np.where(is_dot.any(axis=1), is_dot.argmax(axis=1), lengths)
+
+    keys = lengths.astype(np.int64) * 64 + dot
+    for key in np.unique(keys):
+        rows = np.flatnonzero(keys == key)
+        length, position = divmod(int(key), 64)
+        if length == 0 or position > 18 or length - position > 19:
+            continue  # 超出 int64 精度范围, 逐行解析
+        digits = chars[rows, :length].astype(np.int64) - 48
+        digit_columns = np.ones(length, dtype=bool)
+        if position < length:
+            digit_columns[position] = False
+        valid = ((digits[:, digit_columns] >= 0) & (digits[:, digit_columns] <= 9)).all(axis=1)
+
+        whole = digits[:, :position] @ (10 ** np.arange(position - 1, -1, -1, dtype=np.int64))
+        fraction_digits = length - position - 1
+        if fraction_digits > 0:
+            fraction = digits[:, position + 1:] @ (10 ** np.arange(fraction_digits - 1, -1, -1,
+                                                                   dtype=np.int64))
+            values = whole + fraction / 10.0 ** fraction_digits
+        else:
+            values = whole.astype(np.float64)
+
+        times[rows[valid]] = values[valid]
+        ok[rows[valid]] = True
+
+    return times, ok
+
+
+def _parse_line_slow(line):
+    """
+    逐行解析 (与原始实现一致: 至少 3 个字段, 方向为 VIRT->REAL 时为发送, 否则为接收)
+
+    Returns:
+        (is_send, value, timestamp), 无法解析时返回 None
+    """
+    parts = line.split()
+    if len(parts) < 3:
+        return None
+    try:
+        value = int(parts[2], 16)
+    except ValueError:
+        return None
+    if not 0 <= value <= 255:
+        return None
+    try:
+        timestamp = float(parts[0])
+    except ValueError:
+        timestamp = np.nan
+    return parts[1] == SEND_DIRECTION, value, timestamp
+
+
+def _decode_uniform(rows):
+    """
+    解析等长行组成的矩阵 (每行一条记录)
+
+    Returns:
+        与 decode_records 相同的结果; 有任何一行不符合规则格式时返回 None
+    """
+    width = rows.shape[1]
+    stop = width - 1 - (rows[0, width - 2] == 13)
+    space = stop - _FIXED_TAIL
+    if space <= 0:
+        return None
+    if not ((rows[:, space] == 32).all() and (rows[:, stop - 3] == 32).all()):
+        return None
+    if width - 1 > stop and not (rows[:, stop] == 13).all():
+        return None
+
+    hi = _HEX_VALUES[rows[:, stop - 2]]
+    lo = _HEX_VALUES[rows[:, stop - 1]]
+    if (hi < 0).any() or (lo < 0).any():
+        return None
+
+    stamp = rows[:, :space]
+    if (stamp == 32).any():
+        return None
+    is_send = (rows[:, space + 1:space + 1 + len(SEND_DIRECTION)] ==
+               np.frombuffer(SEND_DIRECTION, dtype=np.uint8)).all(axis=1)
+
+    n = len(rows)
+    changed = np.ones(n, dtype=bool)
+    changed[1:] = (stamp[1:] != stamp[:-1]).any(axis=1)
+    unique_rows = np.flatnonzero(changed)
+    times, ok = _parse_fixed_decimal(stamp[unique_rows], np.full(len(unique_rows), space))
+    if not ok.all():
+        return None
+    times = times[np.cumsum(changed) - 1]
+
+    return is_send, (hi * 16 + lo).astype(np.uint8), times, n, 0
+
+
+def decode_records(chunk):
+    """
+    解析一段由完整行组成的日志
+
+    Args:
+        chunk: bytes/bytearray/uint8 数组 (以换行结尾)
+
+    Returns:
+        (is_send, values, times, lines, skipped): 按行顺序的方向掩码、字节值 (uint8)、时间戳,
+        以及非空行数和无法解析的行数
+    """
+    buf = np.frombuffer(chunk, dtype=np.uint8) if not isinstance(chunk, np.ndarray) else chunk
+    ends = np.flatnonzero(buf == 10)
+    if len(buf) and (not len(ends) or ends[-1] != len(buf) - 1):
+        buf = np.append(buf, np.uint8(10))
+        ends = np.append(ends, len(buf) - 1)
+    if not len(ends):
+        return np.empty(0, dtype=bool), np.empty(0, dtype=np.uint8), np.empty(0), 0, 0
+
+    # 常见情况: 所有行等长 (定宽时间戳), 整块可直接视为二维矩阵, 无需按行收集字段
+    width = int(ends[0]) + 1
+    if len(buf) % width == 0 and len(ends) == len(buf) // width and \
+            (ends == np.arange(width - 1, len(buf), width)).all():
+        records = _decode_uniform(buf.reshape(-1, width))
+        if records is not None:
+            return records
+
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+
+    # 去掉行尾 \r 和首尾空白 (空白行不计数)
+    stops = ends.copy()
+    has_cr = (stops > starts) & (buf[np.maximum(stops - 1, 0)] == 13)
+    stops -= has_cr
+    nonblank = stops > starts
+    starts, stops = starts[nonblank], stops[nonblank]
+    n = len(starts)
+
+    # 规则行: 第一个空格后为 10 个字符的方向、空格和两位十六进制
+    spaces = np.flatnonzero(buf == 32)
+    position = np.searchsorted(spaces, starts)
+    first_space = spaces[np.minimum(position, max(len(spaces) - 1, 0))] if len(spaces) else \
+        np.full(n, -1)
+    fast = (position < len(spaces)) & (first_space > starts) & \
+        (stops - first_space == _FIXED_TAIL)
+    fast &= buf[np.where(fast, stops - 3, 0)] == 32
+
+    hi = _HEX_VALUES[buf[np.where(fast, stops - 2, 0)]]
+    lo = _HEX_VALUES[buf[np.where(fast, stops - 1, 0)]]
+    fast &= (hi >= 0) & (lo >= 0)
+
+    direction = buf[np.minimum(np.where(fast, first_space + 1, 0)[:, None] +
+                               np.arange(len(SEND_DIRECTION)), len(buf) - 1)]
+    is_send = (direction == np.frombuffer(SEND_DIRECTION, dtype=np.uint8)).all(axis=1)
+
+    times = np.full(n, np.nan)
+    fast_rows = np.flatnonzero(fast)
+    parsed, ok = _parse_timestamps(buf, starts[fast_rows], first_space[fast_rows] - starts[fast_rows])
+    times[fast_rows] = parsed
+    fast[fast_rows[~ok]] = False
+
+    values = (hi * 16 + lo).astype(np.int16)
+    valid = fast.copy()
+
+    # 不规则行逐行解析
+    data = buf.tobytes() if (~fast).any() else b""
+    for row in np.flatnonzero(~fast).tolist():
+        record = _parse_line_slow(data[starts[row]:stops[row]])
+        if record is not None:
+            is_send[row], values[row], times[row] = record
+            valid[row] = True
+
+    return (is_send[valid], values[valid].astype(np.uint8), times[valid], n,
+            int(n - valid.sum()))
+
+
+def iter_hex_records(path, chunk_size=16 << 20):
+    """
+    按块流式读取 HEX 日志
+
+    Args:
+        path: 日志文件路径
+        chunk_size: 每次读取的字节数
+
+    Yields:
+        decode_records 的结果 (每块一次)
+    """
+    buffer = bytearray()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            buffer += block
+            cut = buffer.rfind(b"\n") + 1
+            if not cut:
+                continue  # 行尚未读完整
+            # 结果数组均为拷贝, 解析完即可丢弃已处理的部分
+            records = decode_records(np.frombuffer(buffer, dtype=np.uint8, count=cut))
+            del buffer[:cut]
+            yield records
+    if buffer.strip():
+        yield decode_records(bytes(buffer))
+
+
+def read_hex_log(path, chunk_size=16 << 20):
+    """
+    读取整个 HEX 日志, 按方向拆分为两个字节流
+
+    Args:
+        path: 日志文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        HexLog
+    """
+    log = HexLog()
+    for is_send, values, times, lines, skipped in iter_hex_records(path, chunk_size):
+        log.send.extend(values[is_send], times[is_send])
+        log.recv.extend(values[~is_send], times[~is_send])
+        log.lines += lines
+        log.skipped += skipped
+    return log
@@ -0,0 +1,344 @@
+"""多台设备并发采集: 一个 I/O 线程同时驱动多个串口
+
+每台设备仍由一个 AcquisitionEngine 负责协议状态机、数据缓冲、流式写入和实时分析,
+但不再各自启动读取线程和使用响应队列: InstrumentManager 的 I/O 线程用 selectors 同时等待
+所有串口 (Windows 的串口句柄不支持 select, 改为按 in_waiting 轮询), 读到的字节交给对应引擎的
+feed_bytes 批量解析; 参数确认、开始命令、完成和超时也在同一线程中按状态推进。
+所有引擎只在 I/O 线程中被访问, 不需要加锁; 其他线程通过 start / wait / metrics 与之交互。
+"""
+
+import os
+import queue
+import selectors
+import threading
+import time
+
+from utils.acquisition import ProtocolState
+from utils.metrics import PipelineMetrics
+
+
+ACK_TIMEOUT = 5             # 等待参数确认的超时 (秒)
+POLL_INTERVAL = 0.01        # I/O 线程的最长等待时间 (秒), 也是检查超时和新请求的间隔
+READ_CHUNK = 65536          # 单次读取的最大字节数
+
+
+class Instrument:
+    """一台设备在管理器中的状态"""
+
+    IDLE, CONFIGURING, ACQUIRING, COMPLETE, FAILED = 'idle', 'configuring', 'acquiring', 'complete', 'failed'
+
+    def __init__(self, name, engine):
+        """
+        Args:
+            name: 设备名称 (唯一)
+            engine: AcquisitionEngine 实例 (尚未连接)
+        """
+        self.name = name
+        self.engine = engine
+        self.status = Instrument.IDLE
+        self.error = None
+        self.params = None
+        self.timeout = None
+        self.deadline = None
+        self.started = None         # 本次测量开始时间 (发送参数)
+        self.finished = None
+        self.bytes_read = 0         # 连接以来收到的字节数
+        self.measurements = 0       # 已完成的测量数
+        self.connected = False
+        self.polled = False         # 不能 select 时按 in_waiting 轮询
+
+    @property
+    def points(self):
+        """本次测量已接收的数据点数 (有界内存模式下含已移出内存的点)"""
+        return self.engine.data_buffer.total
+
+    @property
+    def busy(self):
+        return self.status in (Instrument.CONFIGURING, Instrument.ACQUIRING)
+
+    def describe(self):
+        """状态摘要 (可 JSON 序列化)"""
+        elapsed = None
+        if self.started is not None:
+            elapsed = (self.finished or time.perf_counter()) - self.started
+        return {
+            'name': self.name,
+            'technique': self.engine.technique.name,
+            'port': self.engine.port,
+            'status': self.status,
+            'error': self.error,
+            'points': self.points,
+            'bytes': self.bytes_read,
+            'elapsed_s': None if elapsed is None else round(elapsed, 3),
+            'points_per_s': round(self.points / elapsed, 2) if elapsed else None,
+            'malformed_lines': self.engine.malformed_lines,
+            'data_file': self.engine.stream_file,
+        }
+
+
+class InstrumentManager:
+    """在一个 I/O 线程中并发驱动多台设备"""
+
+    def __init__(self, poll_interval=POLL_INTERVAL, on_complete=None):
+        """
+        Args:
+            poll_interval: I/O 线程的最长等待时间 (秒)
+            on_complete: 测量结束回调 on_complete(instrument), 在 I/O 线程中调用 (应尽快返回)
+        """
+        self.poll_interval = poll_interval
+        self.on_complete = on_complete
+        self.instruments = {}
+        self._requests = queue.Queue()
+        self._stop = threading.Event()
+        self._idle = threading.Condition()
+        self._thread = None
+        self._selector = None
+        self._opened = None
+        # 统计
+        self.loop_iterations = 0
+        self.loop_busy = 0.0        # I/O 线程处理数据 (非等待) 的累计时间
+
+    def add(self, name, engine):
+        """
+        添加设备 (在 open 之前调用)
+
+        Returns:
+            Instrument
+        """
+        if name in self.instruments:
+            raise ValueError(f"设备名称重复: {name}")
+        engine.show_progress = False  # 多台设备时逐点进度输出没有意义
+        if engine.metrics.device != name:
+            engine.metrics = PipelineMetrics(name)  # 按设备名称区分指标 (模拟设备没有串口号)
+        instrument = Instrument(name, engine)
+        self.instruments[name] = instrument
+        return instrument
+
+    def open(self):
+        """
+        连接全部设备并启动 I/O 线程
+
+        Returns:
+            连接成功的设备数
+        """
+        use_select = os.name != 'nt'
+        self._selector = selectors.DefaultSelector()
+        for instrument in self.instruments.values():
+            engine = instrument.engine
+            if not engine.connect(start_reader=False):
+                instrument.status = Instrument.FAILED
+                instrument.error = "连接失败"
+                continue
+            instrument.connected = True
+            conn = engine.serial_conn
+            if conn is None:
+                continue  # 模拟设备: 数据来自引擎的响应队列
+            try:
+                if not use_select:
+                    raise OSError("串口句柄不支持 select")
+                conn.timeout = 0
+                self._selector.register(conn.fileno(), selectors.EVENT_READ, instrument)
+            except (AttributeError, OSError, ValueError):
+                instrument.polled = True
+
+        self._stop.clear()
+        self._opened = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="instrument-io", daemon=True)
+        self._thread.start()
+        return sum(instrument.connected for instrument in self.instruments.values())
+
+    def close(self):
+        """停止 I/O 线程并断开全部设备"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for instrument in self.instruments.values():
+            if instrument.connected:
+                if instrument.busy:
+                    instrument.engine.abort_measurement()
+                instrument.engine.disconnect()
+                instrument.connected = False
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+    def start(self, name, params, timeout=None):
+        """
+        请求在一台设备上开始测量 (线程安全, 由 I/O 线程发送参数和开始命令)
+
+        Args:
+            name: 设备名称
+            params: 传给 send_parameters 的测量参数
+            timeout: 采集超时 (秒, 默认: technique.default_timeout)
+        """
+        if name not in self.instruments:
+            raise KeyError(f"未知设备: {name}")
+        instrument = self.instruments[name]
+        with self._idle:
+            # 清除上次测量的时间, I/O 线程处理请求之前 _advance 不会按旧的截止时间判定超时
+            instrument.started = None
+            instrument.deadline = None
+            instrument.finished = None
+            instrument.status = Instrument.CONFIGURING
+        self._requests.put((name, params, timeout))
+
+    def start_all(self, params, timeout=None):
+        """在全部已连接的设备上开始相同参数的测量"""
+        for name, instrument in self.instruments.items():
+            if instrument.connected:
+                self.start(name, params, timeout)
+
+    def wait(self, timeout=None):
+        """
+        等待全部测量结束
+
+        Returns:
+            是否全部结束 (False = 等待超时)
+        """
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: not any(instrument.busy for instrument in self.instruments.values()),
+                timeout)
+
+    def metrics(self):
+        """
+        汇总统计 (可在任意线程中调用)
+
+        Returns:
+            字典: devices, connected, active, bytes_total, points_total, elapsed_s,
+            bytes_per_s, points_per_s, loop_iterations, loop_utilization (I/O 线程忙碌比例),
+            instruments (各设备的 describe())
+        """
+        instruments = [instrument.describe() for instrument in self.instruments.values()]
+        elapsed = time.perf_counter() - self._opened if self._opened else 0.0
+        bytes_total = sum(instrument.bytes_read for instrument in self.instruments.values())
+        points_total = sum(item['points'] for item in instruments)
+        return {
+            'devices': len(instruments),
+            'connected': sum(instrument.connected for instrument in self.instruments.values()),
+            'active': sum(instrument.busy for instrument in self.instruments.values()),
+            'bytes_total': bytes_total,
+            'points_total': points_total,
+            'elapsed_s': round(elapsed, 3),
+            'bytes_per_s': round(bytes_total / elapsed, 1) if elapsed else None,
+            'points_per_s': round(points_total / elapsed, 1) if elapsed else None,
+            'loop_iterations': self.loop_iterations,
+            'loop_utilization': round(self.loop_busy / elapsed, 4) if elapsed else None,
+            'instruments': instruments,
+        }
+
+    def _run(self):
+        """I/O 线程: 等待任一串口可读 → 读取并解析 → 推进各设备的测量状态"""
+        selector = self._selector
+        polled = [i for i in self.instruments.values() if i.connected and i.polled]
+        simulated = [i for i in self.instruments.values() if i.connected and i.engine.serial_conn is None]
+        wait = self.poll_interval
+
+        while not self._stop.is_set():
+            if selector.get_map():
+                events = selector.select(timeout=wait)
+            else:
+                self._stop.wait(wait)
+                events = []
+            busy_start = time.perf_counter()
+
+            for key, _ in events:
+                self._read(key.data)
+            for instrument in polled:
+                if instrument.engine.serial_conn.in_waiting:
+                    self._read(instrument)
+            for instrument in simulated:
+                self._drain_queue(instrument)
+            self._handle_requests()
+            self._advance(busy_start)
+
+            self.loop_iterations += 1
+            self.loop_busy += time.perf_counter() - busy_start
+
+    def _read(self, instrument):
+        """读出一台设备已到达的全部字节并交给引擎解析"""
+        conn = instrument.engine.serial_conn
+        try:
+            data = conn.read(max(conn.in_waiting, 1) if instrument.polled else READ_CHUNK)
+        except Exception as e:
+            instrument.engine.metrics.serial_errors.inc()
+            self._fail(instrument, f"读取失败: {e}")
+            if not instrument.polled:
+                self._selector.unregister(conn.fileno())
+            return
+        if data:
+            instrument.bytes_read += len(data)
+            instrument.engine.feed_bytes(data)
+
+    def _drain_queue(self, instrument):
+        """模拟设备: 处理引擎响应队列中已到达的输出"""
+        engine = instrument.engine
+        while True:
+            try:
+                response = engine._get_response(timeout=0)
+            except queue.Empty:
+                return
+            if isinstance(response, (bytes, bytearray)):
+                instrument.bytes_read += len(response)
+            else:
+                instrument.bytes_read += len(response.encode())
+            engine._handle_response(response)
+
+    def _handle_requests(self):
+        """处理 start 请求: 发送参数命令"""
+        while True:
+            try:
+                name, params, timeout = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            instrument = self.instruments[name]
+            engine = instrument.engine
+            instrument.params = params
+            instrument.timeout = engine.technique.default_timeout if timeout is None else timeout
+            instrument.error = None
+            instrument.started = time.perf_counter()
+            instrument.finished = None
+            instrument.deadline = instrument.started + ACK_TIMEOUT
+            if not instrument.connected:
+                self._fail(instrument, "设备未连接")
+            elif not engine.send_parameters(**params):
+                self._fail(instrument, "发送参数失败")
+
+    def _advance(self, now):
+        """按各引擎的协议状态推进测量: 确认 → 开始命令, 完成 → 结束, 超时 → 失败"""
+        for instrument in self.instruments.values():
+            if not instrument.busy or instrument.started is None or instrument.deadline is None:
+                continue
+            engine = instrument.engine
+            if instrument.status == Instrument.CONFIGURING and engine.state == ProtocolState.PARAMETER_SET:
+                if engine.send_start_command():
+                    instrument.status = Instrument.ACQUIRING
+                    instrument.deadline = now + instrument.timeout
+                else:
+                    self._fail(instrument, "发送开始命令失败")
+            elif instrument.status == Instrument.ACQUIRING and engine.state == ProtocolState.TEST_COMPLETE:
+                self._finish(instrument, Instrument.COMPLETE)
+            elif now > instrument.deadline:
+                self._fail(instrument, "参数确认超时" if instrument.status == Instrument.CONFIGURING
+                           else "采集超时")
+
+    def _fail(self, instrument, error):
+        print(f"❌ [{instrument.name}] {error}")
+        instrument.error = error
+        if instrument.connected:
+            instrument.engine.abort_measurement()
+        self._finish(instrument, Instrument.FAILED)
+
+    def _finish(self, instrument, status):
+        with self._idle:
+            instrument.status = status
+            instrument.finished = time.perf_counter()
+            if status == Instrument.COMPLETE:
+                instrument.measurements += 1
+            self._idle.notify_all()
+        if self.on_complete is not None:
+            try:
+                self.on_complete(instrument)
+            except Exception as e:
+                print(f"⚠️  [{instrument.name}] 完成回调出错: {e}")
@@ -0,0 +1,298 @@
+"""采集流水线的运行指标: 计数器、仪表和直方图, 可导出为 JSON 或 Prometheus 文本格式
+
+记录指标只是一次加法 (直方图另加一次二分查找), 可以放在热路径上; 导出时才汇总和格式化。
+默认注册表 REGISTRY 由采集引擎、I/O 线程和图形界面共用, 可以:
+
+- 写入文件: REGISTRY.write('metrics.json') 或 REGISTRY.write('metrics.prom')
+- 通过本机 HTTP 端点提供: REGISTRY.serve(9100), 然后访问 /metrics (Prometheus) 或 /metrics.json
+
+计数在多个线程中并发累加时不加锁: 同一个带标签的指标通常只由一个线程更新 (每台设备一个标签值)。
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 延迟类直方图的默认桶上限 (秒)
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LOG_FORMAT = "%(message)s"
+
+logger = logging.getLogger(__name__)
+
+
+class Counter:
+    """只增不减的计数"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def sample(self):
+        return self.value
+
+
+class Gauge:
+    """可增可减的当前值"""
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def sample(self):
+        return self.value
+
+
+class Histogram:
+    """按固定桶统计的分布 (另记总和与次数, 可求平均值)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def sample(self):
+        """
+        Returns:
+            字典: count, sum, mean, buckets ({上限: 累计次数}, 与 Prometheus 一致)
+        """
+        cumulative = {}
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            cumulative['+Inf' if bound == float('inf') else repr(bound)] = total
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'buckets': cumulative,
+        }
+
+
+class MetricFamily:
+    """同名指标的集合, 按标签值区分"""
+
+    def __init__(self, name, kind, help_text, factory):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """取得 (必要时创建) 指定标签值的指标"""
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def items(self):
+        return list(self._children.items())
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _family(self, name, kind, help_text, factory):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, kind, help_text, factory)
+            elif family.kind != kind:
+                raise ValueError(f"指标 {name} 已注册为 {family.kind}")
+            return family
+
+    def counter(self, name, help_text=""):
+        """注册 (或取得已注册的) 计数器"""
+        return self._family(name, 'counter', help_text, Counter)
+
+    def gauge(self, name, help_text=""):
+        """注册 (或取得已注册的) 仪表"""
+        return self._family(name, 'gauge', help_text, Gauge)
+
+    def histogram(self, name, help_text="", buckets=LATENCY_BUCKETS):
+        """注册 (或取得已注册的) 直方图"""
+        return self._family(name, 'histogram', help_text, lambda: Histogram(buckets))
+
+    def snapshot(self):
+        """
+        当前全部指标
+
+        Returns:
+            {指标名: {'type', 'help', 'samples': [{'labels': {...}, 'value': ...}]}}
+        """
+        with self._lock:
+            families = list(self._families.values())
+        result = {}
+        for family in families:
+            result[family.name] = {
+                'type': family.kind,
+                'help': family.help,
+                'samples': [{'labels': dict(key), 'value': child.sample()}
+                            for key, child in family.items()],
+            }
+        return result
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=1)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式 (0.0.4)"""
+        lines = []
+        for name, family in self.snapshot().items():
+            if family['help']:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for sample in family['samples']:
+                labels = sample['labels']
+                value = sample['value']
+                if family['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                for bound, count in value['buckets'].items():
+                    lines.append(f"{name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        原子地写出全部指标 (.prom / .txt 为 Prometheus 文本格式, 其他为 JSON)
+
+        Returns:
+            写出的路径
+        """
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        temp = path + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp, path)
+        return path
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        在后台线程中提供 HTTP 端点: /metrics (Prometheus 文本) 和 /metrics.json
+
+        Args:
+            port: 端口 (0 = 自动选择)
+            host: 监听地址 (默认只允许本机访问)
+
+        Returns:
+            实际监听的端口
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path == '/metrics':
+                    body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+                elif path == '/metrics.json':
+                    body, content_type = registry.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics http: " + format, *args)
+
+        self.stop_serving()
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        thread.start()
+        return self._server.server_address[1]
+
+    def stop_serving(self):
+        """停止 HTTP 端点"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def clear(self):
+        """删除全部指标 (已取得的指标对象不再被导出)"""
+        with self._lock:
+            self._families.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def configure_logging(level='INFO'):
+    """
+    命令行工具的日志配置: 只输出消息本身 (与 print 的输出一致)
+
+    Args:
+        level: 日志级别名称 (DEBUG / INFO / WARNING / ERROR); INFO 显示采集进度, WARNING 只显示问题
+    """
+    logging.basicConfig(level=getattr(logging, level.upper()), format=LOG_FORMAT)
+
+
+class PipelineMetrics:
+    """一台设备的采集流水线指标 (同一注册表中按 device 标签区分)"""
+
+    def __init__(self, device, registry=None):
+        """
+        Args:
+            device: 设备标签 (串口号或设备名称)
+            registry: 指标注册表 (默认: REGISTRY)
+        """
+        registry = REGISTRY if registry is None else registry
+        labels = {'device': device}
+        self.device = device
+        self.bytes_read = registry.counter(
+            'echem_bytes_read_total', '从设备收到的字节数').labels(**labels)
+        self.points = registry.counter(
+            'echem_points_parsed_total', '解析得到的数据点数').labels(**labels)
+        self.parse_errors = registry.counter(
+            'echem_parse_errors_total', '无法解析的行数 (格式错误、解码错误、未知响应)').labels(**labels)
+        self.serial_errors = registry.counter(
+            'echem_serial_errors_total', '串口读取异常次数').labels(**labels)
+        self.measurements = registry.counter(
+            'echem_measurements_completed_total', '正常完成的测量次数').labels(**labels)
+        self.queue_depth = registry.gauge(
+            'echem_queue_depth', '处理响应时响应队列中剩余的条目数').labels(**labels)
+        self.queue_latency = registry.histogram(
+            'echem_queue_latency_seconds', '读取线程放入响应队列到开始处理的时间').labels(**labels)
+        self.analysis_time = registry.histogram(
+            'echem_analysis_seconds', '每批数据的实时分析耗时').labels(**labels)
+
+
+REGISTRY = MetricsRegistry()
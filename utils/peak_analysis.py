@@ -0,0 +1,538 @@
+"""DPV 峰分析: 平滑、基线校正、寻峰和定量 (峰电位、峰高、半峰宽、峰面积)
+
+全部计算基于 NumPy 向量运算, 不依赖 SciPy。
+PeakTracker 在采集过程中随缓冲区增长增量平滑并定期寻峰, 收到结束标记时只需对
+已平滑的数据做一次基线校正和寻峰, 峰分析结果立即可用。
+"""
+
+import numpy as np
+
+
+class PeakSettings:
+    """寻峰参数"""
+
+    def __init__(self, smooth_window=9, smooth_order=2, baseline='polynomial',
+                 baseline_order=1, baseline_iterations=100, polarity='auto',
+                 min_height=None, min_prominence=None, noise_factor=5.0,
+                 min_width=0.0, min_distance=0.0, max_peaks=10):
+        """
+        Args:
+            smooth_window: Savitzky-Golay 平滑窗口 (点数, 奇数; 1 = 不平滑)
+            smooth_order: Savitzky-Golay 多项式阶数
+            baseline: 基线方法 ('polynomial' = 迭代多项式拟合 (峰被逐步削去),
+                      'linear' = 两端连线, 'none' = 不校正)
+            baseline_order: 多项式基线阶数
+            baseline_iterations: 多项式基线最大迭代次数
+            polarity: 峰方向 ('positive' / 'negative' / 'auto' = 按偏离基线最大的方向)
+            min_height: 最小峰高 (μA, 相对基线; 默认: 不限制)
+            min_prominence: 最小显著度 (μA; 默认: noise_factor × 噪声估计)
+            noise_factor: 自动显著度阈值的噪声倍数
+            min_width: 最小半峰宽 (V)
+            min_distance: 相邻峰的最小电位间距 (V), 距离过近时保留显著度高的峰
+            max_peaks: 最多保留的峰数 (按显著度)
+        """
+        self.smooth_window = smooth_window
+        self.smooth_order = smooth_order
+        self.baseline = baseline
+        self.baseline_order = baseline_order
+        self.baseline_iterations = baseline_iterations
+        self.polarity = polarity
+        self.min_height = min_height
+        self.min_prominence = min_prominence
+        self.noise_factor = noise_factor
+        self.min_width = min_width
+        self.min_distance = min_distance
+        self.max_peaks = max_peaks
+
+
+class Peak:
+    """一个峰的定量结果 (电流为原始单位 μA, 电位为 V)"""
+
+    def __init__(self, index, potential, current, height, prominence, fwhm, area,
+                 left_index, right_index, left, right):
+        self.index = index              # 峰顶的数据下标
+        self.potential = potential      # 峰电位 Ep
+        self.current = current          # 峰顶的 (平滑后) 电流
+        self.height = height            # 峰高 ip (相对基线, 带符号)
+        self.prominence = prominence    # 显著度 (相对两侧谷底)
+        self.fwhm = fwhm                # 半峰宽
+        self.area = area                # 峰面积 (μA·V, 基线校正后, 带符号)
+        self.left_index = left_index    # 积分区间 (数据下标)
+        self.right_index = right_index
+        self.left = left                # 积分区间 (电位)
+        self.right = right
+
+    def describe(self):
+        """单行描述"""
+        return (f"Ep = {self.potential:.4f} V, ip = {self.height:.4g} μA, "
+                f"FWHM = {self.fwhm * 1000:.1f} mV, 面积 = {self.area:.4g} μA·V")
+
+    def as_dict(self):
+        return {
+            'potential': self.potential,
+            'current': self.current,
+            'height': self.height,
+            'prominence': self.prominence,
+            'fwhm': self.fwhm,
+            'area': self.area,
+            'left': self.left,
+            'right': self.right,
+        }
+
+    def __repr__(self):
+        return f"Peak({self.describe()})"
+
+
+class PeakResult:
+    """峰分析结果"""
+
+    def __init__(self, peaks, smoothed, baseline, polarity, noise, points):
+        self.peaks = peaks          # Peak 列表 (按电位顺序)
+        self.smoothed = smoothed    # 平滑后的电流
+        self.baseline = baseline    # 基线电流
+        self.polarity = polarity    # 1 (正峰) 或 -1 (负峰)
+        self.noise = noise          # 噪声估计 (μA)
+        self.points = points        # 参与分析的数据点数
+
+    def summary_lines(self):
+        """结果摘要 (用于控制台和日志)"""
+        if not self.peaks:
+            return [f"未检测到峰 (噪声 ≈ {self.noise:.3g} μA)"]
+        lines = [f"检测到 {len(self.peaks)} 个峰 (噪声 ≈ {self.noise:.3g} μA)"]
+        for number, peak in enumerate(self.peaks, 1):
+            lines.append(f"峰 {number}: {peak.describe()}")
+        return lines
+
+    @property
+    def main_peak(self):
+        """显著度最高的峰 (没有峰时为 None)"""
+        return max(self.peaks, key=lambda peak: peak.prominence) if self.peaks else None
+
+    def __len__(self):
+        return len(self.peaks)
+
+
+def savgol_coefficients(window, order):
+    """
+    Savitzky-Golay 平滑卷积系数 (窗口中心点的最小二乘多项式值)
+
+    Args:
+        window: 窗口点数 (奇数)
+        order: 多项式阶数 (< window)
+    """
+    half = window // 2
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    design = np.vander(offsets, order + 1, increasing=True)
+    return np.linalg.pinv(design)[0]
+
+
+def _smooth_window(settings, n):
+    """按数据长度调整平滑窗口 (奇数, 大于多项式阶数), 返回 (window, order)"""
+    window = min(int(settings.smooth_window), n if n % 2 else n - 1)
+    order = min(int(settings.smooth_order), window - 1)
+    if window < 3 or order < 0:
+        return 1, 0
+    return window, order
+
+
+def _smooth_range(values, start, stop, coefficients):
+    """
+    计算 values[start:stop] 的平滑值 (两端按镜像延拓)
+
+    只读取 [start - half, stop + half) 范围内的数据, 用于增量平滑。
+    """
+    half = len(coefficients) // 2
+    n = len(values)
+    lo, hi = start - half, stop + half
+    segment = values[max(lo, 0):min(hi, n)]
+    if lo < 0:
+        segment = np.concatenate((values[1:1 - lo][::-1], segment))
+    if hi > n:
+        segment = np.concatenate((segment, values[2 * n - hi - 1:n - 1][::-1]))
+    return np.convolve(segment, coefficients[::-1], mode='valid')
+
+
+def smooth(values, window=9, order=2):
+    """
+    Savitzky-Golay 平滑
+
+    Args:
+        values: 数据数组
+        window: 窗口点数 (奇数)
+        order: 多项式阶数
+
+    Returns:
+        平滑后的数组 (与输入等长)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    window, order = _smooth_window(PeakSettings(smooth_window=window, smooth_order=order),
+                                   len(values))
+    if window == 1:
+        return values.copy()
+    return _smooth_range(values, 0, len(values), savgol_coefficients(window, order))
+
+
+def estimate_noise(values):
+    """
+    噪声估计: 相邻点差分的中位绝对偏差 (对峰和缓慢变化的基线不敏感)
+
+    Returns:
+        噪声标准差估计
+    """
+    if len(values) < 3:
+        return 0.0
+    diff = np.diff(values)
+    return float(1.4826 * np.median(np.abs(diff - np.median(diff))) / np.sqrt(2.0))
+
+
+def _edge_points(n):
+    return max(3, n // 50)
+
+
+def estimate_baseline(currents, method='polynomial', order=1, iterations=100, polarity=1):
+    """
+    基线估计
+
+    Args:
+        currents: 电流数组 (通常为平滑后)
+        method: 'polynomial' / 'linear' / 'none'
+        order: 多项式阶数
+        iterations: 多项式基线最大迭代次数
+        polarity: 峰方向 (1 = 正峰, 基线从下方逼近; -1 = 负峰)
+
+    Returns:
+        基线数组
+    """
+    n = len(currents)
+    if method == 'none' or n < 2:
+        return np.zeros(n)
+
+    if method == 'linear' or n < 2 * _edge_points(n):
+        k = _edge_points(n) if n >= 2 * _edge_points(n) else 1
+        left = currents[:k].mean()
+        right = currents[-k:].mean()
+        return np.linspace(left, right, n)
+
+    if method != 'polynomial':
+        raise ValueError(f"不支持的基线方法: {method}")
+
+    # 迭代多项式拟合: 每次把高于拟合线的点 (峰) 压到拟合线上, 直到收敛;
+    # 最小二乘投影矩阵只计算一次, 每次迭代只是矩阵-向量乘法
+    x = np.linspace(-1.0, 1.0, n)
+    design = np.vander(x, min(int(order), n - 1) + 1)
+    projection = np.linalg.pinv(design)
+    work = polarity * currents
+    tolerance = 1e-6 * (np.ptp(work) or 1.0)
+    for _ in range(int(iterations)):
+        fit = design @ (projection @ work)
+        clipped = np.minimum(work, fit)
+        if np.max(work - clipped) <= tolerance:
+            break
+        work = clipped
+    return polarity * fit
+
+
+def _polarity(settings, smoothed):
+    """确定峰方向"""
+    if settings.polarity == 'positive':
+        return 1
+    if settings.polarity == 'negative':
+        return -1
+    residual = smoothed - estimate_baseline(smoothed, 'linear')
+    return 1 if residual.max() >= -residual.min() else -1
+
+
+def _crossing(voltages, signal, level, start, stop):
+    """在 signal[start..stop] (单调接近 level 的一侧) 中线性插值求 signal = level 的电位"""
+    if start == stop:
+        return voltages[start]
+    y0, y1 = signal[start], signal[stop]
+    if y1 == y0:
+        return voltages[stop]
+    ratio = (level - y0) / (y1 - y0)
+    return voltages[start] + ratio * (voltages[stop] - voltages[start])
+
+
+def _nearest_higher(values):
+    """
+    每个元素左侧最近的严格更大元素的下标 (没有时为 -1), 单调栈 O(n)
+    """
+    result = np.full(len(values), -1, dtype=np.int64)
+    stack = []
+    for index, value in enumerate(values.tolist()):
+        while stack and values[stack[-1]] <= value:
+            stack.pop()
+        if stack:
+            result[index] = stack[-1]
+        stack.append(index)
+    return result
+
+
+def _range_min(values, starts, stops):
+    """
+    批量区间最小值 min(values[start:stop]) (区间可以重叠, 要求 start < stop)
+    """
+    if not len(starts):
+        return np.empty(0)
+    bounds = np.empty(2 * len(starts), dtype=np.int64)
+    bounds[0::2] = starts
+    bounds[1::2] = stops
+    padded = np.append(values, values[-1])  # reduceat 的下标不能等于长度
+    return np.minimum.reduceat(padded, bounds)[0::2]
+
+
+def find_peaks(voltages, signal, settings, noise):
+    """
+    在基线校正后的信号中寻峰 (信号已按峰方向取正)
+
+    Args:
+        voltages: 电位数组
+        signal: 基线校正并按峰方向取正的电流
+        settings: PeakSettings
+        noise: 噪声估计 (用于默认显著度阈值)
+
+    Returns:
+        [(峰顶下标, 显著度, 左谷下标, 右谷下标, 左半高电位, 右半高电位)], 按下标排序
+    """
+    n = len(signal)
+    if n < 3:
+        return []
+
+    candidates = np.flatnonzero((signal[1:-1] > signal[:-2]) & (signal[1:-1] >= signal[2:])) + 1
+    min_height = settings.min_height if settings.min_height is not None else 0.0
+    candidates = candidates[signal[candidates] > min_height]
+    if not len(candidates):
+        return []
+
+    min_prominence = settings.min_prominence
+    if min_prominence is None:
+        min_prominence = settings.noise_factor * noise
+
+    # 每个候选峰向两侧延伸到第一个更高的候选峰 (其间信号不会高于该峰), 区间内的最低点为谷底
+    tops = signal[candidates]
+    k = len(candidates)
+    left_bound = _nearest_higher(tops)
+    right_bound = _nearest_higher(tops[::-1])[::-1]  # 反向数组中的下标
+    right_bound = np.where(right_bound >= 0, k - 1 - right_bound, -1)
+    left_start = np.where(left_bound >= 0, candidates[np.maximum(left_bound, 0)], 0)
+    right_stop = np.where(right_bound >= 0, candidates[np.maximum(right_bound, 0)], n - 1)
+    left_min = _range_min(signal, left_start, candidates + 1)
+    right_min = _range_min(signal, candidates, right_stop + 1)
+    prominences = tops - np.maximum(left_min, right_min)
+    keep = prominences >= min_prominence
+
+    found = []
+    for index, prominence, start, stop in zip(candidates[keep].tolist(), prominences[keep].tolist(),
+                                              left_start[keep].tolist(), right_stop[keep].tolist()):
+        left = start + int(np.argmin(signal[start:index + 1]))
+        right = index + int(np.argmin(signal[index:stop + 1]))
+
+        # 半峰宽: 峰高 (相对基线) 的一半处, 两侧线性插值
+        half = signal[index] / 2.0
+        below = np.flatnonzero(signal[left:index] < half)
+        half_left = _crossing(voltages, signal, half, left + below[-1], left + below[-1] + 1) \
+            if len(below) else voltages[left]
+        below = np.flatnonzero(signal[index + 1:right + 1] < half)
+        half_right = _crossing(voltages, signal, half, index + below[0], index + below[0] + 1) \
+            if len(below) else voltages[right]
+        if abs(half_right - half_left) < settings.min_width:
+            continue
+        found.append((index, float(prominence), left, right, float(half_left), float(half_right)))
+
+    # 间距过近的峰只保留显著度高的; 峰数上限
+    found.sort(key=lambda item: -item[1])
+    kept = []
+    for item in found:
+        if settings.min_distance and any(abs(voltages[item[0]] - voltages[other[0]]) <
+                                         settings.min_distance for other in kept):
+            continue
+        kept.append(item)
+        if len(kept) >= settings.max_peaks:
+            break
+    return sorted(kept)
+
+
+def quantify(voltages, smoothed, settings=None, noise=None):
+    """
+    对已平滑的电流做基线校正、寻峰和定量
+
+    Args:
+        voltages: 电位数组
+        smoothed: 平滑后的电流数组
+        settings: PeakSettings (默认参数)
+        noise: 噪声估计 (默认: 从 smoothed 估计, 通常应传入原始数据的估计)
+
+    Returns:
+        PeakResult
+    """
+    settings = settings or PeakSettings()
+    voltages = np.asarray(voltages, dtype=np.float64)
+    smoothed = np.asarray(smoothed, dtype=np.float64)
+    n = len(smoothed)
+    if noise is None:
+        noise = estimate_noise(smoothed)
+    if n < 3:
+        return PeakResult([], smoothed, np.zeros(n), 1, noise, n)
+
+    polarity = _polarity(settings, smoothed)
+    baseline = estimate_baseline(smoothed, settings.baseline, settings.baseline_order,
+                                 settings.baseline_iterations, polarity)
+    corrected = smoothed - baseline
+    signal = polarity * corrected
+
+    peaks = []
+    for index, prominence, left, right, half_left, half_right in \
+            find_peaks(voltages, signal, settings, noise):
+        segment_v = voltages[left:right + 1]
+        segment_i = corrected[left:right + 1]
+        # 梯形积分, 按电位间隔的绝对值 (负向扫描时面积符号不变)
+        area = float(np.sum((segment_i[1:] + segment_i[:-1]) * np.abs(np.diff(segment_v))) / 2.0)
+        peaks.append(Peak(
+            index=index,
+            potential=float(voltages[index]),
+            current=float(smoothed[index]),
+            height=float(corrected[index]),
+            prominence=prominence,
+            fwhm=abs(half_right - half_left),
+            area=area,
+            left_index=left,
+            right_index=right,
+            left=float(voltages[left]),
+            right=float(voltages[right]),
+        ))
+    return PeakResult(peaks, smoothed, baseline, polarity, noise, n)
+
+
+def analyze_peaks(voltages, currents, settings=None):
+    """
+    DPV 峰分析 (一次性处理完整数据)
+
+    Args:
+        voltages: 电位数组
+        currents: 电流数组
+        settings: PeakSettings (默认参数)
+
+    Returns:
+        PeakResult
+    """
+    settings = settings or PeakSettings()
+    currents = np.asarray(currents, dtype=np.float64)
+    smoothed = smooth(currents, settings.smooth_window, settings.smooth_order)
+    return quantify(voltages, smoothed, settings, estimate_noise(currents))
+
+
+class PeakTracker:
+    """
+    采集过程中的增量峰分析
+
+    每次 update 只平滑新增的数据点 (Savitzky-Golay 只依赖前后半个窗口);
+    新增点数达到 max(refresh_points, 已有点数 × refresh_ratio) 时重新寻峰, 总开销与点数成线性。
+    finish 补算末尾半个窗口并做最终寻峰。
+
+    数据来自环形缓冲区 (有界内存模式) 时传入 offset (数组第一个点的序号):
+    只保留窗口内的平滑值, 寻峰结果 (点数、下标、基线) 对应当前窗口。
+    """
+
+    def __init__(self, settings=None, refresh_points=100, refresh_ratio=0.25):
+        """
+        Args:
+            settings: PeakSettings (默认参数)
+            refresh_points: 采集过程中重新寻峰的最小新增点数
+            refresh_ratio: 重新寻峰的最小新增点数占已有点数的比例
+        """
+        self.settings = settings or PeakSettings()
+        self.refresh_points = refresh_points
+        self.refresh_ratio = refresh_ratio
+        self.reset()
+
+    def reset(self):
+        """清空状态 (开始新的测量)"""
+        self.result = None             # 最近一次的峰分析结果
+        self._smoothed = np.empty(0)
+        self._base = 0                 # _smoothed[0] 对应的数据序号
+        self._stable = 0               # 已确定的平滑点数 (序号)
+        self._analyzed = 0             # 上次寻峰时的点数 (序号)
+        self._window = None
+        self._coefficients = None
+
+    def _ensure_capacity(self, needed, offset=0):
+        """保证能存放序号 [offset, needed) 的平滑值; offset 之前的平滑值不再需要"""
+        drop = min(offset, self._stable) - self._base
+        if drop > 0 and drop >= len(self._smoothed) // 2:
+            # 窗口之前的部分过半时整体前移 (摊销 O(1), 占用不超过窗口的数倍)
+            kept = self._stable - self._base - drop
+            self._smoothed[:kept] = self._smoothed[drop:drop + kept]
+            self._base += drop
+        if needed - self._base > len(self._smoothed):
+            grown = np.empty(max(needed - self._base, 2 * len(self._smoothed), 1024))
+            grown[:self._stable - self._base] = self._smoothed[:self._stable - self._base]
+            self._smoothed = grown
+
+    def _extend_smoothing(self, currents, stop, offset=0):
+        """计算序号 [_stable, stop) 的平滑值 (currents[0] 的序号为 offset)"""
+        if stop <= self._stable:
+            return
+        # 来不及平滑就被环形缓冲区覆盖的点直接跳过
+        self._stable = max(self._stable, offset)
+        self._ensure_capacity(stop, offset)
+        base = self._base
+        if self._coefficients is None:
+            self._smoothed[self._stable - base:stop - base] = currents[self._stable - offset:stop - offset]
+        else:
+            self._smoothed[self._stable - base:stop - base] = _smooth_range(
+                currents, self._stable - offset, stop - offset, self._coefficients)
+        self._stable = stop
+
+    def update(self, voltages, currents, offset=0):
+        """
+        输入当前完整数据 (可直接传入 DataBuffer 的零拷贝视图)
+
+        Args:
+            voltages: 电位数组
+            currents: 电流数组
+            offset: 数组第一个点的序号 (环形缓冲区的 first, 默认 0)
+
+        Returns:
+            最近一次的峰分析结果 (可能为 None)
+        """
+        count = len(currents)
+        if self._coefficients is None and self._window is None:
+            window, order = _smooth_window(self.settings, self.settings.smooth_window)
+            if count < window:
+                return self.result
+            self._window = window
+            if window > 1:
+                self._coefficients = savgol_coefficients(window, order)
+        half = self._window // 2
+        self._extend_smoothing(currents, offset + count - half, offset)
+
+        if self._stable - self._analyzed >= max(self.refresh_points,
+                                                (self._analyzed - offset) * self.refresh_ratio):
+            self._analyzed = self._stable
+            stable = self._stable - offset
+            self.result = quantify(voltages[:stable], self._window_smoothed(offset, self._stable),
+                                   self.settings, estimate_noise(currents[:stable]))
+        return self.result
+
+    def finish(self, voltages, currents, offset=0):
+        """
+        测量结束: 补算末尾的平滑值并做最终寻峰
+
+        Returns:
+            PeakResult
+        """
+        count = len(currents)
+        if self._window is None or count < self._window:
+            # 数据太少, 增量平滑尚未开始
+            self.result = analyze_peaks(voltages, currents, self.settings)
+            return self.result
+        n = offset + count
+        self._extend_smoothing(currents, n, offset)
+        self._analyzed = n
+        self.result = quantify(voltages[:count], self._window_smoothed(offset, n), self.settings,
+                               estimate_noise(currents))
+        return self.result
+
+    def _window_smoothed(self, start, stop):
+        """序号 [start, stop) 的平滑值"""
+        return self._smoothed[start - self._base:stop - self._base]
@@ -0,0 +1,177 @@
+"""分析结果的磁盘缓存: 对同一份原始数据重复分析时直接读取上次的解析和分析结果
+
+缓存键 = 输入文件内容的 SHA-256 + 分析参数 + 代码版本 (参与分析的模块源码的哈希),
+文件内容、参数或分析代码任一变化都会自动失效, 不需要手动清理。
+缓存总大小有上限, 超出时按最近使用时间 (文件 mtime, 命中时更新) 淘汰最久未用的条目。
+
+条目用 pickle 保存, 只应指向本机用户自己的缓存目录 (不要读取来源不明的缓存文件)。
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+
+CACHE_FORMAT = 1                               # 条目格式版本 (格式变化时递增)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'echem_analysis')
+DEFAULT_MAX_BYTES = 1 << 30                    # 缓存总大小上限 (1 GB)
+ENTRY_SUFFIX = ".pkl"
+
+_code_versions = {}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(modules):
+    """
+    代码版本: 模块源码的哈希 (同一进程中只计算一次)
+
+    Args:
+        modules: 参与计算结果的模块列表
+    """
+    files = tuple(sorted(os.path.abspath(module.__file__) for module in modules))
+    if files not in _code_versions:
+        digest = hashlib.sha256(str(CACHE_FORMAT).encode())
+        for path in files:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _code_versions[files] = digest.hexdigest()[:16]
+    return _code_versions[files]
+
+
+class ResultCache:
+    """按内容哈希索引的磁盘缓存 (LRU 大小上限, 可被多个进程同时使用)"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory: 缓存目录 (不存在时自动创建)
+            max_bytes: 缓存总大小上限 (字节)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(content_hash, namespace, params=None, version=""):
+        """
+        生成缓存键
+
+        Args:
+            content_hash: 输入数据的内容哈希
+            namespace: 结果类型 (如 'sessions'、'data')
+            params: 影响结果的参数 (可 JSON 序列化)
+            version: 代码版本 (见 code_version)
+        """
+        text = json.dumps([content_hash, namespace, params, version], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """
+        读取缓存条目
+
+        Returns:
+            缓存的值, 不存在或损坏时为 None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # 写入中断或版本不兼容的条目: 删除后按未命中处理
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # 更新最近使用时间
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        写入缓存条目 (先写临时文件再原子替换), 然后按大小上限淘汰旧条目
+
+        Returns:
+            条目大小 (字节); 单个条目超过上限时不写入, 返回 0
+        """
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return 0
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp, self._path(key))
+        except OSError:
+            self._remove(temp)
+            return 0
+        self.evict()
+        return len(payload)
+
+    def entries(self):
+        """[(最近使用时间, 大小, 路径)], 按最近使用时间从旧到新排序"""
+        result = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # 已被其他进程淘汰
+                result.append((stat.st_mtime, stat.st_size, entry.path))
+        result.sort()
+        return result
+
+    def size(self):
+        """缓存当前总大小 (字节)"""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """
+        淘汰最久未用的条目, 直到总大小不超过上限
+
+        Returns:
+            淘汰的条目数
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """删除全部条目"""
+        return self.evict(0)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
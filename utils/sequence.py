@@ -0,0 +1,294 @@
+"""无人值守的测量序列: 按计划文件在同一个连接上依次运行多次测量
+
+计划文件 (JSON) 描述测量步骤, 支持参数扫描 (sweep, 多个参数时取笛卡尔积) 和重复测量 (repeat)::
+
+    {
+      "name": "scan-rate study",
+      "defaults": {"timeout": 120, "plot": true},
+      "steps": [
+        {"technique": "CV", "name": "cv", "params": {"cycles": 3},
+         "sweep": {"scan_rate": [0.05, 0.1, 0.2]}},
+        {"technique": "DPV", "params": {"pulse_height": 0.05}, "repeat": 3, "delay": 10}
+      ]
+    }
+
+步骤字段: technique (CV / DPV), name, params (测量参数, 与各技术的参数命令一致), sweep, repeat,
+delay (开始前等待的秒数, 如电极静置), timeout (采集超时, 秒), plot (是否输出曲线图)。
+defaults 中的字段作为每个步骤的默认值 (params 按键合并)。
+
+串口在整个序列中保持打开; 每个步骤采集完成后, 数据文件收尾、曲线图渲染和结果记录交给后台线程,
+下一个步骤立即开始采集。序列清单 sequence_manifest.json 在每个步骤前后原子地更新。
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils.acquisition import ProtocolState, save_plot_file
+from utils.data_store import FORMAT_EXTENSIONS, write_file
+from utils.dpv_protocol import DPVTechnique
+from utils.electrochemical_protocol import CVTechnique
+
+
+TECHNIQUES = {'CV': CVTechnique, 'DPV': DPVTechnique}
+STEP_FIELDS = ('technique', 'name', 'params', 'sweep', 'repeat', 'delay', 'timeout', 'plot')
+MANIFEST_FILE = "sequence_manifest.json"
+DEFAULT_TIMEOUT = 60
+ACK_TIMEOUT = 5
+QUIET_PERIOD = 2.0   # 步骤失败后, 设备这么长时间没有新数据即视为扫描已结束 (秒)
+DRAIN_TIMEOUT = 60   # 步骤失败后等待扫描结束的最短上限 (秒)
+
+
+def load_plan(path):
+    """
+    读取并展开计划文件
+
+    Returns:
+        (计划字典, 展开后的步骤列表)
+
+    Raises:
+        ValueError: 计划文件格式错误 (在连接设备之前发现)
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            plan = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"计划文件不是有效的 JSON: {e}")
+    return plan, expand_plan(plan)
+
+
+def expand_plan(plan):
+    """
+    把计划展开为逐次测量的步骤, 并检查每个步骤的参数
+
+    Returns:
+        步骤字典列表: index, label (输出文件名前缀), name, technique, params, delay, timeout, plot
+    """
+    if not isinstance(plan, dict) or not isinstance(plan.get('steps'), list) or not plan['steps']:
+        raise ValueError("计划文件必须包含非空的 steps 列表")
+    defaults = plan.get('defaults', {})
+
+    steps = []
+    for number, spec in enumerate(plan['steps'], 1):
+        unknown = set(spec) - set(STEP_FIELDS)
+        if unknown:
+            raise ValueError(f"步骤 {number}: 未知字段 {', '.join(sorted(unknown))}")
+        merged = dict(defaults, **spec)
+        merged['params'] = dict(defaults.get('params', {}), **spec.get('params', {}))
+
+        technique_name = str(merged.get('technique', '')).upper()
+        if technique_name not in TECHNIQUES:
+            raise ValueError(f"步骤 {number}: 不支持的测量技术 {merged.get('technique')!r} "
+                             f"(可选: {', '.join(TECHNIQUES)})")
+        technique = TECHNIQUES[technique_name]()
+
+        sweep = merged.get('sweep') or {}
+        names = list(sweep)
+        values = [v if isinstance(v, list) else [v] for v in sweep.values()]
+        repeat = int(merged.get('repeat', 1))
+        base = merged.get('name') or technique.file_prefix
+
+        for combination in itertools.product(*values):
+            params = dict(merged['params'], **dict(zip(names, combination)))
+            try:
+                technique.build_parameter_frame(**params)
+            except TypeError as e:
+                raise ValueError(f"步骤 {number}: {technique_name} 参数错误 - {e}")
+            suffix = "".join(f"_{name}{value}" for name, value in zip(names, combination))
+            for run in range(1, repeat + 1):
+                index = len(steps) + 1
+                name = base + suffix + (f"_r{run}" if repeat > 1 else "")
+                steps.append({
+                    'index': index,
+                    'label': f"{index:03d}_{name}",
+                    'name': name,
+                    'technique': technique_name,
+                    'params': params,
+                    'delay': float(merged.get('delay', 0)),
+                    'timeout': float(merged.get('timeout', DEFAULT_TIMEOUT)),
+                    'plot': bool(merged.get('plot', True)),
+                })
+    return steps
+
+
+class SequenceRunner:
+    """在一个已创建的采集引擎上依次运行测量步骤, 后台处理每个步骤的输出"""
+
+    def __init__(self, engine, output_dir, workers=2, stop_on_error=False):
+        """
+        Args:
+            engine: AcquisitionEngine 实例 (尚未连接; 流式写入格式由 stream_format 决定)
+            output_dir: 输出目录 (数据文件、曲线图、清单)
+            workers: 后台处理线程数
+            stop_on_error: 某个步骤失败时是否停止整个序列 (默认: 记录后继续)
+        """
+        self.engine = engine
+        self.output_dir = output_dir
+        self.workers = workers
+        self.stop_on_error = stop_on_error
+        self.manifest = None
+        self._lock = threading.Lock()
+
+    def run(self, steps, plan=None):
+        """
+        运行全部步骤
+
+        Args:
+            steps: expand_plan 的结果
+            plan: 原始计划 (记录到清单中)
+
+        Returns:
+            序列清单字典
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = {
+            'plan': plan,
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'finished': None,
+            'steps': [],
+        }
+        engine = self.engine
+        if not engine.connect():
+            self.manifest['error'] = "连接失败"
+            self._save_manifest()
+            return self.manifest
+
+        start = time.perf_counter()
+        idle_total = 0.0
+        futures = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                previous_end = None
+                for step in steps:
+                    if engine.stop_flag.is_set():
+                        break
+                    entry, stream_file, previous_end = self._run_step(step, previous_end)
+                    if entry.get('idle_s') is not None:
+                        idle_total += entry['idle_s']
+                    futures.append(pool.submit(self._finish_step, entry, engine.technique,
+                                               engine.data_buffer, engine.analysis, stream_file))
+                    if entry['status'] != 'complete' and self.stop_on_error:
+                        print(f"⛔ 步骤 {step['label']} 失败, 停止序列")
+                        break
+                # 退出 with 时等待全部后台任务完成
+            for future in futures:
+                future.result()
+        finally:
+            engine.disconnect()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            entries = self.manifest['steps']
+            self.manifest['finished'] = datetime.now().isoformat(timespec='seconds')
+            self.manifest['elapsed_s'] = round(elapsed, 3)
+            self.manifest['idle_s'] = round(idle_total, 3)
+            self.manifest['completed'] = sum(entry['status'] == 'complete' for entry in entries)
+            self.manifest['failed'] = len(entries) - self.manifest['completed']
+        self._save_manifest()
+        return self.manifest
+
+    def _run_step(self, step, previous_end):
+        """
+        在当前连接上运行一个步骤 (参数 → 确认 → 开始 → 采集)
+
+        Returns:
+            (清单条目, 流式写入的数据文件路径或 None, 采集结束时间)
+        """
+        engine = self.engine
+        # 上一步采集结束到本步开始之间仪器处于空闲 (含失败后等待扫描结束的时间, 不含计划中的 delay)
+        idle = time.perf_counter() - previous_end if previous_end is not None else None
+        entry = dict(step, status='running', started=datetime.now().isoformat(timespec='seconds'),
+                     idle_s=None if idle is None else round(idle, 3), duration_s=None,
+                     error=None, points=0, data_file=None, plot_file=None, analysis=None)
+        with self._lock:
+            self.manifest['steps'].append(entry)
+        self._save_manifest()
+        print(f"\n▶️  步骤 {step['index']}: {step['label']} ({step['technique']})")
+
+        if step['delay'] > 0:
+            print(f"   ⏳ 等待 {step['delay']:.1f} 秒")
+            engine.stop_flag.wait(step['delay'])
+
+        if engine.technique.name != step['technique']:
+            engine.set_technique(TECHNIQUES[step['technique']]())
+        stream_file = None
+        if engine.stream_format:
+            stream_file = os.path.join(
+                self.output_dir, step['label'] + FORMAT_EXTENSIONS[engine.stream_format])
+            engine.stream_path = stream_file
+        engine.data_buffer = engine.create_buffer()
+        engine.analysis = None
+        engine.discard_responses()
+
+        began = time.perf_counter()
+        if not engine.send_parameters(**step['params']):
+            error = "发送参数失败"
+        elif not engine.wait_for_parameter_ack(timeout=ACK_TIMEOUT):
+            error = "参数确认超时"
+        elif not engine.send_start_command():
+            error = "发送开始命令失败"
+        else:
+            engine.process_responses(timeout=step['timeout'])
+            error = None if engine.state == ProtocolState.TEST_COMPLETE else "采集未完成 (超时或中断)"
+
+        ended = time.perf_counter()
+        entry['duration_s'] = round(ended - began, 3)
+        entry['points'] = engine.data_buffer.total
+        if error:
+            entry['status'] = 'failed'
+            entry['error'] = error
+            print(f"   ❌ {error}")
+            engine.abort_measurement()
+            if not engine.simulate:
+                # 设备没有停止命令: 等到本次扫描结束 (结束标记或不再有数据) 再开始下一步
+                engine.discard_responses(quiet=QUIET_PERIOD,
+                                         timeout=max(step['timeout'], DRAIN_TIMEOUT))
+        else:
+            entry['status'] = 'complete'
+            print(f"   ✓ 采集完成: {entry['points']} 个数据点, {entry['duration_s']:.1f} 秒")
+        return entry, stream_file, ended
+
+    def _finish_step(self, entry, technique, data_buffer, analysis, stream_file):
+        """
+        后台处理一个步骤的输出: 数据文件 (未流式写入时写出)、曲线图、分析摘要, 然后更新清单
+
+        data_buffer 和 analysis 是该步骤的对象; 下一步骤开始时引擎会创建新的对象, 这里无需复制。
+        stream_file 为采集过程中流式写入的文件 (未流式写入时为 None)。
+        """
+        try:
+            if not entry['points']:
+                return
+            if stream_file and os.path.exists(stream_file):
+                path = stream_file
+            else:
+                path = os.path.join(self.output_dir, entry['label'] + FORMAT_EXTENSIONS['csv'])
+                write_file(path, *data_buffer.view(), columns=technique.data_schema.columns,
+                           metadata={'technique': technique.name, 'parameters': entry['params'],
+                                     'complete': entry['status'] == 'complete'})
+            entry['data_file'] = os.path.basename(path)
+
+            if analysis is not None:
+                entry['analysis'] = analysis.summary_lines()
+            if entry['plot']:
+                plot_path = os.path.join(self.output_dir, entry['label'] + ".png")
+                save_plot_file(plot_path, technique.title, data_buffer.voltages,
+                               data_buffer.currents, analysis, total=data_buffer.total)
+                entry['plot_file'] = os.path.basename(plot_path)
+        except Exception as e:
+            entry['error'] = f"输出失败: {type(e).__name__}: {e}"
+            print(f"   ⚠️  步骤 {entry['label']} {entry['error']}")
+        finally:
+            self._save_manifest()
+
+    def _save_manifest(self):
+        """原子地写出序列清单"""
+        path = os.path.join(self.output_dir, MANIFEST_FILE)
+        with self._lock:
+            temp = path + ".tmp"
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=1, default=str)
+            os.replace(temp, path)
@@ -0,0 +1,161 @@
+"""串口批量读取与 CRLF 分帧工具"""
+
+
+class LineFramer:
+    """
+    CRLF 分帧器
+
+    把任意切分的字节块还原为完整的行, 不完整的行尾保留到下一次 feed。
+    """
+
+    def __init__(self, max_pending=65536):
+        """
+        Args:
+            max_pending: 未完成行的最大缓存字节数, 超出时丢弃 (防止设备异常时无限增长)
+        """
+        self._pending = bytearray()
+        self.max_pending = max_pending
+        self.dropped_bytes = 0
+
+    def feed(self, data):
+        """
+        送入一块原始字节, 返回其中所有完整的行
+
+        Args:
+            data: bytes / bytearray / memoryview
+
+        Returns:
+            完整行的列表 (bytes, 已去掉行尾 \\r\\n, 空行被跳过)
+        """
+        pending = self._pending
+        pending += data
+
+        end = pending.rfind(b"\n")
+        if end < 0:
+            if len(pending) > self.max_pending:
+                self.dropped_bytes += len(pending)
+                pending.clear()
+            return []
+
+        complete = bytes(pending[:end])
+        del pending[:end + 1]
+
+        lines = []
+        for line in complete.split(b"\n"):
+            line = line.strip()
+            if line:
+                lines.append(line)
+        return lines
+
+    def feed_block(self, data):
+        """
+        送入一块原始字节, 返回其中所有完整行组成的字节块
+
+        与 feed 不同, 不拆分成单独的行, 保留原始行尾, 适合交给批量解析器处理。
+
+        Returns:
+            bytes (没有完整行时为 b"")
+        """
+        pending = self._pending
+        pending += data
+
+        end = pending.rfind(b"\n")
+        if end < 0:
+            if len(pending) > self.max_pending:
+                self.dropped_bytes += len(pending)
+                pending.clear()
+            return b""
+
+        block = bytes(pending[:end + 1])
+        del pending[:end + 1]
+        return block
+
+    @property
+    def pending(self):
+        """尚未收到行尾的字节数"""
+        return len(self._pending)
+
+    def reset(self):
+        """清空未完成的行"""
+        self._pending.clear()
+
+
+class BulkLineReader:
+    """
+    非阻塞批量串口读取器
+
+    一次性读出 in_waiting 中的全部字节到可复用的 bytearray, 自行按 CRLF 分帧。
+    没有数据时阻塞等待第一个字节 (受串口 timeout 限制), 不需要 sleep 轮询。
+    """
+
+    def __init__(self, serial_conn, chunk_size=4096):
+        """
+        Args:
+            serial_conn: 已打开的 serial.Serial 实例
+            chunk_size: 单次读取的最大字节数 (可复用缓冲区大小)
+        """
+        self.serial_conn = serial_conn
+        self.framer = LineFramer()
+        self._chunk = bytearray(chunk_size)
+        self._view = memoryview(self._chunk)
+        self.bytes_read = 0
+        self.decode_errors = 0
+
+    def _read_available(self):
+        """
+        读取当前可用的字节到可复用缓冲区
+
+        Returns:
+            读到数据的 memoryview (超时未收到数据时长度为 0)
+        """
+        conn = self.serial_conn
+        waiting = conn.in_waiting
+
+        if waiting:
+            n = conn.readinto(self._view[:min(waiting, len(self._chunk))])
+        else:
+            # 阻塞等待第一个字节, 到达后立即把同一批到达的数据一起读出
+            first = conn.read(1)
+            if not first:
+                return self._view[:0]
+            self._chunk[0] = first[0]
+            n = 1
+            waiting = conn.in_waiting
+            if waiting:
+                n += conn.readinto(self._view[1:1 + min(waiting, len(self._chunk) - 1)])
+
+        self.bytes_read += n
+        return self._view[:n]
+
+    def read_lines(self):
+        """
+        读取当前可用的所有完整行
+
+        Returns:
+            解码后的行 (str) 列表, 超时未收到数据时返回空列表
+        """
+        data = self._read_available()
+        if not data:
+            return []
+
+        lines = []
+        for raw in self.framer.feed(data):
+            try:
+                lines.append(raw.decode())
+            except UnicodeDecodeError as e:
+                # 解码错误不致命,跳过这条数据
+                self.decode_errors += 1
+                print(f"数据解码错误: {e}")
+        return lines
+
+    def read_block(self):
+        """
+        读取当前可用的所有完整行, 作为一个原始字节块返回 (交给 parse_data_block 批量解析)
+
+        Returns:
+            bytes, 超时或尚无完整行时返回 b""
+        """
+        data = self._read_available()
+        if not data:
+            return b""
+        return self.framer.feed_block(data)
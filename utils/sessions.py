@@ -0,0 +1,387 @@
+"""串口日志会话切分: 把包含多次测量 (P → # → * → 数据 → @/$) 的日志按测量拆分
+
+按时间顺序流式处理收发数据, 每次测量结束 (或下一次测量开始) 时立即产出该会话,
+内存只保存当前会话的数据, 一整天的日志也能一次读完。
+"""
+
+import numpy as np
+
+from utils.dpv_protocol import DPVTechnique
+from utils.electrochemical_protocol import CVTechnique
+from utils.frame_parser import parse_data_block
+
+
+RESPONSE_TOKENS = ('#', '*', '@', '$')
+TERMINATOR_TOKENS = ('@', '$')
+
+
+class Session:
+    """一次测量会话"""
+
+    def __init__(self, index):
+        self.index = index                    # 会话序号 (从 1 开始)
+        self.command = None                   # 参数命令原文 (不含 \r\n)
+        self.parameter_fields = []            # 参数命令各字段 (字符串)
+        self.technique = None                 # 'CV' / 'DPV' / None
+        self.parameters = {}                  # 解析后的命名参数
+        self.responses = []                   # 设备响应标记 (#、*、@、$)
+        self.response_times = []              # 对应的时间戳
+        self.malformed = []                   # 无法解析的数据行
+        self.start_time = np.nan              # 收到 * 的时间
+        self.end_time = np.nan                # 收到结束标记的时间
+        self.started = False                  # 是否收到 *
+        self.complete = False                 # 是否收到结束标记
+        self.command_time = None              # 参数命令的发送时间
+        self.start_command_time = np.nan      # 开始命令 (S / D) 的发送时间
+        self.recv_bytes = 0                   # 本会话接收的字节数
+        self._voltages = []
+        self._currents = []
+        self._timestamps = []
+
+    def set_command(self, command):
+        """
+        设置参数命令并解析参数
+
+        Args:
+            command: 发送的命令文本 (P 参数帧, 可能带 D 后缀和开始命令)
+        """
+        self.command = command.split('\r\n')[0]
+        if self.command.startswith('P'):
+            self.parameter_fields = [p.strip() for p in self.command[2:].split(',') if p.strip()]
+        technique = DPVTechnique() if command_technique(command) == 'DPV' else CVTechnique()
+        self.technique = technique.name
+        try:
+            self.parameters = technique.parse_parameter_frame(self.command)
+        except ValueError:
+            self.parameters = {}
+
+    def add_points(self, voltages, currents, timestamps):
+        if len(voltages):
+            self._voltages.append(voltages)
+            self._currents.append(currents)
+            self._timestamps.append(timestamps)
+
+    def add_response(self, token, timestamp):
+        self.responses.append(token)
+        self.response_times.append(timestamp)
+
+    def _concat(self, parts):
+        if not parts:
+            return np.empty(0)
+        if len(parts) > 1:
+            parts[:] = [np.concatenate(parts)]
+        return parts[0]
+
+    @property
+    def voltages(self):
+        return self._concat(self._voltages)
+
+    @property
+    def currents(self):
+        return self._concat(self._currents)
+
+    @property
+    def timestamps(self):
+        """每个数据点所在行的接收时间"""
+        return self._concat(self._timestamps)
+
+    def __len__(self):
+        return sum(len(part) for part in self._voltages)
+
+
+def command_technique(command):
+    """
+    按命令判断测量技术: 参数帧带 D 后缀或开始命令为 D 时为 DPV, 否则为 CV
+
+    Args:
+        command: 参数帧及其后发送的命令文本
+    """
+    text = command.replace('\r', '').replace('\n', '')
+    if text.startswith('P'):
+        fields = text.split(',')
+        tail = fields[CVTechnique.frame_fields] if len(fields) > CVTechnique.frame_fields else ''
+        return 'DPV' if tail.strip().startswith('D') else 'CV'
+    return 'DPV' if text.strip().startswith('D') else 'CV'
+
+
+def start_command_position(command):
+    """
+    开始命令 (S / D) 在命令文本中的位置
+
+    Args:
+        command: 参数帧及其后发送的命令 (bytes)
+
+    Returns:
+        字节位置, 没有开始命令时为 None
+    """
+    position = 0
+    if command.startswith(b'P'):
+        # 跳过参数帧的各字段和 DPV 帧的后缀 (D), 后缀不是开始命令
+        for _ in range(CVTechnique.frame_fields):
+            position = command.find(b',', position) + 1
+            if not position:
+                return None
+        suffix = DPVTechnique.frame_suffix.encode()
+        if command.startswith(suffix, position):
+            position += len(suffix)
+    for index in range(position, len(command)):
+        if command[index] in b'SD':
+            return index
+    return None
+
+
+class SessionSegmenter:
+    """
+    流式会话切分器
+
+    发送方向按 P 拆成命令; 接收方向按行处理: # 之后、* 开始一次会话, @ / $ 结束会话。
+    会话结束后暂缓一步再产出, 以便把结束后紧跟的确认 (#) 归入该会话 (固件在测量结束后会再发送一次 #)。
+    没有收到 * 就出现的数据 (日志从测量中途开始) 归入一个未开始的会话, 标记为不完整。
+    """
+
+    def __init__(self):
+        self.count = 0                 # 已创建的会话数
+        self.malformed_lines = 0
+        self._commands = []            # [开始时间, bytearray, 每个字节的发送时间 (数组列表)]
+        self._line = bytearray()       # 接收方向未完成的行
+        self._line_times = np.empty(0)
+        self._current = None           # 正在进行的会话
+        self._finished = None          # 已结束、等待产出的会话
+        self._acks = []                # 会话开始前收到的 # [(时间)]
+        self._ready = []
+
+    def feed_send(self, values, times):
+        """
+        输入发送方向的一段数据
+
+        Args:
+            values: uint8 字节数组
+            times: 每个字节的时间戳
+        """
+        if not len(values):
+            return
+        data = values.tobytes()
+        starts = np.flatnonzero(values == ord('P')).tolist()
+        if not starts or starts[0] > 0:
+            end = starts[0] if starts else len(data)
+            if self._commands:
+                self._commands[-1][1].extend(data[:end])
+                self._commands[-1][2].append(times[:end])
+            else:
+                self._commands.append([float(times[0]), bytearray(data[:end]), [times[:end]]])
+        for k, start in enumerate(starts):
+            end = starts[k + 1] if k + 1 < len(starts) else len(data)
+            self._commands.append([float(times[start]), bytearray(data[start:end]),
+                                   [times[start:end]]])
+
+    def feed_recv(self, values, times):
+        """
+        输入接收方向的一段数据
+
+        Args:
+            values: uint8 字节数组
+            times: 每个字节的时间戳
+
+        Returns:
+            本次输入后完成的会话列表
+        """
+        if len(values):
+            data = bytes(self._line) + values.tobytes()
+            stamps = np.concatenate((self._line_times, times)) if len(self._line) else times
+            cut = data.rfind(b"\n") + 1
+            self._line = bytearray(data[cut:])
+            self._line_times = stamps[cut:]
+            if cut:
+                self._process_lines(data[:cut], stamps[:cut])
+        return self._take_ready()
+
+    def finish(self):
+        """
+        输入结束: 处理最后不完整的行, 产出剩余的会话
+
+        Returns:
+            完成的会话列表
+        """
+        if self._line.strip():
+            self._process_lines(bytes(self._line) + b"\n",
+                                np.append(self._line_times, self._line_times[-1]))
+        self._line = bytearray()
+        self._line_times = np.empty(0)
+        self._release_finished()
+        if self._current is None and not self.count and (self._commands or self._acks):
+            # 只有命令/确认, 没有收到数据
+            self._current = self._new_session(np.nan)
+        if self._current is not None:
+            self._ready.append(self._current)
+            self._current = None
+        return self._take_ready()
+
+    def _take_ready(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    def _command_at(self, timestamp):
+        """返回在 timestamp 之前最后发送的命令 (没有时返回 None)"""
+        chosen = None
+        for entry in self._commands:
+            start = entry[0]
+            if np.isnan(timestamp) or np.isnan(start) or start <= timestamp:
+                chosen = entry
+            else:
+                break
+        return chosen
+
+    def _new_session(self, timestamp):
+        """创建新会话并关联其参数命令"""
+        self._release_finished()
+        self.count += 1
+        session = Session(self.count)
+        command = self._command_at(timestamp)
+        if command is not None:
+            session.command_time = command[0]
+            session.set_command(command[1].decode('latin-1'))
+            position = start_command_position(command[1])
+            if position is not None:
+                session.start_command_time = float(np.concatenate(command[2])[position])
+            # 更早的命令不会再被使用
+            while self._commands[0][0] != command[0]:
+                self._commands.pop(0)
+        for ack_time in self._acks:
+            session.add_response('#', ack_time)
+        self._acks = []
+        return session
+
+    def _release_finished(self):
+        if self._finished is not None:
+            self._ready.append(self._finished)
+            self._finished = None
+
+    def _process_lines(self, raw, stamps):
+        """处理一段完整行"""
+        block = parse_data_block(raw)
+        if block.malformed:
+            self.malformed_lines += len(block.malformed)
+        point_times = stamps[np.minimum(block.point_offsets, len(stamps) - 1)]
+        marker_times = stamps[np.minimum(block.marker_offsets, len(stamps) - 1)] \
+            if len(block.marker_offsets) else np.empty(0)
+
+        start = 0
+        counted = 0  # 已计入会话的字节位置
+        for (index, token), timestamp, offset in zip(block.markers, marker_times.tolist(),
+                                                     block.marker_offsets.tolist()):
+            self._add_points(block, start, index, point_times)
+            if token == '*':
+                # * 之前的字节 (上一会话的数据) 计入当前会话, * 行计入新会话
+                self._count_bytes(counted, raw.rfind(b"\n", 0, offset) + 1)
+                self._handle_token(token, timestamp)
+                self._count_bytes(raw.rfind(b"\n", 0, offset) + 1, offset + 1)
+            else:
+                self._count_bytes(counted, offset + 1)
+                self._handle_token(token, timestamp)
+            counted = max(counted, offset + 1)
+            start = index
+        self._add_points(block, start, len(block.voltages), point_times)
+        self._count_bytes(counted, len(raw))
+
+        if block.malformed and self._current is not None:
+            self._current.malformed.extend(block.malformed)
+
+    def _count_bytes(self, start, stop):
+        """把接收字节计入当前会话 (没有会话时计入刚结束的会话)"""
+        session = self._current if self._current is not None else self._finished
+        if session is not None and stop > start:
+            session.recv_bytes += stop - start
+
+    def _add_points(self, block, start, stop, point_times):
+        if stop <= start:
+            return
+        if self._current is None:
+            # 没有收到 * 的数据 (日志从测量中途开始)
+            self._current = self._new_session(point_times[start])
+        self._current.add_points(block.voltages[start:stop], block.currents[start:stop],
+                                 point_times[start:stop])
+
+    def _handle_token(self, token, timestamp):
+        if token == '#':
+            command = self._command_at(timestamp)
+            key = command[0] if command is not None else None
+            if self._current is not None:
+                # 上一次测量未收到结束标记就开始了新的参数设置
+                self._ready.append(self._current)
+                self._current = None
+            if self._current is None and self._finished is not None and \
+                    key == self._finished.command_time and not self._acks:
+                # 测量结束后紧跟的确认, 没有新命令, 归入刚结束的会话
+                self._finished.add_response('#', timestamp)
+            else:
+                self._acks.append(timestamp)
+
+        elif token == '*':
+            if self._current is not None:
+                self._ready.append(self._current)
+            self._current = self._new_session(timestamp)
+            self._current.started = True
+            self._current.start_time = timestamp
+            self._current.add_response('*', timestamp)
+
+        elif token in TERMINATOR_TOKENS:
+            if self._current is None:
+                if self._finished is not None:
+                    self._finished.add_response(token, timestamp)
+                return
+            self._current.add_response(token, timestamp)
+            self._current.end_time = timestamp
+            self._current.complete = self._current.started
+            self._release_finished()
+            self._finished = self._current
+            self._current = None
+
+
+def iter_log_chunks(path):
+    """
+    按时间顺序逐块读取 HEX 日志或抓包文件
+
+    Yields:
+        (is_send, values, times, skipped) skipped 为本块中无法解析的日志行数
+    """
+    from utils.capture import CaptureReader, is_capture_file
+    from utils.hex_log import iter_hex_records
+
+    if is_capture_file(path):
+        with CaptureReader(path) as reader:
+            for is_send, values, times in reader.iter_chunks():
+                yield is_send, values, times, 0
+    else:
+        for is_send, values, times, _, skipped in iter_hex_records(path):
+            yield is_send, values, times, skipped
+
+
+def iter_sessions(path, totals=None):
+    """
+    流式切分日志中的测量会话
+
+    Args:
+        path: HEX 日志或 .ecap 抓包文件
+        totals: 可选字典, 累计 'send_bytes' / 'recv_bytes' / 'skipped_lines' / 'malformed_lines'
+
+    Yields:
+        Session (按时间顺序)
+    """
+    segmenter = SessionSegmenter()
+    if totals is None:
+        totals = {}
+    totals.setdefault('send_bytes', 0)
+    totals.setdefault('recv_bytes', 0)
+    totals.setdefault('skipped_lines', 0)
+
+    for is_send, values, times, skipped in iter_log_chunks(path):
+        totals['skipped_lines'] += skipped
+        totals['send_bytes'] += int(is_send.sum())
+        totals['recv_bytes'] += int(len(is_send) - is_send.sum())
+        # 先处理发送方向, 会话按时间戳关联到此前发送的命令
+        segmenter.feed_send(values[is_send], times[is_send])
+        for session in segmenter.feed_recv(values[~is_send], times[~is_send]):
+            yield session
+    for session in segmenter.finish():
+        yield session
+    totals['malformed_lines'] = segmenter.malformed_lines
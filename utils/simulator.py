@@ -0,0 +1,196 @@
+"""确定性模拟设备: 按实际测量参数生成 CV/DPV 波形, 以虚拟时间和可调倍速输出数据"""
+
+import time
+
+import numpy as np
+
+
+# F/RT (25 °C), 单位 1/V
+F_RT = 38.92
+
+
+def cv_waveform(start_v=-1.0, end_v=1.0, scan_dir=1, scan_rate=0.2, cycles=2,
+                current_range=50, potential_step=0.0125, e0=0.2, peak_current=None,
+                double_layer=2.0, **_):
+    """
+    生成循环伏安波形 (可逆单电子氧化还原体系的近似模型)
+
+    电位在 start_v 与 end_v 之间三角波扫描 cycles 圈 (scan_dir=-1 时先向 start_v 方向扫描,
+    即 end_v → start_v → end_v)。电流 = 双电层充电电流 + 法拉第电流,
+    峰电流按 Randles-Sevcik 关系与 √扫描速率 成正比, 正/反扫峰电位相差约 59 mV。
+
+    Args:
+        start_v, end_v, scan_dir, scan_rate, cycles, current_range: 与 CV 参数命令一致
+        potential_step: 相邻采样点的电位间隔 (V), 采样间隔 = potential_step / scan_rate
+        e0: 式量电位 (V)
+        peak_current: 0.1 V/s 时的峰电流 (μA, 默认: 量程的 10%)
+        double_layer: 双电层电容 (μA·s/V)
+
+    Returns:
+        (times, voltages, currents) 数组, 时间单位为秒
+    """
+    scan_rate = abs(scan_rate) or 0.1
+    span = abs(end_v - start_v) or 1.0
+    if peak_current is None:
+        peak_current = 0.1 * current_range
+
+    first, second = (start_v, end_v) if scan_dir >= 0 else (end_v, start_v)
+    points = max(int(round(span / potential_step)), 2)
+    sweep = np.linspace(first, second, points, endpoint=False)
+    back = np.linspace(second, first, points, endpoint=False)
+    cycle = np.concatenate((sweep, back))
+    voltages = np.concatenate((np.tile(cycle, max(int(cycles), 1)), [first]))
+
+    direction = np.sign(np.diff(voltages, append=voltages[-1] * 2 - voltages[-2]))
+    direction[direction == 0] = 1
+    times = np.arange(len(voltages)) * (span / points / scan_rate)
+
+    ip = peak_current * np.sqrt(scan_rate / 0.1)
+    width = 1.0 / F_RT
+    anodic = direction > 0
+    # 峰电位: 正扫 E0 + 28.5 mV, 反扫 E0 - 28.5 mV
+    peak_v = np.where(anodic, e0 + 0.0285, e0 - 0.0285)
+    x = (voltages - peak_v) / width * np.where(anodic, 1.0, -1.0)
+    # 峰形 + 扩散拖尾
+    faradaic = ip * (1.0 / np.cosh(x / 2.0) ** 2 + 0.35 * (1.0 + np.tanh(x / 2.0)))
+    faradaic = np.where(anodic, faradaic, -faradaic)
+    capacitive = double_layer * scan_rate * direction
+
+    return times, voltages, faradaic + capacitive
+
+
+def dpv_waveform(start_v=-1.0, end_v=1.0, scan_dir=1, pulse_height=0.1, pulse_width=10,
+                 pulse_period=10, sample_width=20, current_range=50, potential_step=0.008,
+                 e_half=0.35, peak_scale=None, **_):
+    """
+    生成差分脉冲伏安波形
+
+    差分电流采用可逆体系的经典表达式:
+        δi = k · P(σ² - 1) / ((σ + P)(1 + Pσ)),  P = exp(F/RT·(E + ΔE/2 - E½)),  σ = exp(F/RT·ΔE/2)
+    峰电位为 E½ - ΔE/2, 峰高随脉冲幅度 ΔE 增大。
+
+    Args:
+        start_v, end_v, scan_dir, pulse_height, pulse_width, pulse_period, sample_width,
+        current_range: 与 DPV 参数命令一致
+        potential_step: 相邻数据点的电位增量 (V)
+        e_half: 半波电位 (V)
+        peak_scale: 电流比例系数 k (μA, 默认: 量程的 5.3%)
+
+    Returns:
+        (times, voltages, currents) 数组, 时间单位为秒
+    """
+    if peak_scale is None:
+        peak_scale = 0.0533 * current_range
+
+    first, second = (start_v, end_v) if scan_dir >= 0 else (end_v, start_v)
+    points = max(int(round(abs(second - first) / potential_step)), 2)
+    voltages = np.linspace(first, second, points)
+    interval = max(pulse_width + pulse_period, 1) / 1000.0
+    times = np.arange(points) * interval
+
+    delta = abs(pulse_height)
+    sigma = np.exp(F_RT * delta / 2.0)
+    p = np.exp(np.clip(F_RT * (voltages + delta / 2.0 - e_half), -700, 700))
+    currents = peak_scale * p * (sigma ** 2 - 1) / ((sigma + p) * (1 + p * sigma))
+
+    return times, voltages, currents
+
+
+class SimulatedDevice:
+    """
+    确定性模拟设备
+
+    以虚拟时间生成数据: speed=1 与真实设备同速, speed=100 为 100 倍速,
+    speed=0 为不等待 (尽可能快)。噪声由带种子的随机数发生器产生, 相同种子结果完全一致。
+    数据以包含多行的字节块输出, 与批量读取模式的格式相同。
+    """
+
+    def __init__(self, technique, seed=0, speed=1.0, noise=None, block_points=4096):
+        """
+        Args:
+            technique: 测量技术定义 (提供 simulate_waveform 和数据行格式)
+            seed: 随机数种子
+            speed: 虚拟时间倍速 (0 = 尽可能快)
+            noise: 电流噪声标准差 (μA, 默认: technique.sim_noise)
+            block_points: 尽可能快模式下每个数据块的点数
+        """
+        self.technique = technique
+        self.seed = seed
+        self.speed = speed
+        self.noise = technique.sim_noise if noise is None else noise
+        self.block_points = block_points
+
+    def generate(self, params):
+        """
+        按参数生成完整的模拟数据 (含噪声)
+
+        Returns:
+            (times, voltages, currents) 数组
+        """
+        times, voltages, currents = self.technique.simulate_waveform(params)
+        rng = np.random.default_rng(self.seed)
+        if self.noise:
+            currents = currents + rng.normal(0.0, self.noise, len(currents))
+        return times, voltages, currents
+
+    def format_block(self, voltages, currents):
+        """把一批数据点格式化为 <电位>,<电流>,\\r\\n 帧组成的字节块"""
+        schema = self.technique.data_schema
+        line = f"{{:{schema.voltage_format}}},{{:{schema.current_format}}},\r\n"
+        return "".join(map(line.format, voltages.tolist(), currents.tolist())).encode()
+
+    def schedule(self, params, terminator=None):
+        """
+        按虚拟时间生成输出计划 (生成器), 由 run 或异步接口驱动
+
+        Args:
+            params: 测量参数 (send_parameters 收到的参数)
+            terminator: 结束标记 (默认: technique.terminators[0])
+
+        Yields:
+            需要等待的秒数 (float), 或要输出的内容 (字节块 / 结束标记行 str)
+        """
+        times, voltages, currents = self.generate(params)
+        count = len(times)
+        start = time.monotonic()
+        sent = 0
+
+        while sent < count:
+            if self.speed:
+                virtual_now = (time.monotonic() - start) * self.speed
+                end = int(np.searchsorted(times, virtual_now, side='right'))
+                if end <= sent:
+                    # 等到下一个点的虚拟时间
+                    yield float((times[sent] - virtual_now) / self.speed)
+                    continue
+            else:
+                end = min(sent + self.block_points, count)
+
+            yield self.format_block(voltages[sent:end], currents[sent:end])
+            sent = end
+
+        if terminator is None:
+            terminator = self.technique.terminators[0]
+        yield terminator + "\r\n"
+
+    def run(self, params, emit, stop_flag, terminator=None):
+        """
+        按虚拟时间输出数据, 最后输出结束标记
+
+        Args:
+            params: 测量参数 (send_parameters 收到的参数)
+            emit: 输出回调, 参数为字节块或结束标记行 (str)
+            stop_flag: threading.Event, 置位时提前结束
+            terminator: 结束标记 (默认: technique.terminators[0])
+
+        Returns:
+            是否完整输出 (未被中止)
+        """
+        for item in self.schedule(params, terminator):
+            if stop_flag.is_set():
+                return False
+            if isinstance(item, float):
+                stop_flag.wait(item)
+            else:
+                emit(item)
+        return True
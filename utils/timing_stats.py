@@ -0,0 +1,119 @@
+"""测量时序统计: 按接收时间戳计算实际采样率、行间隔抖动、数据间隙、吞吐量和命令延迟
+
+用于确定所需的波特率, 以及发现固件或 USB 转串口芯片的延迟问题。
+注意时间戳的精度取决于日志来源 (HEX 日志为毫秒); 同一次读取得到的多行共用一个时间戳,
+所以行间隔中会出现大量 0 和对应的较长间隔, 这本身反映了串口驱动的批量传输。
+"""
+
+import numpy as np
+
+
+PERCENTILES = (50, 90, 99)
+DEFAULT_GAP_FACTOR = 5.0   # 行间隔超过名义间隔的多少倍视为数据间隙
+MAX_LISTED_GAPS = 20       # 结果中列出的间隙数上限
+
+
+def line_timing(timestamps, gap_threshold=None, gap_factor=DEFAULT_GAP_FACTOR):
+    """
+    按数据行的接收时间计算采样率、间隔抖动和数据间隙
+
+    Args:
+        timestamps: 每个数据行的接收时间戳 (NaN 被忽略)
+        gap_threshold: 数据间隙阈值 (秒), 默认为 gap_factor × 名义间隔 (1 / 有效采样率)
+        gap_factor: 未指定 gap_threshold 时的倍数
+
+    Returns:
+        统计字典 (数据行少于 2 行或时间戳无效时只含 'lines'):
+        lines, duration, effective_rate,
+        interval_mean / interval_std / interval_max, interval_p50 / p90 / p99,
+        jitter_p50 / p90 / p99 (行间隔与名义间隔之差的绝对值),
+        gap_threshold, gap_count, gap_total, gap_longest, gaps [(开始时间, 时长)]
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    timestamps = timestamps[~np.isnan(timestamps)]
+    result = {'lines': len(timestamps)}
+    if len(timestamps) < 2:
+        return result
+    duration = float(timestamps[-1] - timestamps[0])
+    if duration <= 0:
+        return result
+
+    intervals = np.diff(timestamps)
+    nominal = duration / len(intervals)
+    result['duration'] = duration
+    result['effective_rate'] = 1.0 / nominal
+    result['interval_mean'] = nominal
+    result['interval_std'] = float(intervals.std())
+    result['interval_max'] = float(intervals.max())
+    jitter = np.abs(intervals - nominal)
+    for percentile, interval, deviation in zip(PERCENTILES,
+                                               np.percentile(intervals, PERCENTILES).tolist(),
+                                               np.percentile(jitter, PERCENTILES).tolist()):
+        result[f'interval_p{percentile}'] = interval
+        result[f'jitter_p{percentile}'] = deviation
+
+    if gap_threshold is None:
+        gap_threshold = gap_factor * nominal
+    gap_index = np.flatnonzero(intervals > gap_threshold)
+    result['gap_threshold'] = float(gap_threshold)
+    result['gap_count'] = len(gap_index)
+    result['gap_total'] = float(intervals[gap_index].sum())
+    result['gap_longest'] = float(intervals[gap_index].max()) if len(gap_index) else 0.0
+    result['gaps'] = list(zip(timestamps[gap_index[:MAX_LISTED_GAPS]].tolist(),
+                              intervals[gap_index[:MAX_LISTED_GAPS]].tolist()))
+    return result
+
+
+def throughput(byte_count, start_time, end_time):
+    """
+    接收吞吐量 (字节/秒)
+
+    Returns:
+        吞吐量, 时间范围无效时为 None
+    """
+    if byte_count is None or start_time is None or end_time is None:
+        return None
+    duration = end_time - start_time
+    if np.isnan(duration) or duration <= 0:
+        return None
+    return byte_count / duration
+
+
+def latency(start, end):
+    """两个时间戳之差 (秒), 任一无效时为 None"""
+    if start is None or end is None or np.isnan(start) or np.isnan(end):
+        return None
+    return end - start
+
+
+def session_timing(session, gap_threshold=None, gap_factor=DEFAULT_GAP_FACTOR):
+    """
+    计算一个测量会话的时序统计
+
+    Args:
+        session: utils.sessions.Session
+        gap_threshold: 数据间隙阈值 (秒), 默认按有效采样率自动确定
+        gap_factor: 未指定 gap_threshold 时的倍数
+
+    Returns:
+        line_timing 的结果, 另含:
+        recv_bytes, throughput (字节/秒, 按 * 到结束标记, 缺少标记时按数据时间范围),
+        latency_ack (参数帧 → 第一个 #), latency_start (开始命令 S/D → *),
+        latency_first_data (开始命令 S/D → 第一个数据行)
+    """
+    timestamps = session.timestamps
+    result = line_timing(timestamps, gap_threshold, gap_factor)
+
+    start, end = session.start_time, session.end_time
+    if np.isnan(start) or np.isnan(end) or end <= start:
+        valid = timestamps[~np.isnan(timestamps)]
+        start, end = (valid[0], valid[-1]) if len(valid) else (None, None)
+    result['recv_bytes'] = session.recv_bytes
+    result['throughput'] = throughput(session.recv_bytes, start, end)
+
+    ack_times = [t for token, t in zip(session.responses, session.response_times) if token == '#']
+    result['latency_ack'] = latency(session.command_time, ack_times[0]) if ack_times else None
+    result['latency_start'] = latency(session.start_command_time, session.start_time)
+    result['latency_first_data'] = latency(session.start_command_time,
+                                           float(timestamps[0]) if len(timestamps) else None)
+    return result
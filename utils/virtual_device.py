@@ -0,0 +1,229 @@
+"""基于伪终端 (pty) 的虚拟串口设备, 端到端模拟下位机固件协议 (仅限 Linux/macOS)
+
+虚拟设备在伪终端主端运行, 客户端像打开真实设备一样打开从端路径 (如 /dev/pts/3),
+因此串口读取、分帧、超时和错误恢复代码都会被完整执行:
+
+    P <参数>,      → #    (CV 参数)
+    P <参数>,D     → #    (DPV 参数)
+    S / D          → *    然后输出数据行, 最后输出 @ (CV) 或 $ (DPV)
+"""
+
+import os
+import select
+import threading
+import time
+import tty
+
+import numpy as np
+
+from utils.acquisition import Technique
+from utils.electrochemical_protocol import CVTechnique
+from utils.dpv_protocol import DPVTechnique
+from utils.simulator import SimulatedDevice
+
+
+class VirtualSerialDevice:
+    """伪终端虚拟设备"""
+
+    def __init__(self, baudrate=115200, seed=0, speed=1.0, jitter=0.0, drop_rate=0.0,
+                 burst_size=None, frame_timeout=0.05):
+        """
+        Args:
+            baudrate: 模拟的串口波特率, 按 10 bit/字节限制输出速度 (0 = 不限速)
+            seed: 随机数种子 (数据噪声、抖动和丢字节都可复现)
+            speed: 数据生成的虚拟时间倍速 (0 = 尽可能快)
+            jitter: 每次突发写入后附加的随机延迟上限 (秒)
+            drop_rate: 输出字节的丢失概率 (0~1)
+            burst_size: 每次写入的最大字节数 (默认: 整块写入)
+            frame_timeout: 参数帧最后一个逗号之后等待 'D' 后缀的时间 (秒)
+        """
+        self.baudrate = baudrate
+        self.seed = seed
+        self.speed = speed
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.burst_size = burst_size
+        self.frame_timeout = frame_timeout
+
+        self.techniques = {
+            technique.frame_suffix: technique
+            for technique in (CVTechnique(), DPVTechnique())
+        }
+
+        self.master_fd = None
+        self.slave_fd = None
+        self.port = None
+        self.stop_flag = threading.Event()
+        self.thread = None
+        self._rng = np.random.default_rng(seed)
+
+        # 固件状态
+        self.technique = None
+        self.parameters = None
+        self.sessions = 0
+        self.bytes_written = 0
+        self.bytes_dropped = 0
+
+    def start(self):
+        """
+        创建伪终端并启动设备线程
+
+        Returns:
+            客户端应打开的串口路径
+        """
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        os.set_blocking(self.master_fd, False)
+        self.port = os.ttyname(self.slave_fd)
+
+        self.stop_flag.clear()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        """停止设备并关闭伪终端"""
+        self.stop_flag.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master_fd = self.slave_fd = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _run(self):
+        """设备主循环: 读取命令并响应"""
+        buffer = bytearray()
+        frame_deadline = None
+
+        while not self.stop_flag.is_set():
+            readable, _, _ = select.select([self.master_fd], [], [], 0.01)
+            if readable:
+                try:
+                    buffer += os.read(self.master_fd, 4096)
+                except (BlockingIOError, InterruptedError):
+                    pass
+                except OSError:
+                    break
+
+            while buffer:
+                if buffer[:1] == b"P":
+                    end = self._frame_end(buffer)
+                    if end is None:
+                        break  # 参数帧尚未收全
+                    if end == len(buffer):
+                        # 最后一个逗号之后暂无数据, 稍等可能到达的 'D' 后缀
+                        if frame_deadline is None:
+                            frame_deadline = time.monotonic() + self.frame_timeout
+                        if time.monotonic() < frame_deadline:
+                            break
+                    frame_deadline = None
+
+                    suffix = buffer[end:end + 1].decode(errors='replace')
+                    if suffix not in self.techniques:
+                        suffix = ""
+                    frame = bytes(buffer[:end + len(suffix)])
+                    del buffer[:end + len(suffix)]
+                    self._handle_parameters(frame, suffix)
+
+                elif self.technique and buffer[:1] == self.technique.start_command.encode():
+                    del buffer[:1]
+                    self._run_session()
+
+                else:
+                    # 空白或无法识别的字节, 丢弃
+                    del buffer[:1]
+
+    def _frame_end(self, buffer):
+        """返回参数帧最后一个逗号之后的位置, 帧未收全时返回 None"""
+        position = -1
+        for _ in range(Technique.frame_fields):
+            position = buffer.find(b",", position + 1)
+            if position < 0:
+                return None
+        return position + 1
+
+    def _handle_parameters(self, frame, suffix):
+        """处理参数帧, 回复 #"""
+        technique = self.techniques[suffix]
+        try:
+            self.parameters = technique.parse_parameter_frame(frame)
+        except ValueError:
+            self.technique = None
+            return
+        self.technique = technique
+        self._write(b"#\r\n", lossy=False)
+
+    def _run_session(self):
+        """执行一次测量: 回复 *, 按虚拟时间输出数据, 最后输出结束标记 (DPV 为 $)"""
+        technique = self.technique
+        self._write(b"*\r\n", lossy=False)
+
+        simulator = SimulatedDevice(technique, seed=self.seed + self.sessions, speed=self.speed)
+        self.sessions += 1
+        simulator.run(self.parameters, self._emit, self.stop_flag,
+                      terminator=technique.terminators[-1])
+
+    def _emit(self, block):
+        """SimulatedDevice 输出回调: 数据块可能丢字节, 结束标记不丢失"""
+        if isinstance(block, str):
+            self._write(block.encode(), lossy=False)
+        else:
+            self._write(block)
+
+    def _write(self, data, lossy=True):
+        """
+        按波特率、突发大小、抖动和丢字节设置写出数据
+
+        Args:
+            data: 要写出的字节
+            lossy: 是否应用丢字节 (握手响应不丢失, 便于测试数据流的恢复)
+        """
+        if lossy and self.drop_rate:
+            keep = self._rng.random(len(data)) >= self.drop_rate
+            self.bytes_dropped += int(len(data) - keep.sum())
+            data = np.frombuffer(data, dtype=np.uint8)[keep].tobytes()
+
+        burst = self.burst_size or len(data) or 1
+        for offset in range(0, len(data), burst):
+            chunk = data[offset:offset + burst]
+            if not self._write_all(chunk):
+                return
+
+            delay = 0.0
+            if self.baudrate:
+                delay += len(chunk) * 10.0 / self.baudrate
+            if self.jitter:
+                delay += self._rng.uniform(0.0, self.jitter)
+            if delay and self.stop_flag.wait(delay):
+                return
+
+    def _write_all(self, chunk):
+        """写出全部字节 (主端非阻塞, 对端读取慢时等待)"""
+        view = memoryview(chunk)
+        while view:
+            if self.stop_flag.is_set():
+                return False
+            _, writable, _ = select.select([], [self.master_fd], [], 0.1)
+            if not writable:
+                continue
+            try:
+                written = os.write(self.master_fd, view)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return False
+            self.bytes_written += written
+            view = view[written:]
+        return True